@@ -0,0 +1,77 @@
+"""
+Media group collection
+
+Telegram delivers an album as one message per photo, all sharing a
+media_group_id, and nothing marks the last one. AlbumCollector buffers the
+items of each album and hands the whole album to a callback once no new
+item has arrived for `delay` seconds, so the callback can store it in a
+single transaction instead of one write per photo.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class AlbumCollector:
+    """Debounces album items by key and passes each complete album on"""
+
+    def __init__(self, on_complete: Callable[[List[Any]], Awaitable[None]], delay: float = 1.5):
+        self.on_complete = on_complete
+        self.delay = delay
+        self._items: Dict[Hashable, List[Any]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        # Running callbacks, referenced so they are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+        self.albums = 0
+
+    def add(self, key: Hashable, item: Any):
+        """Buffer one item and restart the album's quiet-period timer"""
+        self._items.setdefault(key, []).append(item)
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self._timers[key] = asyncio.get_running_loop().call_later(self.delay, self._complete, key)
+
+    def _complete(self, key: Hashable) -> Optional[asyncio.Task]:
+        self._timers.pop(key, None)
+        items = self._items.pop(key, [])
+        if not items:
+            return None
+        self.albums += 1
+        task = asyncio.get_running_loop().create_task(self._run(key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, key: Hashable, items: List[Any]):
+        try:
+            await self.on_complete(items)
+        except Exception as e:
+            logger.error("Handling album %s failed: %s", key, e)
+
+    async def flush(self, match: Optional[Callable[[Hashable], bool]] = None):
+        """Complete pending albums now, only those whose key matches if given"""
+        tasks = []
+        for key, timer in list(self._timers.items()):
+            if match is None or match(key):
+                timer.cancel()
+                tasks.append(self._complete(key))
+        await asyncio.gather(*(task for task in tasks if task), return_exceptions=True)
+
+    def discard(self, match: Callable[[Hashable], bool]) -> int:
+        """Drop pending albums whose key matches without completing them, returns how many"""
+        keys = [key for key in self._timers if match(key)]
+        for key in keys:
+            self._timers.pop(key).cancel()
+            self._items.pop(key, None)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': len(self._items),
+            'pending_items': sum(len(items) for items in self._items.values()),
+            'albums': self.albums,
+        }
@@ -0,0 +1,207 @@
+"""
+HTTP client for Bot API calls
+
+BotApiRequest is python-telegram-bot's HTTPXRequest with
+
+* keep-alive limits: how many idle connections stay open, and for how long
+* separate timeouts for media (sendPhoto, sendDocument, uploads), which
+  otherwise get the same few seconds as a text reply
+* per-method latency and pool-wait timings, on /metrics
+
+Calls wait for a free connection at an asyncio.Semaphore sized like the
+pool, so the time spent there is exactly the pool wait: when it grows
+while latency stays flat, the pool is too small, not Telegram too slow.
+
+build_application() uses one instance for getUpdates long polling and
+another for everything else, so replies never queue behind a poll.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+from config import (
+    API_POOL_SIZE, API_KEEPALIVE_CONNECTIONS, API_KEEPALIVE_EXPIRY, API_CONNECT_TIMEOUT,
+    API_READ_TIMEOUT, API_WRITE_TIMEOUT, API_POOL_TIMEOUT, API_MEDIA_READ_TIMEOUT,
+    API_MEDIA_WRITE_TIMEOUT, GET_UPDATES_READ_TIMEOUT
+)
+
+# Methods that send files get the media timeouts even when resending a file_id
+MEDIA_METHODS = frozenset({
+    'sendphoto', 'senddocument', 'sendmediagroup', 'sendvideo', 'sendaudio', 'sendanimation', 'sendvoice',
+})
+# Stats key for file downloads (File.download_to_memory() and friends)
+DOWNLOAD = 'download'
+
+
+class MethodStats:
+    """Counters for one Bot API method"""
+
+    __slots__ = ('calls', 'errors', 'latency', 'max_latency', 'pool_wait', 'max_pool_wait')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.pool_wait = 0.0
+        self.max_pool_wait = 0.0
+
+    def add(self, latency: float, pool_wait: float, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.pool_wait += pool_wait
+        self.max_pool_wait = max(self.max_pool_wait, pool_wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'avg_ms': round(self.latency / self.calls * 1000, 1),
+            'max_ms': round(self.max_latency * 1000, 1),
+            'pool_wait_avg_ms': round(self.pool_wait / self.calls * 1000, 1),
+            'pool_wait_max_ms': round(self.max_pool_wait * 1000, 1),
+        }
+
+
+class BotApiRequest(HTTPXRequest):
+    """HTTPXRequest with keep-alive limits, media timeouts and per-method timings"""
+
+    def __init__(self, pool_size: int, keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = 5.0, media_read_timeout: Optional[float] = None,
+                 media_write_timeout: Optional[float] = None, **kwargs):
+        # HTTPXRequest keeps every connection of the pool alive, with httpx's
+        # default expiry; read by _build_client() below
+        self._limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size if keepalive_connections is None else keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        super().__init__(connection_pool_size=pool_size, **kwargs)
+        self.pool_size = pool_size
+        self.media_read_timeout = media_read_timeout
+        self.media_write_timeout = media_write_timeout
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._methods: Dict[str, MethodStats] = defaultdict(MethodStats)
+        self.in_flight = 0
+        self.waiting = 0
+        self.pool_timeouts = 0
+
+    def _build_client(self) -> httpx.AsyncClient:
+        self._client_kwargs['limits'] = self._limits
+        return super()._build_client()
+
+    async def initialize(self) -> None:
+        await super().initialize()
+        # Created here so it belongs to the loop the bot runs in
+        self._slots = asyncio.Semaphore(self.pool_size)
+
+    def _media_timeouts(self, method: str, request_data: Optional[RequestData],
+                        read_timeout, write_timeout) -> Tuple[Any, Any]:
+        """Media timeouts for whichever of the two the caller left at the default"""
+        uploads = bool(request_data and request_data.multipart_data)
+        if not uploads and method not in MEDIA_METHODS and method != DOWNLOAD:
+            return read_timeout, write_timeout
+        if read_timeout is BaseRequest.DEFAULT_NONE and self.media_read_timeout is not None:
+            read_timeout = self.media_read_timeout
+        if write_timeout is BaseRequest.DEFAULT_NONE and self.media_write_timeout is not None:
+            write_timeout = self.media_write_timeout
+        return read_timeout, write_timeout
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=BaseRequest.DEFAULT_NONE,
+        write_timeout=BaseRequest.DEFAULT_NONE,
+        connect_timeout=BaseRequest.DEFAULT_NONE,
+        pool_timeout=BaseRequest.DEFAULT_NONE,
+    ) -> Tuple[int, bytes]:
+        # Downloads are GETs of /file/bot<token>/<path>, keep them under one key
+        api_method = DOWNLOAD if method == 'GET' else url.rsplit('/', 1)[-1].lower()
+        read_timeout, write_timeout = self._media_timeouts(api_method, request_data, read_timeout, write_timeout)
+        if pool_timeout is BaseRequest.DEFAULT_NONE:
+            pool_timeout = self._client.timeout.pool
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), pool_timeout)
+        except asyncio.TimeoutError:
+            self.pool_timeouts += 1
+            self._methods[api_method].add(0.0, time.perf_counter() - started, True)
+            raise TimedOut(
+                "Pool timeout: all connections in the connection pool are occupied. "
+                "Request was *not* sent to Telegram."
+            ) from None
+        finally:
+            self.waiting -= 1
+
+        acquired = time.perf_counter()
+        self.in_flight += 1
+        failed = True
+        try:
+            code, payload = await super().do_request(
+                url, method, request_data, read_timeout=read_timeout, write_timeout=write_timeout,
+                connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+            failed = code >= 300
+            return code, payload
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self._methods[api_method].add(time.perf_counter() - acquired, acquired - started, failed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool occupancy plus latency and pool wait per method"""
+        latency = sum(stats.latency for stats in self._methods.values())
+        pool_wait = sum(stats.pool_wait for stats in self._methods.values())
+        return {
+            'pool_size': self.pool_size,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'pool_timeouts': self.pool_timeouts,
+            # Fraction of time spent in Bot API calls that was waiting for a connection
+            'pool_wait_share': round(pool_wait / (latency + pool_wait), 3) if latency + pool_wait else 0.0,
+            'methods': {name: stats.snapshot() for name, stats in sorted(self._methods.items())},
+        }
+
+
+def api_request() -> BotApiRequest:
+    """Request for every Bot API call except getUpdates, configured from config.py"""
+    return BotApiRequest(
+        API_POOL_SIZE,
+        keepalive_connections=API_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=API_KEEPALIVE_EXPIRY,
+        media_read_timeout=API_MEDIA_READ_TIMEOUT,
+        media_write_timeout=API_MEDIA_WRITE_TIMEOUT,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        read_timeout=API_READ_TIMEOUT,
+        write_timeout=API_WRITE_TIMEOUT,
+        pool_timeout=API_POOL_TIMEOUT,
+    )
+
+
+def get_updates_request() -> BotApiRequest:
+    """Request for getUpdates: one long-lived connection of its own
+
+    python-telegram-bot adds the long polling timeout to the read timeout.
+    """
+    return BotApiRequest(
+        1,
+        keepalive_expiry=None,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        read_timeout=GET_UPDATES_READ_TIMEOUT,
+        write_timeout=API_WRITE_TIMEOUT,
+        pool_timeout=None,
+    )
@@ -4,12 +4,24 @@ Jersey Management Telegram Bot
 Main application file with admin design management
 """
 
+import asyncio
 import logging
+import os
+import re
+import time
 from datetime import datetime
-from functools import wraps
-from typing import Dict, Any
+from functools import partial, wraps
+from typing import Dict, Any, List, Optional, Tuple
+
+import health
+
+# Bind the health check port before the slow imports below
+if __name__ == '__main__':
+    health.start()
+_imports_started = time.perf_counter()
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -17,84 +29,66 @@ from telegram.ext import (
     MessageHandler,
     filters,
     ConversationHandler,
-    ContextTypes
+    ContextTypes,
+    TypeHandler
 )
 
 from config import (
     BOT_TOKEN, ADMIN_IDS, SHIRT_SIZES,
     DATE_FORMAT, WELCOME_MESSAGE, VOTE_DEADLINE_PASSED,
     ORDER_DEADLINE_PASSED, DUPLICATE_VOTE, DUPLICATE_ORDER,
-    ORDER_SUCCESS
+    ORDER_SUCCESS, UPDATE_RECORD_FILE, UPDATE_RECORD_SALT,
+    MAX_CONCURRENT_UPDATES, CONVERSATION_QUEUE_LIMIT, NEW_REQUEST_QUEUE_LIMIT,
+    BUSY_MESSAGE, RATE_LIMITS, RATE_LIMIT_SWEEP_SECONDS, RATE_LIMITED_MESSAGE,
+    LOG_LEVEL, LOG_JSON, LOG_SEND_SAMPLE_EVERY,
+    BACKUP_DIR, BACKUP_INTERVAL_SECONDS, BACKUP_KEEP, BACKUP_PAGES_PER_STEP,
+    BACKUP_STEP_PAUSE, CAMPAIGN_CACHE_TTL, STORAGE_BACKEND, ALBUM_DEBOUNCE_SECONDS,
+    LIVE_RESULTS_INTERVAL, LIST_PAGE_SIZE, BOT_API_URL, BOT_API_FILE_URL,
+    RECEIPT_DOWNLOAD_CONCURRENCY, RECEIPT_CACHE_DIR, RECEIPT_ZIP_SPOOL_BYTES, RECEIPT_ZIP_PART_BYTES,
+    WEBHOOK_WORKERS, WEBHOOK_URL, WEBHOOK_SECRET, JOURNAL_REPLAY_BATCH, JOURNAL_CHECKPOINT_EVENTS,
+    RECEIPT_REVIEW_BATCH, MEMBERSHIP_SYNC_SECONDS
 )
+import journal
+from albums import AlbumCollector
+from api_client import api_request, get_updates_request
+from backup import BackupManager, BackupInProgress
+from campaigns import CampaignCache
+from live_results import LiveResults
+from membership import MembershipIndex
+from phases import CampaignPhases
 from database import Database
+from health import metrics_providers
 from models import Order
+from paging import parse_page_data, render_page
+from logging_setup import setup_logging, SamplingFilter
+from ratelimit import RateLimiter
+from repository import REVIEW_APPROVED, REVIEW_REJECTED
+from receipts import ReceiptArchiver, ReceiptCache
+from update_processing import (
+    PriorityUpdateProcessor, PRIORITY_ADMIN, PRIORITY_CONVERSATION, PRIORITY_NEW
+)
 
-#!/usr/bin/env python3
-"""
-Jersey Management Telegram Bot
-Main application file with ConversationHandler for order flow
-"""
+# Enable logging (queued, written by a background thread)
+setup_logging(level=getattr(logging, LOG_LEVEL, logging.INFO), json_output=LOG_JSON)
+logger = logging.getLogger(__name__)
 
-import logging
-from datetime import datetime
-from functools import wraps
-from typing import Dict, Any
-import threading
-import os
-import time
+# One line per design per voter adds up quickly, keep a sample
+send_logger = logging.getLogger(f'{__name__}.sends')
+send_logger.addFilter(SamplingFilter(LOG_SEND_SAMPLE_EVERY))
 
-# 🌟 FIX FOR RENDER: Simple HTTP server for health checks
-from http.server import HTTPServer, BaseHTTPRequestHandler
-
-class HealthHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        self.wfile.write(b'Jersey Bot is running!')
-    
-    def log_message(self, format, *args):
-        # Suppress log messages
-        pass
-
-def run_health_server():
-    """Run a simple HTTP server on the required port"""
-    port = int(os.environ.get('PORT', 10000))
-    server = HTTPServer(('0.0.0.0', port), HealthHandler)
-    print(f"🌐 Health check server running on port {port}")
-    server.serve_forever()
-
-# Start health server in background thread
-health_thread = threading.Thread(target=run_health_server, daemon=True)
-health_thread.start()
-print("✅ Health check server started")
-
-# Give it a moment to start
-time.sleep(1)
-
-# Your existing imports...
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import (
-    Application,
-    CommandHandler,
-    CallbackQueryHandler,
-    MessageHandler,
-    filters,
-    ConversationHandler,
-    ContextTypes
-)
+# Seconds spent in each startup step, on /metrics
+startup_times = {'imports': round(time.perf_counter() - _imports_started, 4)}
 
-# Rest of your code continues exactly as before...
+# Storage, opened by main() or build_application() rather than on import
+db = None
 
-# Enable logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-# Initialize database
-db = Database()
+def open_storage():
+    """Open the configured storage backend, creating or migrating its schema"""
+    if STORAGE_BACKEND == 'memory':
+        from memory_database import MemoryDatabase
+        logger.warning("Using in-memory storage, all data is lost on restart")
+        return MemoryDatabase()
+    return Database()
 
 # Conversation states
 (
@@ -110,32 +104,91 @@ db = Database()
     DESIGN_EDIT_NAME,
     DESIGN_EDIT_DESC,
     DESIGN_EDIT_IMAGE,
-    DESIGN_CONFIRM  # Added this missing state
-) = range(12)  # Changed from 11 to 12
+    DESIGN_CONFIRM,  # Added this missing state
+    DESIGN_IMPORT
+) = range(13)
 
 # Temporary storage for user data
 user_data_cache: Dict[int, Dict[str, Any]] = {}
 
+# Database snapshots, created by build_application()
+backup_manager = None
+
+# Per-campaign deadline/design caches, created by build_application()
+campaign_cache = None
+
+# Who voted and who ordered per campaign, created by build_application()
+membership = None
+
+# Buffers /import_designs albums until complete, created by build_application()
+album_collector = None
+
+# Pinned /live_results messages, created by build_application()
+live_results = None
+
+# Open/closed flags per campaign, flipped at the deadlines, created by build_application()
+phases = None
+
+# Builds /export_receipts ZIPs, created by build_application()
+receipt_archiver = None
+
+# Campaign labels end up in file names and archive keys
+ARCHIVE_LABEL_PATTERN = re.compile(r'[\w.-]{1,32}')
+# Campaign codes double as t.me/<bot>?start=<code> deep-link payloads
+CAMPAIGN_CODE_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,32}')
+
+def current_campaign(update: Update) -> int:
+    """Campaign the user behind an update is in"""
+    return campaign_cache.campaign_for_user(update.effective_user.id)
+
+def update_priority(update: Update) -> int:
+    """Priority class of an update for the update processor"""
+    user = update.effective_user if isinstance(update, Update) else None
+    if user and user.id in ADMIN_IDS:
+        return PRIORITY_ADMIN
+    # Button presses and replies inside a running conversation
+    if user and (user.id in user_data_cache or update.callback_query):
+        return PRIORITY_CONVERSATION
+    return PRIORITY_NEW
+
+async def reply_busy(update: Update):
+    """Tell a user their update was dropped under load"""
+    try:
+        if update.callback_query:
+            await update.callback_query.answer(BUSY_MESSAGE)
+        elif update.effective_message:
+            await update.effective_message.reply_text(BUSY_MESSAGE)
+    except Exception as e:
+        logger.warning("Failed to send busy reply: %s", e)
+
 def admin_only(func):
     """Decorator to restrict commands to admins only"""
     @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         user_id = update.effective_user.id
         if user_id not in ADMIN_IDS:
-            await update.message.reply_text("⛔ This command is for admins only.")
+            await update.effective_message.reply_text("⛔ This command is for admins only.")
             return
         return await func(update, context, *args, **kwargs)
     return wrapper
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /start command"""
-    deadlines = db.get_deadlines()
+    """Handle /start command, `/start CODE` (a deep link) joins a campaign"""
+    user_id = update.effective_user.id
+    if context.args:
+        joined = db.get_campaign_by_code(context.args[0])
+        if joined:
+            campaign_cache.join(user_id, joined.id)
+    campaign_id = current_campaign(update)
+    campaign = db.get_campaign(campaign_id)
+    deadlines = campaign_cache.deadlines(campaign_id)
     
     # Register user in database
-    db.create_user(update.effective_user.id)
+    db.create_user(user_id, campaign_id)
     
     await update.message.reply_text(
         WELCOME_MESSAGE.format(
+            campaign=campaign.name,
             vote_deadline=deadlines.vote_deadline.strftime(DATE_FORMAT),
             payment_deadline=deadlines.payment_deadline.strftime(DATE_FORMAT)
         )
@@ -152,11 +205,20 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /start - Welcome message & deadlines
 /vote - Vote for jersey designs
 /order - Place your jersey order
+/join CODE - Switch to your team's campaign
 /help - Show this message
 
 **For Admins Only:**
+Admin commands act on the campaign you are in.
+
+🏆 **Campaigns:**
+/new_campaign CODE NAME - Start a campaign for a team
+/campaigns - List all campaigns
+/join CODE - Switch campaign
+
 📝 **Design Management:**
 /add_design - Add new jersey design
+/import_designs - Add designs from a photo album
 /list_designs - View all designs
 /edit_design - Edit existing design
 /delete_design - Remove a design
@@ -168,33 +230,119 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 📊 **Monitoring:**
 /results - View voting results
+/live_results - Pinned results that update as votes come in
+/live_results off - Stop updating them
 /orders - View order statistics
 /export - Export orders to CSV
+/export_receipts - Download all payment receipts as ZIP
+/review_receipts - Approve or reject payment receipts in batches
+/rebuild_stats - Recount votes and orders from the event journal
+/rebuild_stats full - The same, ignoring the last checkpoint
+/backup - Snapshot the database now
+
+🗄️ **Archives:**
+/archive_campaign LABEL - Archive this season, start fresh
+/archives - List archived campaigns
+/export_archive LABEL - Export archived orders
     """
     
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    # Command names are full of underscores, which Markdown reads as italics
+    await update.message.reply_text(help_text.replace('_', '\\_'), parse_mode='Markdown')
+
+# ==================== CAMPAIGNS ====================
+
+async def join_campaign(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /join command - switch to another team's campaign"""
+    user_id = update.effective_user.id
+    
+    if not context.args:
+        campaign = db.get_campaign(current_campaign(update))
+        await update.message.reply_text(
+            f"🏆 You are in the campaign: {campaign.name}\n\n"
+            "To switch, send /join CODE with the code your team shared."
+        )
+        return
+    
+    campaign = db.get_campaign_by_code(context.args[0])
+    if not campaign:
+        await update.message.reply_text(
+            f"❌ No campaign with code '{context.args[0]}'. Ask your team admin for the code."
+        )
+        return
+    
+    campaign_cache.join(user_id, campaign.id)
+    deadlines = campaign_cache.deadlines(campaign.id)
+    await update.message.reply_text(
+        f"✅ You joined the campaign: {campaign.name}\n\n"
+        f"🗳️ Voting Deadline: {deadlines.vote_deadline.strftime(DATE_FORMAT)}\n"
+        f"💳 Payment Deadline: {deadlines.payment_deadline.strftime(DATE_FORMAT)}\n\n"
+        "Use /vote and /order to take part."
+    )
+
+@admin_only
+async def new_campaign(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Create a campaign and switch the admin into it"""
+    if len(context.args) < 2 or not CAMPAIGN_CODE_PATTERN.fullmatch(context.args[0]):
+        await update.message.reply_text(
+            "❌ Usage: /new_campaign CODE NAME\n"
+            "Example: /new_campaign falcons-2025 Falcons Jerseys 2025\n"
+            "Codes may contain letters, digits, '_' and '-' (max 32)."
+        )
+        return
+    
+    code = context.args[0]
+    name = ' '.join(context.args[1:])
+    if db.get_campaign_by_code(code):
+        await update.message.reply_text(f"❌ A campaign with code '{code}' already exists.")
+        return
+    
+    campaign_id = db.create_campaign(code, name)
+    campaign_cache.join(update.effective_user.id, campaign_id)
+    phases.schedule(campaign_id)
+    logger.info("Campaign %s (%s) created", campaign_id, code)
+    
+    await update.message.reply_text(
+        f"✅ Campaign '{name}' created and you switched to it.\n\n"
+        f"🔗 Members join with https://t.me/{context.bot.username}?start={code}\n"
+        f"or by sending /join {code}\n\n"
+        "Next: /add_design, /set_vote_deadline and /set_payment_deadline."
+    )
+
+@admin_only
+async def list_campaigns(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """List all campaigns"""
+    current = current_campaign(update)
+    
+    text = "🏆 Campaigns:\n\n"
+    for campaign in db.get_campaigns():
+        marker = "👉 " if campaign.id == current else "• "
+        text += (f"{marker}{campaign.name} (code: {campaign.code})\n"
+                 f"   🗳️ {campaign.vote_deadline.strftime(DATE_FORMAT)}"
+                 f"  💳 {campaign.payment_deadline.strftime(DATE_FORMAT)}\n")
+    text += "\nSwitch with /join CODE"
+    await update.message.reply_text(text)
 
 # ==================== VOTING SYSTEM WITH DYNAMIC DESIGNS ====================
 
 async def vote(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /vote command - Shows all active designs"""
     user_id = update.effective_user.id
-    deadlines = db.get_deadlines()
+    campaign_id = current_campaign(update)
     
     # Check vote deadline
-    if datetime.now() > deadlines.vote_deadline:
+    if not phases.voting_open(campaign_id):
         await update.message.reply_text(
-            VOTE_DEADLINE_PASSED.format(deadline=deadlines.vote_deadline.strftime(DATE_FORMAT))
+            VOTE_DEADLINE_PASSED.format(deadline=phases.deadlines(campaign_id).vote_deadline.strftime(DATE_FORMAT))
         )
         return
     
     # Check if user already voted
-    if db.has_user_voted(user_id):
+    if membership.has_voted(user_id, campaign_id):
         await update.message.reply_text(DUPLICATE_VOTE)
         return
     
-    # Get active designs from database
-    designs = db.get_active_designs()
+    # Get the campaign's active designs
+    designs = campaign_cache.designs(campaign_id)
     
     if not designs:
         await update.message.reply_text(
@@ -225,9 +373,9 @@ async def vote(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode='Markdown',
                 reply_markup=reply_markup
             )
-            logger.info(f"Sent design {design.id} to user {user_id}")
+            send_logger.info("Sent design %s to user %s", design.id, user_id)
         except Exception as e:
-            logger.error(f"Failed to send image for design {design.id}: {e}")
+            logger.error("Failed to send image for design %s: %s", design.id, e)
             await update.message.reply_text(
                 f"❌ Failed to load image for {design.name}. Please try again later."
             )
@@ -244,32 +392,34 @@ async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = query.from_user.id
     design_id = int(query.data.replace('vote_', ''))
+    campaign_id = current_campaign(update)
     
     # Double-check deadline
-    deadlines = db.get_deadlines()
-    if datetime.now() > deadlines.vote_deadline:
+    if not phases.voting_open(campaign_id):
         await query.edit_message_caption(
-            caption=VOTE_DEADLINE_PASSED.format(deadline=deadlines.vote_deadline.strftime(DATE_FORMAT))
+            caption=VOTE_DEADLINE_PASSED.format(deadline=phases.deadlines(campaign_id).vote_deadline.strftime(DATE_FORMAT))
         )
         return
     
     # Check if user already voted (double-check)
-    if db.has_user_voted(user_id):
+    if membership.has_voted(user_id, campaign_id):
         await query.edit_message_caption(
             caption=DUPLICATE_VOTE
         )
         return
     
-    # Get design details
+    # Get design details, buttons from another campaign no longer count
     design = db.get_design(design_id)
-    if not design:
+    if not design or design.campaign_id != campaign_id:
         await query.edit_message_caption(
             caption="❌ This design is no longer available."
         )
         return
     
     # Save vote
-    db.save_vote(user_id, design_id)
+    db.save_vote(user_id, design_id, campaign_id)
+    membership.add_vote(user_id, campaign_id)
+    live_results.mark_dirty(campaign_id)
     
     # Update the message to show vote confirmation
     await query.edit_message_caption(
@@ -291,7 +441,7 @@ async def add_design_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
     # Initialize user data
-    user_data_cache[user_id] = {'action': 'add_design'}
+    user_data_cache[user_id] = {'action': 'add_design', 'campaign_id': current_campaign(update)}
     
     await update.message.reply_text(
         "📝 **Add New Jersey Design**\n\n"
@@ -366,8 +516,11 @@ async def add_design_get_image(update: Update, context: ContextTypes.DEFAULT_TYP
     design_id = db.add_design(
         name=design_data['design_name'],
         description=design_data['design_description'],
-        image_file_id=file_id
+        image_file_id=file_id,
+        campaign_id=design_data['campaign_id']
     )
+    campaign_cache.invalidate(design_data['campaign_id'])
+    live_results.mark_dirty(design_data['campaign_id'])
     
     # Clear cached data
     del user_data_cache[user_id]
@@ -385,26 +538,42 @@ async def add_design_get_image(update: Update, context: ContextTypes.DEFAULT_TYP
     
     return ConversationHandler.END
 
+# Longer names are cut in listings, so any single row fits a message
+LISTED_NAME_LENGTH = 200
+
+def listed_name(name: str) -> str:
+    return name if len(name) <= LISTED_NAME_LENGTH else name[:LISTED_NAME_LENGTH] + '...'
+
+def design_entry(number: int, design) -> str:
+    entry = f"{number}. **{listed_name(design.name)}**\n"
+    if design.description:
+        entry += f"   📝 {design.description[:50]}{'...' if len(design.description) > 50 else ''}\n"
+    return entry + f"   🆔 ID: `{design.id}`\n\n"
+
+def designs_page(campaign_id: int, forward: bool = True, cursor: Optional[Tuple[int, ...]] = None,
+                 index: int = 0) -> Tuple[Optional[str], Optional[InlineKeyboardMarkup]]:
+    """Text and buttons of a /list_designs page, no text when there are no designs"""
+    text, keyboard, rows = render_page(
+        partial(db.get_designs_page, campaign_id), lambda design: (design.display_order, design.id),
+        design_entry, "📋 **Current Jersey Designs:**\n\n",
+        "\nUse /edit_design to modify or /delete_design to remove.",
+        'dp', campaign_id, forward, cursor, index, LIST_PAGE_SIZE
+    )
+    if not rows and cursor is not None:
+        # The rows around the cursor were deleted meanwhile
+        return designs_page(campaign_id)
+    return (text if rows else None), keyboard
+
 @admin_only
 async def list_designs(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """List all designs"""
-    designs = db.get_active_designs()
+    """List designs, a page at a time"""
+    text, keyboard = designs_page(current_campaign(update))
     
-    if not designs:
+    if text is None:
         await update.message.reply_text("📭 No designs found. Use /add_design to add one.")
         return
     
-    message = "📋 **Current Jersey Designs:**\n\n"
-    
-    for i, design in enumerate(designs, 1):
-        message += f"{i}. **{design.name}**\n"
-        if design.description:
-            message += f"   📝 {design.description[:50]}{'...' if len(design.description) > 50 else ''}\n"
-        message += f"   🆔 ID: `{design.id}`\n\n"
-    
-    message += "\nUse /edit_design to modify or /delete_design to remove."
-    
-    await update.message.reply_text(message, parse_mode='Markdown')
+    await update.message.reply_text(text, parse_mode='Markdown', reply_markup=keyboard)
 
 @admin_only
 async def delete_design(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -420,46 +589,137 @@ async def delete_design(update: Update, context: ContextTypes.DEFAULT_TYPE):
         design_id = int(context.args[0])
         design = db.get_design(design_id)
         
-        if not design:
+        if not design or design.campaign_id != current_campaign(update):
             await update.message.reply_text(f"❌ Design with ID {design_id} not found.")
             return
         
         # Soft delete
         db.delete_design(design_id)
+        campaign_cache.invalidate(design.campaign_id)
+        live_results.mark_dirty(design.campaign_id)
         
         await update.message.reply_text(
             f"✅ Design **{design.name}** has been deleted.\n"
             f"It will no longer appear in voting.",
             parse_mode='Markdown'
         )
-        
+    
     except ValueError:
         await update.message.reply_text("❌ Invalid design ID. Please provide a number.")
     except Exception as e:
-        logger.error(f"Delete design error: {e}")
+        logger.error("Delete design error: %s", e)
         await update.message.reply_text("❌ Failed to delete design.")
 
+def parse_design_caption(caption: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Split a `name | description` caption, None without a valid name"""
+    name, _, description = (caption or '').partition('|')
+    name = name.strip()
+    if not name or len(name) > 100:
+        return None
+    return name, description.strip()
+
+@admin_only
+async def import_designs_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Start bulk design import from photo albums"""
+    user_id = update.effective_user.id
+    user_data_cache[user_id] = {'action': 'import_designs', 'campaign_id': current_campaign(update)}
+    
+    await update.message.reply_text(
+        "🖼️ **Import Jersey Designs**\n\n"
+        "Send an album of design photos. Caption each photo with\n"
+        "`Name | Description`\n"
+        "(the description is optional).\n\n"
+        "Designs are added in album order after the current ones.\n"
+        "Send /done when finished.",
+        parse_mode='Markdown'
+    )
+    return DESIGN_IMPORT
+
+async def import_designs_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Collect one photo of an album"""
+    user_id = update.effective_user.id
+    design_data = user_data_cache.get(user_id)
+    if not design_data:
+        await update.message.reply_text("❌ Session expired. Please start over with /import_designs")
+        return ConversationHandler.END
+    
+    item = (update.message, design_data['campaign_id'])
+    if update.message.media_group_id:
+        album_collector.add((user_id, update.message.media_group_id), item)
+    else:
+        await import_album([item])
+    return DESIGN_IMPORT
+
+async def import_album(items: List[Tuple[Any, int]]):
+    """Add the designs of one complete album in a single transaction"""
+    items.sort(key=lambda item: item[0].message_id)
+    first_message, campaign_id = items[0]
+    designs = []
+    skipped = []
+    for position, (message, _) in enumerate(items, 1):
+        parsed = parse_design_caption(message.caption)
+        if parsed is None:
+            skipped.append(str(position))
+            continue
+        designs.append((parsed[0], parsed[1], message.photo[-1].file_id))
+    
+    try:
+        design_ids = db.add_designs(designs, campaign_id) if designs else []
+    except Exception as e:
+        logger.error("Design import failed: %s", e)
+        await first_message.reply_text("❌ Failed to import the album. No designs were added.")
+        return
+    campaign_cache.invalidate(campaign_id)
+    live_results.mark_dirty(campaign_id)
+    
+    # Plain text, design names may contain Markdown characters
+    message = f"✅ Imported {len(design_ids)} design(s):\n"
+    for design_id, (name, _, _) in zip(design_ids, designs):
+        message += f"🆔 {design_id}: {name}\n"
+    if skipped:
+        message += (f"\n⚠️ Skipped photo(s) {', '.join(skipped)}: "
+                    f"caption must be 'Name | Description' with a name of 1-100 characters.")
+    await first_message.reply_text(message)
+
+async def import_designs_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Finish bulk import, storing albums still being collected"""
+    user_id = update.effective_user.id
+    await album_collector.flush(lambda key: key[0] == user_id)
+    user_data_cache.pop(user_id, None)
+    
+    await update.message.reply_text(
+        f"✅ Import finished. {len(campaign_cache.designs(current_campaign(update)))} active design(s).\n"
+        f"Use /list_designs to review them."
+    )
+    return ConversationHandler.END
+
+async def import_designs_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cancel bulk import, dropping albums still being collected"""
+    user_id = update.effective_user.id
+    album_collector.discard(lambda key: key[0] == user_id)
+    return await cancel(update, context)
+
 # ==================== ORDER CONVERSATION HANDLERS ====================
 
 async def order_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start the order conversation"""
     user_id = update.effective_user.id
-    deadlines = db.get_deadlines()
+    campaign_id = current_campaign(update)
     
     # Check payment deadline
-    if datetime.now() > deadlines.payment_deadline:
+    if not phases.ordering_open(campaign_id):
         await update.message.reply_text(
-            ORDER_DEADLINE_PASSED.format(deadline=deadlines.payment_deadline.strftime(DATE_FORMAT))
+            ORDER_DEADLINE_PASSED.format(deadline=phases.deadlines(campaign_id).payment_deadline.strftime(DATE_FORMAT))
         )
         return ConversationHandler.END
     
     # Check if user already ordered
-    if db.has_user_ordered(user_id):
+    if membership.has_ordered(user_id, campaign_id):
         await update.message.reply_text(DUPLICATE_ORDER)
         return ConversationHandler.END
     
     # Initialize user data
-    user_data_cache[user_id] = {'telegram_id': user_id}
+    user_data_cache[user_id] = {'telegram_id': user_id, 'campaign_id': campaign_id}
     
     await update.message.reply_text(
         "📝 Let's start your jersey order!\n\n"
@@ -566,6 +826,13 @@ async def get_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Session expired. Please start over with /order")
         return ConversationHandler.END
     
+    # The final orders snapshot is taken at the deadline, later receipts would miss it
+    if not phases.ordering_open(order_data['campaign_id']):
+        del user_data_cache[user_id]
+        deadline = phases.deadlines(order_data['campaign_id']).payment_deadline
+        await update.message.reply_text(ORDER_DEADLINE_PASSED.format(deadline=deadline.strftime(DATE_FORMAT)))
+        return ConversationHandler.END
+    
     order = Order(
         telegram_id=user_id,
         full_name=order_data['full_name'],
@@ -573,10 +840,13 @@ async def get_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE):
         shirt_name=order_data['shirt_name'],
         size=order_data['size'],
         receipt_file_id=file_id,
-        payment_time=datetime.now()
+        payment_time=datetime.now(),
+        campaign_id=order_data['campaign_id'],
+        receipt_file_unique_id=photo.file_unique_id
     )
     
     db.save_order(order)
+    membership.add_order(order.telegram_id, order.campaign_id)
     
     # Clear cached data
     del user_data_cache[user_id]
@@ -620,7 +890,10 @@ async def set_vote_deadline(update: Update, context: ContextTypes.DEFAULT_TYPE):
         deadline_str = ' '.join(context.args)
         deadline = datetime.strptime(deadline_str, DATE_FORMAT)
         
-        db.set_vote_deadline(deadline)
+        campaign_id = current_campaign(update)
+        db.set_vote_deadline(deadline, campaign_id)
+        campaign_cache.invalidate(campaign_id)
+        phases.schedule(campaign_id)
         
         await update.message.reply_text(
             f"✅ Vote deadline updated to: {deadline.strftime(DATE_FORMAT)}"
@@ -645,7 +918,10 @@ async def set_payment_deadline(update: Update, context: ContextTypes.DEFAULT_TYP
         deadline_str = ' '.join(context.args)
         deadline = datetime.strptime(deadline_str, DATE_FORMAT)
         
-        db.set_payment_deadline(deadline)
+        campaign_id = current_campaign(update)
+        db.set_payment_deadline(deadline, campaign_id)
+        campaign_cache.invalidate(campaign_id)
+        phases.schedule(campaign_id)
         
         await update.message.reply_text(
             f"✅ Payment deadline updated to: {deadline.strftime(DATE_FORMAT)}"
@@ -659,7 +935,7 @@ async def set_payment_deadline(update: Update, context: ContextTypes.DEFAULT_TYP
 @admin_only
 async def show_deadlines(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show current deadlines"""
-    deadlines = db.get_deadlines()
+    deadlines = campaign_cache.deadlines(current_campaign(update))
     
     await update.message.reply_text(
         f"📅 Current Deadlines:\n\n"
@@ -667,15 +943,88 @@ async def show_deadlines(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"💳 Payment Deadline: {deadlines.payment_deadline.strftime(DATE_FORMAT)}"
     )
 
+def results_entry(number: int, row) -> str:
+    return f"{number}. {listed_name(row[1])}: **{row[2]}** votes\n"
+
+def results_page(campaign_id: int, mode: Optional[str] = None, forward: bool = True,
+                 cursor: Optional[Tuple[int, ...]] = None,
+                 index: int = 0) -> Tuple[Optional[str], Optional[InlineKeyboardMarkup]]:
+    """Text and buttons of a /results page, no text when there are no designs
+    
+    Live results page by (votes, design id), mode 'rl'; once voting has
+    closed, the final snapshot pages by position, mode 'rf'.
+    """
+    if phases.voting_open(campaign_id):
+        current, heading = 'rl', "📊 **Voting Results:**\n\n"
+        designs, total = db.count_results(campaign_id)
+        fetch = partial(db.get_results_page, campaign_id)
+        key = lambda row: (row[2], row[0])  # (votes, design id)
+    else:
+        current, heading = 'rf', "🏁 **Final Voting Results:**\n\n"
+        deadline = phases.deadlines(campaign_id).vote_deadline
+        designs, total = db.count_results(campaign_id, deadline)
+        if not designs:
+            # The deadline job has not taken the snapshot yet
+            db.freeze_results(campaign_id, deadline)
+            designs, total = db.count_results(campaign_id, deadline)
+        
+        def fetch(after, before, limit):
+            return db.get_final_results_page(campaign_id, deadline, after=after and after[0],
+                                             before=before and before[0], limit=limit)
+        key = lambda row: (row[0],)  # position
+    
+    if not designs:
+        return None, None
+    if mode is not None and mode != current:
+        # Voting closed (or reopened) since the page was sent
+        forward, cursor, index = True, None, 0
+    
+    text, keyboard, rows = render_page(
+        fetch, key, results_entry, heading, f"\n**Total Votes: {total}**",
+        current, campaign_id, forward, cursor, index, LIST_PAGE_SIZE
+    )
+    if not rows and cursor is not None:
+        return results_page(campaign_id)
+    return text, keyboard
+
 @admin_only
 async def show_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show voting results"""
-    results = db.get_vote_results()
+    """Show voting results a page at a time, the final snapshot once voting has closed"""
+    text, keyboard = results_page(current_campaign(update))
     
-    if not results:
+    if text is None:
         await update.message.reply_text("No votes have been cast yet.")
         return
     
+    await update.message.reply_text(text, parse_mode='Markdown', reply_markup=keyboard)
+
+@admin_only
+async def page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Turn a /list_designs or /results message to another page"""
+    query = update.callback_query
+    await query.answer()
+    
+    try:
+        mode, campaign_id, forward, cursor, index = parse_page_data(query.data)
+    except ValueError:
+        return
+    
+    if mode == 'dp':
+        text, keyboard = designs_page(campaign_id, forward, cursor, index)
+        empty = "📭 No designs found. Use /add_design to add one."
+    else:
+        text, keyboard = results_page(campaign_id, mode, forward, cursor, index)
+        empty = "No votes have been cast yet."
+    
+    try:
+        await query.edit_message_text(text or empty, parse_mode='Markdown', reply_markup=keyboard)
+    except BadRequest as e:
+        # Pressed twice, or nothing changed since
+        if 'not modified' not in str(e).lower():
+            raise
+
+def format_results(results) -> str:
+    """Markdown tally of (design name, votes) rows"""
     message = "📊 **Voting Results:**\n\n"
     total_votes = 0
     
@@ -684,37 +1033,513 @@ async def show_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
         total_votes += count
     
     message += f"\n**Total Votes: {total_votes}**"
+    return message
+
+def format_live_results(results) -> str:
+    """Tally for the pinned live results message"""
+    if not results:
+        return "📊 No designs to vote on yet."
+    return (
+        format_results(results) +
+        f"\n\n🔴 Live, updated {datetime.now().strftime('%H:%M:%S')}"
+    )
+
+@admin_only
+async def show_live_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Pin a results message that updates as votes come in, `off` stops it"""
+    chat_id = update.effective_chat.id
+    
+    if context.args and context.args[0].lower() == 'off':
+        message_id = live_results.unsubscribe(chat_id)
+        if message_id is None:
+            await update.message.reply_text("ℹ️ No live results are running in this chat.")
+            return
+        try:
+            await context.bot.unpin_chat_message(chat_id, message_id=message_id)
+        except TelegramError as e:
+            logger.warning("Could not unpin live results: %s", e)
+        await update.message.reply_text("⏹️ Live results stopped.")
+        return
+    
+    campaign_id = current_campaign(update)
+    results = db.get_vote_results(campaign_id)
+    message = await update.message.reply_text(format_live_results(results), parse_mode='Markdown')
+    try:
+        await message.pin(disable_notification=True)
+    except TelegramError as e:
+        # Still edited in place, just not pinned
+        logger.warning("Could not pin live results: %s", e)
     
-    await update.message.reply_text(message, parse_mode='Markdown')
+    previous = live_results.subscribe(campaign_id, chat_id, message.message_id, results)
+    if previous is not None:
+        try:
+            await context.bot.unpin_chat_message(chat_id, message_id=previous)
+        except TelegramError as e:
+            logger.warning("Could not unpin old live results: %s", e)
 
 @admin_only
 async def show_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show order statistics"""
-    total = db.get_total_orders()
-    await update.message.reply_text(f"📦 **Total Orders:** {total}", parse_mode='Markdown')
+    """Show order statistics, from the final snapshot once ordering has closed"""
+    campaign_id = current_campaign(update)
+    if phases.ordering_open(campaign_id):
+        total = db.get_total_orders(campaign_id)
+        await update.message.reply_text(f"📦 **Total Orders:** {total}", parse_mode='Markdown')
+    else:
+        total = db.freeze_orders(campaign_id, phases.deadlines(campaign_id).payment_deadline)
+        await update.message.reply_text(f"🏁 **Final Orders:** {total}", parse_mode='Markdown')
 
 @admin_only
 async def export_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Export orders to CSV"""
     try:
-        csv_data = db.export_orders_to_csv()
+        campaign = db.get_campaign(current_campaign(update))
+        if phases.ordering_open(campaign.id):
+            csv_data = db.export_orders_to_csv(campaign.id)
+        else:
+            deadline = phases.deadlines(campaign.id).payment_deadline
+            db.freeze_orders(campaign.id, deadline)
+            csv_data = db.export_final_orders_to_csv(campaign.id, deadline)
         
         # Send as file
         await update.message.reply_document(
             document=csv_data.encode('utf-8'),
-            filename=f'orders_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+            filename=f'orders_{campaign.code}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
             caption="📊 Orders export completed!"
         )
     except Exception as e:
-        logger.error(f"Export failed: {e}")
+        logger.error("Export failed: %s", e)
         await update.message.reply_text("❌ Failed to export orders. Please try again.")
 
+@admin_only
+async def export_receipts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send every payment receipt of the campaign, zipped"""
+    campaign = db.get_campaign(current_campaign(update))
+    receipts = db.get_receipts(campaign.id)
+    
+    if not receipts:
+        await update.message.reply_text("📭 No receipts to export yet.")
+        return
+    
+    await update.message.reply_text(f"📥 Collecting {len(receipts)} receipt(s)...")
+    try:
+        export = await receipt_archiver.build(context.bot, receipts)
+    except Exception as e:
+        logger.error("Receipt export failed: %s", e)
+        await update.message.reply_text("❌ Failed to export receipts. Please try again.")
+        return
+    
+    try:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for number, part in enumerate(export.parts, 1):
+            if len(export.parts) > 1:
+                suffix, caption = f'_part{number}', f"🧾 Receipts, part {number} of {len(export.parts)}"
+            else:
+                suffix, caption = '', "🧾 Receipts export completed!"
+            # python-telegram-bot reads uploads into memory whole, one part at a time
+            await update.message.reply_document(
+                document=part.read(),
+                filename=f'receipts_{campaign.code}_{stamp}{suffix}.zip',
+                caption=caption
+            )
+    except Exception as e:
+        logger.error("Sending receipts failed: %s", e)
+        await update.message.reply_text("❌ Failed to send the receipts. Please try again.")
+        return
+    finally:
+        export.close()
+    
+    if export.failed:
+        shown = ', '.join(map(str, export.failed[:50])) + (', ...' if len(export.failed) > 50 else '')
+        await update.message.reply_text(
+            f"⚠️ {len(export.failed)} receipt(s) could not be downloaded, orders: {shown}"
+        )
+
+def review_keyboard(decisions: List[Tuple[int, str]], campaign_id: int) -> InlineKeyboardMarkup:
+    """Toggle per order, five to a row, then save and skip
+
+    Each toggle's data holds the order's current decision (rv:a:ID or
+    rv:r:ID) and save and skip hold the page's campaign (rv:s:CAMPAIGN,
+    rv:n:CAMPAIGN), so a review page keeps no state in the bot.
+    """
+    toggles = [
+        InlineKeyboardButton(f"{'✅' if status == REVIEW_APPROVED else '❌'} #{order_id}",
+                             callback_data=f"rv:{'a' if status == REVIEW_APPROVED else 'r'}:{order_id}")
+        for order_id, status in decisions
+    ]
+    rows = [toggles[i:i + 5] for i in range(0, len(toggles), 5)]
+    rows.append([InlineKeyboardButton("💾 Save & next", callback_data=f'rv:s:{campaign_id}'),
+                 InlineKeyboardButton("⏭ Skip", callback_data=f'rv:n:{campaign_id}')])
+    return InlineKeyboardMarkup(rows)
+
+def review_decisions(markup: Optional[InlineKeyboardMarkup]) -> List[Tuple[int, str]]:
+    """(order id, status) per toggle of a review_keyboard"""
+    decisions = []
+    for row in (markup.inline_keyboard if markup else ()):
+        for button in row:
+            parts = str(button.callback_data).split(':')
+            if len(parts) == 3 and parts[1] in ('a', 'r'):
+                decisions.append((int(parts[2]), REVIEW_APPROVED if parts[1] == 'a' else REVIEW_REJECTED))
+    return decisions
+
+def review_campaign(markup: Optional[InlineKeyboardMarkup]) -> Optional[int]:
+    """Campaign of a review_keyboard's orders, None for keyboards sent without it"""
+    for row in (markup.inline_keyboard if markup else ()):
+        for button in row:
+            parts = str(button.callback_data).split(':')
+            if len(parts) == 3 and parts[1] == 's':
+                return int(parts[2])
+    return None
+
+async def send_review_page(message, campaign_id: int, after: Optional[int] = None):
+    """Send the next unreviewed receipts after order `after` as one album, then their keyboard"""
+    orders = db.get_unreviewed_orders(campaign_id, after, RECEIPT_REVIEW_BATCH)
+    if not orders:
+        remaining = db.count_unreviewed_orders(campaign_id) if after else 0
+        if remaining:
+            await message.reply_text(
+                f"🏁 End of the queue. {remaining} skipped receipt(s) are still unreviewed, "
+                "/review_receipts starts over."
+            )
+        else:
+            await message.reply_text("🎉 No receipts left to review.")
+        return
+    
+    captions = [
+        f"#{order_id} · {full_name}\n👕 {shirt_number} {shirt_name} · {size}"
+        for order_id, full_name, shirt_number, shirt_name, size, _ in orders
+    ]
+    try:
+        # An album takes 2-10 photos
+        if len(orders) == 1:
+            await message.reply_photo(photo=orders[0][5], caption=captions[0])
+        else:
+            await message.reply_media_group(
+                [InputMediaPhoto(row[5], caption=caption) for row, caption in zip(orders, captions)]
+            )
+    except TelegramError as e:
+        logger.error("Sending receipts %s-%s for review failed: %s", orders[0][0], orders[-1][0], e)
+        await message.reply_text("⚠️ Some receipts could not be shown, check them with /export_receipts.")
+    
+    await message.reply_text(
+        f"🧾 {db.count_unreviewed_orders(campaign_id)} receipt(s) to review, "
+        f"these are orders #{orders[0][0]}-#{orders[-1][0]}.\n"
+        "Tap an order to switch between ✅ approve and ❌ reject, then save.",
+        reply_markup=review_keyboard([(row[0], REVIEW_APPROVED) for row in orders], campaign_id)
+    )
+
+@admin_only
+async def review_receipts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Page through the campaign's unreviewed payment receipts"""
+    await send_review_page(update.message, current_campaign(update))
+
+@admin_only
+async def review_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Toggle an order, or save or skip a /review_receipts page"""
+    query = update.callback_query
+    markup = query.message.reply_markup if query.message else None
+    decisions = review_decisions(markup)
+    parts = query.data.split(':')
+    if not decisions:
+        await query.answer()
+        return
+    # Page within the reviewed orders' campaign, the admin may have switched since
+    campaign_id = review_campaign(markup) or current_campaign(update)
+    
+    if parts[1] in ('a', 'r') and len(parts) == 3:
+        order_id = int(parts[2])
+        flipped = REVIEW_REJECTED if parts[1] == 'a' else REVIEW_APPROVED
+        await query.answer()
+        try:
+            await query.edit_message_reply_markup(review_keyboard(
+                [(o, flipped if o == order_id else status) for o, status in decisions], campaign_id
+            ))
+        except BadRequest as e:
+            # Tapped twice before the first edit arrived
+            if 'not modified' not in str(e).lower():
+                raise
+        return
+    
+    first, last = decisions[0][0], decisions[-1][0]
+    if parts[1] == 's':
+        reviewed = set(db.review_orders(decisions, reviewer=update.effective_user.id))
+        approved = sum(1 for order_id, status in decisions if order_id in reviewed and status == REVIEW_APPROVED)
+        text = f"💾 Orders #{first}-#{last}: {approved} approved, {len(reviewed) - approved} rejected"
+        if len(reviewed) < len(decisions):
+            text += f", {len(decisions) - len(reviewed)} were already reviewed"
+        await query.answer("💾 Saved")
+    else:
+        text = f"⏭ Skipped orders #{first}-#{last}"
+        await query.answer()
+    
+    try:
+        # Dropping the keyboard keeps the page from being saved twice
+        await query.edit_message_text(text)
+    except BadRequest as e:
+        if 'not modified' not in str(e).lower():
+            raise
+        return
+    await send_review_page(query.message, campaign_id, last)
+
+@admin_only
+async def rebuild_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Rebuild vote and order counts from the event journal and check them against the tables"""
+    use_checkpoint = not (context.args and context.args[0] == 'full')
+    campaign_id = current_campaign(update)
+    await update.message.reply_text("🔁 Replaying the event journal...")
+    
+    def rebuild():
+        started = time.perf_counter()
+        checkpoint = journal.load_checkpoint(db) if use_checkpoint else None
+        resumed_at = checkpoint.seq if checkpoint else 0
+        aggregates = journal.replay(db, checkpoint or journal.Aggregates(), batch=JOURNAL_REPLAY_BATCH,
+                                    checkpoint_every=JOURNAL_CHECKPOINT_EVENTS)
+        elapsed = time.perf_counter() - started
+        return aggregates, resumed_at, elapsed, journal.verify(aggregates, db, campaign_id)
+    
+    try:
+        aggregates, resumed_at, elapsed, problems = await asyncio.to_thread(rebuild)
+    except Exception as e:
+        logger.error("Journal replay failed: %s", e)
+        await update.message.reply_text("❌ Replaying the journal failed. Check the logs.")
+        return
+    
+    sizes = aggregates.order_sizes(campaign_id)
+    by_size = ', '.join(f"{size} {sizes[size]}" for size in SHIRT_SIZES if sizes[size])
+    text = (
+        f"📜 Replayed {aggregates.seq - resumed_at} events in {elapsed:.2f}s"
+        f"{f' from the checkpoint at #{resumed_at}' if resumed_at else ''}, {aggregates.seq} in total\n\n"
+        f"🗳️ Voters: {len(aggregates.votes.get(campaign_id, ()))}\n"
+        f"📦 Orders: {sum(sizes.values())}{f' ({by_size})' if by_size else ''}\n\n"
+    )
+    if problems:
+        logger.warning("Journal replay disagrees with the tables: %s", problems)
+        # Writes landing during the replay show up here too, a second run tells them apart
+        text += "⚠️ The tables disagree with the journal:\n" + '\n'.join(f"• {p}" for p in problems[:20])
+    else:
+        text += "✅ Matches the stored votes and orders"
+    await update.message.reply_text(text)
+
+@admin_only
+async def backup_database(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Take a database snapshot now"""
+    if backup_manager is None:
+        await update.message.reply_text("❌ Backups are not available with in-memory storage.")
+        return
+    await update.message.reply_text("💾 Backup started...")
+    try:
+        path = await asyncio.to_thread(backup_manager.snapshot)
+    except BackupInProgress:
+        await update.message.reply_text("⏳ A backup is already running. Please wait.")
+        return
+    except Exception as e:
+        logger.error("Backup failed: %s", e)
+        await update.message.reply_text("❌ Backup failed. Check the logs.")
+        return
+    
+    size_kb = os.path.getsize(path) / 1024
+    await update.message.reply_text(
+        f"✅ Backup saved: {os.path.basename(path)}\n"
+        f"📦 Size: {size_kb:.0f} KB, took {backup_manager.last_duration:.1f}s\n"
+        f"🗂️ Keeping the newest {backup_manager.keep} snapshots"
+    )
+
+async def sync_membership(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback applying journal events written by other processes"""
+    membership.sync()
+
+async def scheduled_backup(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback for periodic snapshots"""
+    try:
+        await asyncio.to_thread(backup_manager.snapshot)
+    except BackupInProgress:
+        logger.info("Skipping scheduled backup, one is already running")
+    except Exception as e:
+        logger.error("Scheduled backup failed: %s", e)
+
+@admin_only
+async def archive_campaign(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Archive the current campaign's season and start a fresh one"""
+    if not context.args or not ARCHIVE_LABEL_PATTERN.fullmatch(context.args[0]):
+        await update.message.reply_text(
+            "❌ Usage: /archive_campaign LABEL\n"
+            "Example: /archive_campaign 2024-season\n"
+            "Labels may contain letters, digits, '.', '_' and '-' (max 32)."
+        )
+        return
+    label = context.args[0]
+    if any(campaign['label'] == label for campaign in db.get_archived_campaigns()):
+        await update.message.reply_text(f"❌ Campaign '{label}' is already archived. See /archives")
+        return
+    
+    await update.message.reply_text(f"🗄️ Archiving campaign '{label}'...")
+    # Keep a restore point in case the wrong campaign gets archived
+    if backup_manager is not None:
+        try:
+            await asyncio.to_thread(backup_manager.snapshot)
+        except BackupInProgress:
+            pass
+        except Exception as e:
+            logger.error("Pre-archive backup failed: %s", e)
+            await update.message.reply_text("❌ Backup before archiving failed, nothing was archived.")
+            return
+    
+    campaign_id = current_campaign(update)
+    try:
+        counts = await asyncio.to_thread(db.archive_campaign, label, campaign_id)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
+    except Exception as e:
+        logger.error("Archiving campaign %s failed: %s", label, e)
+        await update.message.reply_text("❌ Archiving failed, nothing was changed. Check the logs.")
+        return
+    
+    campaign_cache.invalidate(campaign_id)
+    # Applies the archive, and any vote saved after it, from the journal
+    membership.sync()
+    live_results.mark_dirty(campaign_id)
+    phases.schedule(campaign_id)
+    logger.info("Archived campaign %s as %s: %s", campaign_id, label, counts)
+    await update.message.reply_text(
+        f"✅ Campaign '{label}' archived!\n\n"
+        f"🗳️ Votes: {counts['votes']}\n"
+        f"📦 Orders: {counts['orders']}\n"
+        f"🎨 Inactive designs: {counts['designs']}\n\n"
+        "⏰ Deadlines were reset, set the new ones with "
+        "/set_vote_deadline and /set_payment_deadline.\n"
+        f"📤 Export the archived orders with /export_archive {label}"
+    )
+
+@admin_only
+async def list_archives(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """List archived campaigns"""
+    campaigns = db.get_archived_campaigns()
+    if not campaigns:
+        await update.message.reply_text("🗄️ No archived campaigns yet.")
+        return
+    
+    text = "🗄️ **Archived Campaigns:**\n\n"
+    for campaign in campaigns:
+        text += (f"• `{campaign['label']}` ({campaign['archived_at'][:10]}): "
+                 f"{campaign['votes']} votes, {campaign['orders']} orders\n")
+    await update.message.reply_text(text, parse_mode='Markdown')
+
+@admin_only
+async def export_archive(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Export an archived campaign's orders to CSV"""
+    if not context.args:
+        await update.message.reply_text("❌ Usage: /export_archive LABEL (see /archives)")
+        return
+    label = context.args[0]
+    
+    if not any(campaign['label'] == label for campaign in db.get_archived_campaigns()):
+        await update.message.reply_text(f"❌ No archived campaign '{label}'. See /archives")
+        return
+    try:
+        csv_data = db.export_archived_orders_to_csv(label)
+        await update.message.reply_document(
+            document=csv_data.encode('utf-8'),
+            filename=f'orders_{label}.csv',
+            caption=f"📊 Archived orders of '{label}'"
+        )
+    except Exception as e:
+        logger.error("Archive export failed: %s", e)
+        await update.message.reply_text("❌ Failed to export archived orders. Please try again.")
+
 # ==================== MAIN FUNCTION ====================
 
-def main():
-    """Start the bot"""
-    # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+def default_builder(polling: bool = True):
+    """ApplicationBuilder for the configured Bot API server and HTTP pools
+    
+    Without `polling` there is no Updater, updates are put on the
+    application's update_queue by the caller (see workers.py).
+    """
+    builder = Application.builder().token(BOT_TOKEN)
+    if BOT_API_URL:
+        builder = builder.base_url(BOT_API_URL).base_file_url(BOT_API_FILE_URL)
+    request = api_request()
+    builder = builder.request(request)
+    metrics_providers['api'] = request.stats
+    if not polling:
+        return builder.updater(None)
+    # Replies and uploads get their own pool, getUpdates never takes a connection from them
+    updates_request = get_updates_request()
+    metrics_providers['get_updates'] = updates_request.stats
+    return builder.get_updates_request(updates_request)
+
+def build_application(builder=None, max_concurrent_updates: int = MAX_CONCURRENT_UPDATES) -> Application:
+    """Build the application and register all handlers"""
+    global db
+    if db is None:
+        db = open_storage()
+    if builder is None:
+        builder = default_builder()
+    # Different users in parallel, each user's updates in order, admins first
+    update_processor = PriorityUpdateProcessor(
+        max_concurrent_updates,
+        classify=update_priority,
+        queue_limits={
+            PRIORITY_CONVERSATION: CONVERSATION_QUEUE_LIMIT,
+            PRIORITY_NEW: NEW_REQUEST_QUEUE_LIMIT
+        },
+        shed_callback=reply_busy
+    )
+    metrics_providers['updates'] = update_processor.stats
+    application = builder.concurrent_updates(update_processor).build()
+    
+    global campaign_cache
+    campaign_cache = CampaignCache(db, ttl=CAMPAIGN_CACHE_TTL)
+    metrics_providers['campaigns'] = campaign_cache.stats
+    
+    global membership
+    step = time.perf_counter()
+    membership = MembershipIndex(db, batch=JOURNAL_REPLAY_BATCH)
+    membership.load()
+    startup_times['membership'] = round(time.perf_counter() - step, 4)
+    metrics_providers['membership'] = membership.stats
+    if application.job_queue and MEMBERSHIP_SYNC_SECONDS > 0:
+        application.job_queue.run_repeating(
+            sync_membership, interval=MEMBERSHIP_SYNC_SECONDS, name='membership_sync'
+        )
+    
+    global album_collector
+    album_collector = AlbumCollector(import_album, delay=ALBUM_DEBOUNCE_SECONDS)
+    metrics_providers['albums'] = album_collector.stats
+    
+    global live_results
+    live_results = LiveResults(
+        application.bot, db.get_vote_results, format_live_results, interval=LIVE_RESULTS_INTERVAL
+    )
+    metrics_providers['live_results'] = live_results.stats
+    
+    global phases
+    phases = CampaignPhases(db, application.job_queue)
+    phases.load()
+    metrics_providers['phases'] = phases.stats
+    
+    global receipt_archiver
+    receipt_archiver = ReceiptArchiver(
+        ReceiptCache(RECEIPT_CACHE_DIR), concurrency=RECEIPT_DOWNLOAD_CONCURRENCY,
+        spool_size=RECEIPT_ZIP_SPOOL_BYTES, part_size=RECEIPT_ZIP_PART_BYTES
+    )
+    metrics_providers['receipts'] = receipt_archiver.stats
+    
+    # Record incoming updates for replay.py (opt-in)
+    if UPDATE_RECORD_FILE:
+        from recorder import UpdateRecorder
+        recorder = UpdateRecorder(UPDATE_RECORD_FILE, UPDATE_RECORD_SALT, keep_ids=ADMIN_IDS)
+        application.add_handler(TypeHandler(Update, recorder.record), group=-100)
+        logger.info("Recording updates to %s", UPDATE_RECORD_FILE)
+    
+    # Drop per-user floods before any handler touches the database
+    rate_limiter = RateLimiter(
+        RATE_LIMITS,
+        exempt_ids=ADMIN_IDS,
+        sweep_interval=RATE_LIMIT_SWEEP_SECONDS,
+        notice=RATE_LIMITED_MESSAGE
+    )
+    application.add_handler(TypeHandler(Update, rate_limiter.check), group=-50)
+    metrics_providers['rate_limit'] = rate_limiter.stats
     
     # Create conversation handler for orders
     order_conv_handler = ConversationHandler(
@@ -747,34 +1572,123 @@ def main():
         persistent=False
     )
     
+    # Create conversation handler for importing designs from albums
+    import_designs_conv_handler = ConversationHandler(
+        entry_points=[CommandHandler('import_designs', import_designs_start)],
+        states={
+            DESIGN_IMPORT: [
+                MessageHandler(filters.PHOTO, import_designs_photo),
+                CommandHandler('done', import_designs_done)
+            ],
+        },
+        fallbacks=[CommandHandler('cancel', import_designs_cancel)],
+        name="import_designs_conversation",
+        persistent=False
+    )
+    
     # Register handlers
     application.add_handler(CommandHandler('start', start))
     application.add_handler(CommandHandler('help', help_command))
+    application.add_handler(CommandHandler('join', join_campaign))
     application.add_handler(CommandHandler('vote', vote))
     application.add_handler(CallbackQueryHandler(vote_callback, pattern='^vote_'))
+    application.add_handler(CallbackQueryHandler(page_callback, pattern='^(dp|rl|rf):'))
     application.add_handler(order_conv_handler)
     application.add_handler(add_design_conv_handler)
+    application.add_handler(import_designs_conv_handler)
     
     # Admin commands
+    application.add_handler(CommandHandler('new_campaign', new_campaign))
+    application.add_handler(CommandHandler('campaigns', list_campaigns))
     application.add_handler(CommandHandler('list_designs', list_designs))
     application.add_handler(CommandHandler('delete_design', delete_design))
     application.add_handler(CommandHandler('set_vote_deadline', set_vote_deadline))
     application.add_handler(CommandHandler('set_payment_deadline', set_payment_deadline))
     application.add_handler(CommandHandler('deadlines', show_deadlines))
     application.add_handler(CommandHandler('results', show_results))
+    application.add_handler(CommandHandler('live_results', show_live_results))
     application.add_handler(CommandHandler('orders', show_orders))
     application.add_handler(CommandHandler('export', export_orders))
+    application.add_handler(CommandHandler('export_receipts', export_receipts))
+    application.add_handler(CommandHandler('review_receipts', review_receipts))
+    application.add_handler(CallbackQueryHandler(review_callback, pattern='^rv:'))
+    application.add_handler(CommandHandler('rebuild_stats', rebuild_stats))
+    application.add_handler(CommandHandler('backup', backup_database))
+    application.add_handler(CommandHandler('archive_campaign', archive_campaign))
+    application.add_handler(CommandHandler('archives', list_archives))
+    application.add_handler(CommandHandler('export_archive', export_archive))
+    
+    # Periodic database snapshots
+    global backup_manager
+    if db.db_name is None:
+        logger.info("Storage has no database file, backups are disabled")
+    else:
+        backup_manager = BackupManager(
+            db.db_name, BACKUP_DIR, keep=BACKUP_KEEP,
+            pages_per_step=BACKUP_PAGES_PER_STEP, step_pause=BACKUP_STEP_PAUSE
+        )
+        metrics_providers['backup'] = backup_manager.stats
+        if application.job_queue and BACKUP_INTERVAL_SECONDS > 0:
+            application.job_queue.run_repeating(
+                scheduled_backup, interval=BACKUP_INTERVAL_SECONDS, first=60, name='database_backup'
+            )
+        elif not application.job_queue:
+            logger.warning("JobQueue not available, scheduled backups are disabled")
     
     # Error handler
     application.add_error_handler(error_handler)
     
+    return application
+
+def main():
+    """Start the bot"""
+    global db
+    step = time.perf_counter()
+    db = open_storage()
+    startup_times['storage'] = round(time.perf_counter() - step, 4)
+    
+    if WEBHOOK_WORKERS:
+        # Storage was opened above so the schema is migrated once, not by every worker
+        if STORAGE_BACKEND == 'memory':
+            raise SystemExit("WEBHOOK_WORKERS needs the sqlite backend, worker processes share its file")
+        from workers import run_front
+        logger.info("Starting Jersey Management Bot with %s webhook workers...", WEBHOOK_WORKERS)
+        run_front(WEBHOOK_WORKERS, WEBHOOK_URL, WEBHOOK_SECRET)
+        return
+    
+    step = time.perf_counter()
+    application = build_application()
+    startup_times['build'] = round(time.perf_counter() - step, 4)
+    metrics_providers['startup'] = lambda: startup_times
+    
+    # Jobs only run once run_polling() has called getMe, started polling
+    # and started the application, i.e. when updates are being served
+    started = time.perf_counter()
+    
+    async def report_ready(context: ContextTypes.DEFAULT_TYPE):
+        startup_times['connect'] = round(time.perf_counter() - started, 4)
+        startup_times['ready'] = round(time.perf_counter() - _imports_started, 4)
+        health.set_metrics_loop(asyncio.get_running_loop())
+        health.set_ready()
+        logger.info("Serving updates, startup took %s", startup_times)
+    
+    async def report_stopped(application: Application):
+        health.set_ready(False)
+        health.set_metrics_loop(None)
+    
+    if application.job_queue:
+        application.job_queue.run_once(report_ready, 0, name='ready', job_kwargs={'misfire_grace_time': None})
+    else:
+        application.post_init = lambda application: report_ready(None)
+    application.post_stop = report_stopped
+    
     # Start bot
     logger.info("Starting Jersey Management Bot with Dynamic Design Management...")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors"""
-    logger.error(f"Update {update} caused error {context.error}")
+    logger.error("Update %s caused error %s", update, context.error, exc_info=context.error)
     
     if update and update.effective_message:
         await update.effective_message.reply_text(
@@ -0,0 +1,73 @@
+"""
+Per-campaign caches
+
+Every /vote, vote button and /order reads the user's campaign, that
+campaign's deadlines and its active designs. CampaignCache keeps those in
+memory so a busy campaign costs dictionary lookups instead of queries, and
+one campaign's traffic never touches another campaign's entries.
+
+Writes made through the bot invalidate the affected campaign right away;
+`ttl` bounds how long changes made elsewhere (another process, a restored
+backup) take to show up.
+"""
+
+import time
+from typing import Any, Dict, List, Tuple
+
+from repository import Repository
+from models import Deadlines, Design
+
+
+class CampaignCache:
+    """Caches user -> campaign and each campaign's deadlines and designs"""
+
+    def __init__(self, db: Repository, ttl: float = 30.0):
+        self.db = db
+        self.ttl = ttl
+        self._user_campaigns: Dict[int, int] = {}
+        self._deadlines: Dict[int, Tuple[float, Deadlines]] = {}
+        self._designs: Dict[int, Tuple[float, List[Design]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def campaign_for_user(self, telegram_id: int) -> int:
+        campaign_id = self._user_campaigns.get(telegram_id)
+        if campaign_id is None:
+            campaign_id = self._user_campaigns[telegram_id] = self.db.get_user_campaign(telegram_id)
+        return campaign_id
+
+    def join(self, telegram_id: int, campaign_id: int):
+        """Move a user into a campaign"""
+        self.db.join_campaign(telegram_id, campaign_id)
+        self._user_campaigns[telegram_id] = campaign_id
+
+    def _cached(self, cache: Dict[int, Tuple[float, Any]], campaign_id: int, load):
+        now = time.monotonic()
+        entry = cache.get(campaign_id)
+        if entry and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = load(campaign_id)
+        cache[campaign_id] = (now + self.ttl, value)
+        return value
+
+    def deadlines(self, campaign_id: int) -> Deadlines:
+        return self._cached(self._deadlines, campaign_id, self.db.get_deadlines)
+
+    def designs(self, campaign_id: int) -> List[Design]:
+        """Active designs of a campaign; treat the list as read-only"""
+        return self._cached(self._designs, campaign_id, self.db.get_active_designs)
+
+    def invalidate(self, campaign_id: int):
+        """Drop a campaign's cached deadlines and designs after a change"""
+        self._deadlines.pop(campaign_id, None)
+        self._designs.pop(campaign_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'users': len(self._user_campaigns),
+            'campaigns': len(self._deadlines.keys() | self._designs.keys()),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
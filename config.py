@@ -10,11 +10,131 @@ BOT_TOKEN = os.getenv('BOT_TOKEN')
 if not BOT_TOKEN:
     raise ValueError("No BOT_TOKEN found in environment variables")
 
+# Bot API server, e.g. a local telegram-bot-api or fake_telegram.py
+# ('http://127.0.0.1:8081/bot'); empty for api.telegram.org
+BOT_API_URL = os.getenv('BOT_API_URL', '')
+# Its file downloads, by default BOT_API_URL with /bot replaced by /file/bot
+BOT_API_FILE_URL = os.getenv(
+    'BOT_API_FILE_URL', BOT_API_URL.removesuffix('/bot') + '/file/bot' if BOT_API_URL else ''
+)
+
 # Admin Configuration (Hardcoded Admin IDs)
 ADMIN_IDS = [667804575]  # Replace with your Telegram ID
 
 # Database Configuration
 DATABASE_NAME = 'deadlines.db'
+# 'sqlite' (default) or 'memory'; memory keeps nothing across restarts
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+
+# Multi-process webhook mode (see workers.py). With WEBHOOK_WORKERS > 0 the
+# bot receives updates at WEBHOOK_URL, the public HTTPS URL Telegram posts
+# to (its path is served on $PORT), and hands them to that many worker
+# processes; 0 keeps the single polling process
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '0'))
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+# Sent by Telegram in X-Telegram-Bot-Api-Secret-Token, requests without it are refused
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+# Workers re-read deadlines and live results other workers may have changed this often
+WORKER_SYNC_SECONDS = float(os.getenv('WORKER_SYNC_SECONDS', '5'))
+
+# Campaigns
+# Existing data and users who never /join belong to the default campaign
+DEFAULT_CAMPAIGN_CODE = os.getenv('DEFAULT_CAMPAIGN_CODE', 'main')
+DEFAULT_CAMPAIGN_NAME = os.getenv('DEFAULT_CAMPAIGN_NAME', 'Jersey Drive')
+# Deadlines and designs per campaign are cached in memory for this long
+CAMPAIGN_CACHE_TTL = float(os.getenv('CAMPAIGN_CACHE_TTL', '30'))
+
+# /import_designs treats an album as complete after this many quiet seconds
+ALBUM_DEBOUNCE_SECONDS = float(os.getenv('ALBUM_DEBOUNCE_SECONDS', '1.5'))
+
+# /live_results edits its pinned message at most once per this many seconds
+LIVE_RESULTS_INTERVAL = float(os.getenv('LIVE_RESULTS_INTERVAL', '5'))
+
+# Rows per page of /list_designs and /results, fewer if they would not fit one message
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '25'))
+
+# Bot API HTTP client (see api_client.py), timeouts in seconds
+# Connections for regular calls; calls beyond this wait up to API_POOL_TIMEOUT
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', '64'))
+API_POOL_TIMEOUT = float(os.getenv('API_POOL_TIMEOUT', '5'))
+# Idle connections kept open, and for how long
+API_KEEPALIVE_CONNECTIONS = int(os.getenv('API_KEEPALIVE_CONNECTIONS', '16'))
+API_KEEPALIVE_EXPIRY = float(os.getenv('API_KEEPALIVE_EXPIRY', '30'))
+API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', '5'))
+API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', '5'))
+API_WRITE_TIMEOUT = float(os.getenv('API_WRITE_TIMEOUT', '5'))
+# reply_photo / reply_document and file downloads
+API_MEDIA_READ_TIMEOUT = float(os.getenv('API_MEDIA_READ_TIMEOUT', '30'))
+API_MEDIA_WRITE_TIMEOUT = float(os.getenv('API_MEDIA_WRITE_TIMEOUT', '60'))
+# getUpdates has a connection of its own; the long polling timeout is added to this
+GET_UPDATES_READ_TIMEOUT = float(os.getenv('GET_UPDATES_READ_TIMEOUT', '5'))
+
+# Logging (see logging_setup.py)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_JSON = os.getenv('LOG_FORMAT', 'text').lower() == 'json'
+# Only every Nth "sent design to user" line is logged
+LOG_SEND_SAMPLE_EVERY = int(os.getenv('LOG_SEND_SAMPLE_EVERY', '100'))
+
+# Update Processing
+# Updates from different users run concurrently up to this limit; each
+# user's own updates are always processed in order (1 = fully sequential)
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '32'))
+# When all slots are busy, admin updates go first, then in-progress
+# conversations, then new requests. Updates beyond these queue limits are
+# answered with BUSY_MESSAGE instead of waiting (admin updates always wait)
+CONVERSATION_QUEUE_LIMIT = int(os.getenv('CONVERSATION_QUEUE_LIMIT', '500'))
+NEW_REQUEST_QUEUE_LIMIT = int(os.getenv('NEW_REQUEST_QUEUE_LIMIT', '200'))
+
+# Flood Protection (see ratelimit.py)
+# Bucket -> (updates allowed in a burst, seconds to refill the whole burst).
+# Commands use their name, buttons '<prefix>_callback', 'default' covers the
+# rest. Admins are exempt.
+RATE_LIMITS = {
+    'start': (3, 60),
+    'vote': (3, 60),
+    'vote_callback': (5, 60),
+    'order': (5, 60),
+    'help': (5, 60),
+    # Campaign codes are the only thing keeping teams apart, no guessing
+    'join': (3, 60),
+    'default': (30, 60),
+}
+# How often idle users are evicted from memory
+RATE_LIMIT_SWEEP_SECONDS = 60
+
+# Update Recording (opt-in, see recorder.py and replay.py)
+UPDATE_RECORD_FILE = os.getenv('UPDATE_RECORD_FILE')  # e.g. 'updates.jsonl'
+UPDATE_RECORD_SALT = os.getenv('UPDATE_RECORD_SALT', '')
+
+# /export_receipts (see receipts.py): downloads in flight, the local copy of
+# every receipt downloaded so far, and ZIP bytes kept in memory before
+# spilling to disk / per file sent (bots may send up to 50 MB)
+RECEIPT_DOWNLOAD_CONCURRENCY = int(os.getenv('RECEIPT_DOWNLOAD_CONCURRENCY', '8'))
+RECEIPT_CACHE_DIR = os.getenv('RECEIPT_CACHE_DIR', 'receipt_cache')
+RECEIPT_ZIP_SPOOL_BYTES = int(os.getenv('RECEIPT_ZIP_SPOOL_BYTES', str(8 * 1024 * 1024)))
+RECEIPT_ZIP_PART_BYTES = int(os.getenv('RECEIPT_ZIP_PART_BYTES', str(45 * 1024 * 1024)))
+
+# Event journal replay (see journal.py, /rebuild_stats): events read per
+# batch, and how many replayed events it stores a checkpoint after, also
+# midway through a replay
+JOURNAL_REPLAY_BATCH = int(os.getenv('JOURNAL_REPLAY_BATCH', '10000'))
+JOURNAL_CHECKPOINT_EVENTS = int(os.getenv('JOURNAL_CHECKPOINT_EVENTS', '100000'))
+# The in-memory voted/ordered index (see membership.py) reads votes, orders
+# and archives other processes journaled this often; 0 turns that off
+MEMBERSHIP_SYNC_SECONDS = float(os.getenv('MEMBERSHIP_SYNC_SECONDS', '5'))
+
+# /review_receipts: receipts shown per page, sent as one media group
+# (Telegram takes 2-10 photos per group)
+RECEIPT_REVIEW_BATCH = min(10, int(os.getenv('RECEIPT_REVIEW_BATCH', '10')))
+
+# Backups (see backup.py)
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_INTERVAL_SECONDS = int(os.getenv('BACKUP_INTERVAL_SECONDS', str(6 * 60 * 60)))
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '14'))
+# Pages copied per backup step and pause between steps, so a snapshot
+# never holds the database lock long enough to stall votes and orders
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.01
 
 # Shirt Sizes
 SHIRT_SIZES = ['S', 'M', 'L', 'XL', 'XXL']
@@ -26,6 +146,8 @@ DATE_FORMAT = '%Y-%m-%d %H:%M'
 WELCOME_MESSAGE = """
 👕 Welcome to Jersey Management Bot!
 
+🏆 Campaign: {campaign}
+
 Current Deadlines:
 🗳️ Voting Deadline: {vote_deadline}
 💳 Payment Deadline: {payment_deadline}
@@ -35,6 +157,7 @@ Current Deadlines:
 Available Commands:
 /vote - Vote for jersey design
 /order - Place jersey order
+/join CODE - Switch to your team's campaign
 /help - Show all commands
 """
 
@@ -50,6 +173,10 @@ Deadline was: {deadline}
 No late orders are accepted.
 """
 
+RATE_LIMITED_MESSAGE = "🐢 Slow down! You're sending too many requests. Please wait a minute."
+
+BUSY_MESSAGE = "⏳ The bot is very busy right now. Please retry in a few seconds."
+
 DUPLICATE_VOTE = "❌ You have already voted! Each user can only vote once."
 
 DUPLICATE_ORDER = "❌ You have already placed an order! Each user can only order once."
@@ -1,15 +1,53 @@
+import json
 import sqlite3
 from datetime import datetime
-from typing import List, Tuple, Optional
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from contextlib import contextmanager
-import csv
-import io
 
-from config import DATABASE_NAME, DATE_FORMAT
-from models import User, Order, Deadlines, Design
+from config import DATABASE_NAME, DATE_FORMAT, DEFAULT_CAMPAIGN_CODE, DEFAULT_CAMPAIGN_NAME
+from models import User, Order, Deadlines, Design, Campaign
+from repository import (
+    ARCHIVED_ORDER_CSV_HEADER, DEFAULT_CAMPAIGN_ID, EVENT_ARCHIVED, EVENT_DESIGN_ADDED, EVENT_DESIGN_CHANGED,
+    EVENT_ORDER, EVENT_ORDER_REVIEWED, EVENT_VOTE, Event, Repository, check_review_statuses, orders_to_csv
+)
 
-class Database:
-    """Database handler for jersey bot"""
+# Deadlines (DATE_FORMAT) and CURRENT_TIMESTAMP values are ISO 8601, which
+# fromisoformat parses far faster than strptime. The same few deadlines are
+# read over and over, and datetimes are immutable, so results are shared.
+parse_timestamp = lru_cache(maxsize=4096)(datetime.fromisoformat)
+
+# Final snapshot tables, see freeze_results and freeze_orders
+FINAL_TABLES = ('final_snapshots', 'final_results', 'final_orders')
+
+# Columns _design_row expects
+DESIGN_COLUMNS = 'id, campaign_id, name, description, image_file_id, created_at, is_active, display_order'
+
+# Row factories building models straight from the selected columns, in order
+
+def _campaign_row(cursor: sqlite3.Cursor, row: tuple) -> Campaign:
+    """SELECT id, code, name, vote_deadline, payment_deadline"""
+    campaign_id, code, name, vote_deadline, payment_deadline = row
+    return Campaign(campaign_id, code, name, parse_timestamp(vote_deadline), parse_timestamp(payment_deadline))
+
+def _deadlines_row(cursor: sqlite3.Cursor, row: tuple) -> Deadlines:
+    """SELECT vote_deadline, payment_deadline"""
+    return Deadlines(parse_timestamp(row[0]), parse_timestamp(row[1]))
+
+def _design_row(cursor: sqlite3.Cursor, row: tuple) -> Design:
+    """SELECT DESIGN_COLUMNS"""
+    design_id, campaign_id, name, description, image_file_id, created_at, is_active, display_order = row
+    return Design(design_id, name, description or '', image_file_id,
+                  parse_timestamp(created_at), bool(is_active), campaign_id, display_order)
+
+def _user_row(cursor: sqlite3.Cursor, row: tuple) -> User:
+    """SELECT telegram_id, campaign_id, design_id, has_ordered"""
+    telegram_id, campaign_id, design_id, has_ordered = row
+    return User(telegram_id, str(design_id) if design_id is not None else None,
+                design_id is not None, bool(has_ordered), campaign_id)
+
+class Database(Repository):
+    """SQLite database handler for jersey bot"""
     
     def __init__(self, db_name: str = DATABASE_NAME):
         self.db_name = db_name
@@ -34,45 +72,66 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            # Create users table
+            # WAL lets readers (and online backups) run alongside a writer
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
+            # Create campaigns table, one row per jersey drive
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS campaigns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    code TEXT NOT NULL UNIQUE,
+                    name TEXT NOT NULL,
+                    vote_deadline TIMESTAMP NOT NULL,
+                    payment_deadline TIMESTAMP NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create users table, campaign_id is the campaign a user is in
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     telegram_id INTEGER PRIMARY KEY,
-                    vote_choice TEXT,
-                    has_voted BOOLEAN DEFAULT 0,
-                    has_ordered BOOLEAN DEFAULT 0,
+                    campaign_id INTEGER NOT NULL DEFAULT 1,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
+            # Create votes table, one vote per user and campaign
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS votes (
+                    campaign_id INTEGER NOT NULL,
+                    telegram_id INTEGER NOT NULL,
+                    design_id INTEGER NOT NULL,
+                    voted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (campaign_id, telegram_id)
+                ) WITHOUT ROWID
+            ''')
+            
             # Create orders table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS orders (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    campaign_id INTEGER NOT NULL DEFAULT 1,
                     telegram_id INTEGER,
                     full_name TEXT NOT NULL,
                     shirt_number INTEGER NOT NULL,
                     shirt_name TEXT NOT NULL,
                     size TEXT NOT NULL,
                     receipt_file_id TEXT NOT NULL,
+                    receipt_file_unique_id TEXT,
                     payment_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    review_status TEXT,
+                    reviewed_by INTEGER,
+                    reviewed_at TIMESTAMP,
                     FOREIGN KEY (telegram_id) REFERENCES users (telegram_id)
                 )
             ''')
             
-            # Create deadlines table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS deadlines (
-                    id INTEGER PRIMARY KEY CHECK (id = 1),
-                    vote_deadline TIMESTAMP NOT NULL,
-                    payment_deadline TIMESTAMP NOT NULL
-                )
-            ''')
-            
             # Create designs table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS designs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    campaign_id INTEGER NOT NULL DEFAULT 1,
                     name TEXT NOT NULL,
                     description TEXT,
                     image_file_id TEXT NOT NULL,
@@ -82,171 +141,535 @@ class Database:
                 )
             ''')
             
-            # Insert default deadlines if table is empty
-            cursor.execute('SELECT COUNT(*) FROM deadlines')
+            self._migrate_to_campaigns(cursor)
+            self._migrate_order_columns(cursor, 'orders')
+            
+            # Indexes for the hot read paths (see query_plans.py). Every
+            # one leads with campaign_id so a campaign never reads another
+            # campaign's rows.
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_votes_campaign_design
+                ON votes (campaign_id, design_id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_campaign_user
+                ON orders (campaign_id, telegram_id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_campaign_payment_time
+                ON orders (campaign_id, payment_time)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_designs_campaign_active_order
+                ON designs (campaign_id, is_active, display_order, created_at DESC)
+            ''')
+            # The /review_receipts queue, only unreviewed orders are in it
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_orders_campaign_unreviewed
+                ON orders (campaign_id, id) WHERE review_status IS NULL
+            ''')
+            # Keyset pages of /list_designs, see get_designs_page
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_designs_campaign_active_keyset
+                ON designs (campaign_id, is_active, display_order, id)
+            ''')
+            
+            # Archive tables for finished campaigns (see archive_campaign).
+            # They live in the same file so archiving is one atomic
+            # transaction; WAL does not make cross-file commits atomic.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archived_campaigns (
+                    label TEXT PRIMARY KEY,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    vote_deadline TIMESTAMP,
+                    payment_deadline TIMESTAMP,
+                    votes INTEGER NOT NULL,
+                    orders INTEGER NOT NULL,
+                    designs INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archived_votes (
+                    campaign TEXT NOT NULL,
+                    telegram_id INTEGER NOT NULL,
+                    design_id INTEGER,
+                    design_name TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archived_orders (
+                    campaign TEXT NOT NULL,
+                    id INTEGER,
+                    telegram_id INTEGER,
+                    full_name TEXT NOT NULL,
+                    shirt_number INTEGER NOT NULL,
+                    shirt_name TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    receipt_file_id TEXT NOT NULL,
+                    payment_time TIMESTAMP,
+                    receipt_file_unique_id TEXT,
+                    review_status TEXT,
+                    reviewed_by INTEGER,
+                    reviewed_at TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archived_designs (
+                    campaign TEXT NOT NULL,
+                    id INTEGER,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    image_file_id TEXT NOT NULL,
+                    created_at TIMESTAMP,
+                    display_order INTEGER
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_archived_votes_campaign
+                ON archived_votes (campaign, design_id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_archived_orders_campaign
+                ON archived_orders (campaign, payment_time)
+            ''')
+            self._migrate_order_columns(cursor, 'archived_orders')
+            
+            # Final snapshots taken when a deadline passes (see
+            # freeze_results and freeze_orders). They are keyed by the
+            # deadline they were taken at and never updated, so moving a
+            # deadline later starts a new snapshot instead of rewriting one.
+            # Triggers reject updates and deletes; archive_campaign lifts the
+            # delete guard for its own transaction only.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS final_snapshots (
+                    campaign_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    deadline TIMESTAMP NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    frozen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (campaign_id, kind, deadline)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS final_results (
+                    campaign_id INTEGER NOT NULL,
+                    vote_deadline TIMESTAMP NOT NULL,
+                    position INTEGER NOT NULL,
+                    design_name TEXT NOT NULL,
+                    votes INTEGER NOT NULL,
+                    PRIMARY KEY (campaign_id, vote_deadline, position)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS final_orders (
+                    campaign_id INTEGER NOT NULL,
+                    payment_deadline TIMESTAMP NOT NULL,
+                    payment_time TIMESTAMP NOT NULL,
+                    id INTEGER NOT NULL,
+                    telegram_id INTEGER,
+                    full_name TEXT NOT NULL,
+                    shirt_number INTEGER NOT NULL,
+                    shirt_name TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    receipt_file_id TEXT NOT NULL,
+                    PRIMARY KEY (campaign_id, payment_deadline, payment_time, id)
+                ) WITHOUT ROWID
+            ''')
+            self._guard_final_tables(cursor)
+            
+            # Event journal (see journal.py): one row per vote, order, design
+            # change and archive, appended in the transaction making the change.
+            # seq is the rowid, so appends go to the end of the B-tree and replay
+            # reads it in order.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events'")
+            new_journal = cursor.fetchone() is None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY,
+                    campaign_id INTEGER NOT NULL,
+                    kind INTEGER NOT NULL,
+                    telegram_id INTEGER,
+                    subject INTEGER,
+                    value TEXT,
+                    at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+                )
+            ''')
+            for action in ('UPDATE', 'DELETE'):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS events_append_only_{action.lower()}
+                    BEFORE {action} ON events
+                    BEGIN
+                        SELECT RAISE(ABORT, 'events are append-only');
+                    END
+                ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS event_checkpoints (
+                    seq INTEGER PRIMARY KEY,
+                    state BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            if new_journal:
+                self._backfill_journal(cursor)
+            
+            # Insert the default campaign if there is none
+            cursor.execute('SELECT COUNT(*) FROM campaigns')
             if cursor.fetchone()[0] == 0:
-                default_date = datetime.now().replace(year=datetime.now().year + 1)
+                self._insert_default_campaign(cursor, self.default_deadline(), self.default_deadline())
+    
+    @staticmethod
+    def _backfill_journal(cursor: sqlite3.Cursor):
+        """Start a new journal with events recreating the data already there"""
+        cursor.execute(f'''
+            INSERT INTO events (campaign_id, kind, subject)
+            SELECT campaign_id, {EVENT_DESIGN_ADDED}, id FROM designs ORDER BY id
+        ''')
+        cursor.execute(f'''
+            INSERT INTO events (campaign_id, kind, subject, value)
+            SELECT campaign_id, {EVENT_DESIGN_CHANGED}, id, '{{"is_active": false}}'
+            FROM designs WHERE is_active = 0 ORDER BY id
+        ''')
+        cursor.execute(f'''
+            INSERT INTO events (campaign_id, kind, telegram_id, subject)
+            SELECT campaign_id, {EVENT_VOTE}, telegram_id, design_id FROM votes ORDER BY voted_at
+        ''')
+        cursor.execute(f'''
+            INSERT INTO events (campaign_id, kind, telegram_id, subject, value)
+            SELECT campaign_id, {EVENT_ORDER}, telegram_id, id, size FROM orders ORDER BY id
+        ''')
+    
+    @staticmethod
+    def _guard_final_tables(cursor: sqlite3.Cursor):
+        """Create the triggers keeping final snapshot rows from being updated or deleted"""
+        for table in FINAL_TABLES:
+            # The update guard keeps the name it had before deletes were guarded
+            for trigger, action in ((f'{table}_immutable', 'UPDATE'), (f'{table}_undeletable', 'DELETE')):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {trigger}
+                    BEFORE {action} ON {table}
+                    BEGIN
+                        SELECT RAISE(ABORT, '{table} rows are immutable');
+                    END
+                ''')
+    
+    @staticmethod
+    def _journal(cursor: sqlite3.Cursor, events: Iterable[tuple]):
+        """Append (campaign_id, kind, telegram_id, subject, value) events in one batch"""
+        cursor.executemany('''
+            INSERT INTO events (campaign_id, kind, telegram_id, subject, value)
+            VALUES (?, ?, ?, ?, ?)
+        ''', events)
+    
+    def _migrate_to_campaigns(self, cursor: sqlite3.Cursor):
+        """Move a single-campaign database into the default campaign
+        
+        Before campaigns, votes lived on users (vote_choice/has_voted),
+        has_ordered was a users flag and the deadlines had a table of their
+        own. The old users columns are left in place but no longer read.
+        """
+        cursor.execute('PRAGMA table_info(users)')
+        if 'campaign_id' in {row['name'] for row in cursor.fetchall()}:
+            return
+        
+        for table in ('users', 'orders', 'designs'):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN campaign_id INTEGER NOT NULL DEFAULT 1')
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO votes (campaign_id, telegram_id, design_id)
+            SELECT ?, telegram_id, CAST(vote_choice AS INTEGER)
+            FROM users WHERE has_voted = 1 AND vote_choice IS NOT NULL
+        ''', (DEFAULT_CAMPAIGN_ID,))
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'deadlines'")
+        if cursor.fetchone():
+            cursor.execute('SELECT vote_deadline, payment_deadline FROM deadlines WHERE id = 1')
+            row = cursor.fetchone()
+            if row:
+                self._insert_default_campaign(
+                    cursor,
+                    datetime.strptime(row['vote_deadline'], DATE_FORMAT),
+                    datetime.strptime(row['payment_deadline'], DATE_FORMAT)
+                )
+            cursor.execute('DROP TABLE deadlines')
+        
+        # Superseded by the campaign-leading indexes
+        for index in ('idx_users_vote_choice', 'idx_orders_payment_time', 'idx_designs_active_order'):
+            cursor.execute(f'DROP INDEX IF EXISTS {index}')
+    
+    def _migrate_order_columns(self, cursor: sqlite3.Cursor, table: str):
+        """Add the receipt unique ID and review columns to an orders table created before them"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        columns = {row['name'] for row in cursor.fetchall()}
+        for column, kind in (('receipt_file_unique_id', 'TEXT'), ('review_status', 'TEXT'),
+                             ('reviewed_by', 'INTEGER'), ('reviewed_at', 'TIMESTAMP')):
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {kind}')
+    
+    @staticmethod
+    def _insert_default_campaign(cursor: sqlite3.Cursor, vote_deadline: datetime,
+                                 payment_deadline: datetime):
+        cursor.execute('''
+            INSERT INTO campaigns (id, code, name, vote_deadline, payment_deadline)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (DEFAULT_CAMPAIGN_ID, DEFAULT_CAMPAIGN_CODE, DEFAULT_CAMPAIGN_NAME,
+              vote_deadline.strftime(DATE_FORMAT), payment_deadline.strftime(DATE_FORMAT)))
+    
+    # Campaign operations
+    def create_campaign(self, code: str, name: str) -> int:
+        """Create a new campaign with default deadlines"""
+        default_date = self.default_deadline().strftime(DATE_FORMAT)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
                 cursor.execute('''
-                    INSERT INTO deadlines (id, vote_deadline, payment_deadline)
-                    VALUES (1, ?, ?)
-                ''', (default_date.strftime(DATE_FORMAT), default_date.strftime(DATE_FORMAT)))
+                    INSERT INTO campaigns (code, name, vote_deadline, payment_deadline)
+                    VALUES (?, ?, ?, ?)
+                ''', (code, name, default_date, default_date))
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Campaign code '{code}' is already taken")
+            return cursor.lastrowid
     
-    # User operations (keep existing)
-    def get_user(self, telegram_id: int) -> Optional[User]:
-        """Get user by telegram ID"""
+    def get_campaign(self, campaign_id: int) -> Optional[Campaign]:
+        """Get campaign by ID"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = _campaign_row
+            cursor.execute('''
+                SELECT id, code, name, vote_deadline, payment_deadline
+                FROM campaigns WHERE id = ?
+            ''', (campaign_id,))
+            return cursor.fetchone()
+    
+    def get_campaign_by_code(self, code: str) -> Optional[Campaign]:
+        """Get campaign by its join code"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = _campaign_row
+            cursor.execute('''
+                SELECT id, code, name, vote_deadline, payment_deadline
+                FROM campaigns WHERE code = ?
+            ''', (code,))
+            return cursor.fetchone()
+    
+    def get_campaigns(self) -> List[Campaign]:
+        """Get all campaigns"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = _campaign_row
             cursor.execute('''
-                SELECT telegram_id, vote_choice, has_voted, has_ordered 
-                FROM users WHERE telegram_id = ?
-            ''', (telegram_id,))
+                SELECT id, code, name, vote_deadline, payment_deadline
+                FROM campaigns ORDER BY id
+            ''')
+            return cursor.fetchall()
+    
+    def get_user_campaign(self, telegram_id: int) -> int:
+        """Campaign a user is in, the default one for unknown users"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT campaign_id FROM users WHERE telegram_id = ?', (telegram_id,))
             row = cursor.fetchone()
-            
-            if row:
-                return User(
-                    telegram_id=row['telegram_id'],
-                    vote_choice=row['vote_choice'],
-                    has_voted=bool(row['has_voted']),
-                    has_ordered=bool(row['has_ordered'])
-                )
-            return None
+            return row['campaign_id'] if row else DEFAULT_CAMPAIGN_ID
+    
+    def join_campaign(self, telegram_id: int, campaign_id: int):
+        """Move a user into a campaign, creating the user if needed"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO users (telegram_id, campaign_id) VALUES (?, ?)
+                ON CONFLICT (telegram_id) DO UPDATE SET campaign_id = excluded.campaign_id
+            ''', (telegram_id, campaign_id))
+    
+    # User operations (keep existing)
+    def get_user(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Optional[User]:
+        """Get user by telegram ID with their vote/order in a campaign"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = _user_row
+            cursor.execute('''
+                SELECT u.telegram_id, u.campaign_id, v.design_id,
+                       EXISTS (SELECT 1 FROM orders o
+                               WHERE o.campaign_id = ? AND o.telegram_id = u.telegram_id) AS has_ordered
+                FROM users u
+                LEFT JOIN votes v ON v.campaign_id = ? AND v.telegram_id = u.telegram_id
+                WHERE u.telegram_id = ?
+            ''', (campaign_id, campaign_id, telegram_id))
+            return cursor.fetchone()
     
-    def create_user(self, telegram_id: int):
+    def create_user(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID):
         """Create new user"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT OR IGNORE INTO users (telegram_id, has_voted, has_ordered)
-                VALUES (?, 0, 0)
-            ''', (telegram_id,))
+                INSERT OR IGNORE INTO users (telegram_id, campaign_id)
+                VALUES (?, ?)
+            ''', (telegram_id, campaign_id))
     
-    def save_vote(self, telegram_id: int, design_id: int):
-        """Save user's vote (now uses design_id)"""
+    def save_vote(self, telegram_id: int, design_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        """Save user's vote in a campaign"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                UPDATE users 
-                SET vote_choice = ?, has_voted = 1
-                WHERE telegram_id = ?
-            ''', (str(design_id), telegram_id))
+                INSERT OR REPLACE INTO votes (campaign_id, telegram_id, design_id)
+                VALUES (?, ?, ?)
+            ''', (campaign_id, telegram_id, design_id))
+            self._journal(cursor, [(campaign_id, EVENT_VOTE, telegram_id, design_id, None)])
     
-    def has_user_voted(self, telegram_id: int) -> bool:
-        """Check if user has voted"""
-        user = self.get_user(telegram_id)
-        return user.has_voted if user else False
+    def has_user_voted(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> bool:
+        """Check if user has voted in a campaign"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT 1 FROM votes WHERE campaign_id = ? AND telegram_id = ?
+            ''', (campaign_id, telegram_id))
+            return cursor.fetchone() is not None
     
-    def has_user_ordered(self, telegram_id: int) -> bool:
-        """Check if user has ordered"""
-        user = self.get_user(telegram_id)
-        return user.has_ordered if user else False
+    def has_user_ordered(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> bool:
+        """Check if user has ordered in a campaign"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT 1 FROM orders WHERE campaign_id = ? AND telegram_id = ? LIMIT 1
+            ''', (campaign_id, telegram_id))
+            return cursor.fetchone() is not None
+    
+    def get_voter_ids(self, campaign_id: int) -> List[int]:
+        """Telegram IDs that voted in a campaign, ascending"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute('''
+                SELECT telegram_id FROM votes WHERE campaign_id = ? ORDER BY telegram_id
+            ''', (campaign_id,))
+            return [row[0] for row in cursor]
+    
+    def get_orderer_ids(self, campaign_id: int) -> List[int]:
+        """Telegram IDs with an order in a campaign, ascending and each once"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute('''
+                SELECT DISTINCT telegram_id FROM orders
+                WHERE campaign_id = ? AND telegram_id IS NOT NULL
+                ORDER BY telegram_id
+            ''', (campaign_id,))
+            return [row[0] for row in cursor]
     
     # Order operations (keep existing)
     def save_order(self, order: Order):
         """Save order to database"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            
-            # Insert order
             cursor.execute('''
-                INSERT INTO orders 
-                (telegram_id, full_name, shirt_number, shirt_name, size, receipt_file_id, payment_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO orders
+                (campaign_id, telegram_id, full_name, shirt_number, shirt_name, size,
+                 receipt_file_id, receipt_file_unique_id, payment_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                order.telegram_id, order.full_name, order.shirt_number,
-                order.shirt_name, order.size, order.receipt_file_id,
+                order.campaign_id, order.telegram_id, order.full_name, order.shirt_number,
+                order.shirt_name, order.size, order.receipt_file_id, order.receipt_file_unique_id,
                 order.payment_time.strftime(DATE_FORMAT)
             ))
-            
-            # Update user's has_ordered status
-            cursor.execute('''
-                UPDATE users SET has_ordered = 1
-                WHERE telegram_id = ?
-            ''', (order.telegram_id,))
+            self._journal(cursor, [
+                (order.campaign_id, EVENT_ORDER, order.telegram_id, cursor.lastrowid, order.size)
+            ])
     
     # Deadline operations (keep existing)
-    def get_deadlines(self) -> Deadlines:
-        """Get current deadlines"""
+    def get_deadlines(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Deadlines:
+        """Get a campaign's deadlines"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT vote_deadline, payment_deadline FROM deadlines WHERE id = 1')
-            row = cursor.fetchone()
-            
-            return Deadlines(
-                vote_deadline=datetime.strptime(row['vote_deadline'], DATE_FORMAT),
-                payment_deadline=datetime.strptime(row['payment_deadline'], DATE_FORMAT)
-            )
+            cursor.row_factory = _deadlines_row
+            cursor.execute('''
+                SELECT vote_deadline, payment_deadline FROM campaigns WHERE id = ?
+            ''', (campaign_id,))
+            return cursor.fetchone()
     
-    def set_vote_deadline(self, deadline: datetime):
+    def set_vote_deadline(self, deadline: datetime, campaign_id: int = DEFAULT_CAMPAIGN_ID):
         """Set new vote deadline"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                UPDATE deadlines SET vote_deadline = ? WHERE id = 1
-            ''', (deadline.strftime(DATE_FORMAT),))
+                UPDATE campaigns SET vote_deadline = ? WHERE id = ?
+            ''', (deadline.strftime(DATE_FORMAT), campaign_id))
     
-    def set_payment_deadline(self, deadline: datetime):
+    def set_payment_deadline(self, deadline: datetime, campaign_id: int = DEFAULT_CAMPAIGN_ID):
         """Set new payment deadline"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                UPDATE deadlines SET payment_deadline = ? WHERE id = 1
-            ''', (deadline.strftime(DATE_FORMAT),))
+                UPDATE campaigns SET payment_deadline = ? WHERE id = ?
+            ''', (deadline.strftime(DATE_FORMAT), campaign_id))
     
     # NEW: Design operations
-    def add_design(self, name: str, description: str, image_file_id: str, display_order: int = 0) -> int:
+    def add_design(self, name: str, description: str, image_file_id: str, display_order: int = 0,
+                   campaign_id: int = DEFAULT_CAMPAIGN_ID) -> int:
         """Add a new design"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO designs (name, description, image_file_id, display_order)
-                VALUES (?, ?, ?, ?)
-            ''', (name, description, image_file_id, display_order))
-            return cursor.lastrowid
+                INSERT INTO designs (campaign_id, name, description, image_file_id, display_order)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (campaign_id, name, description, image_file_id, display_order))
+            design_id = cursor.lastrowid
+            self._journal(cursor, [(campaign_id, EVENT_DESIGN_ADDED, None, design_id, None)])
+            return design_id
     
-    def get_active_designs(self) -> List[Design]:
-        """Get all active designs"""
+    def add_designs(self, designs: Sequence[Tuple[str, str, str]],
+                    campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[int]:
+        """Add (name, description, image_file_id) designs in one transaction
+        
+        They are shown after the campaign's active designs, in the given
+        order. Returns the new design IDs in that order.
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # Hold the write lock so the display_order range stays ours
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT COALESCE(MAX(display_order), 0) FROM designs
+                WHERE campaign_id = ? AND is_active = 1
+            ''', (campaign_id,))
+            last_order = cursor.fetchone()[0]
+            cursor.executemany('''
+                INSERT INTO designs (campaign_id, name, description, image_file_id, display_order)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [
+                (campaign_id, name, description, image_file_id, last_order + position)
+                for position, (name, description, image_file_id) in enumerate(designs, 1)
+            ])
             cursor.execute('''
-                SELECT id, name, description, image_file_id, created_at, is_active
-                FROM designs 
-                WHERE is_active = 1 
+                SELECT id FROM designs
+                WHERE campaign_id = ? AND is_active = 1 AND display_order > ?
+                ORDER BY display_order
+            ''', (campaign_id, last_order))
+            design_ids = [row[0] for row in cursor.fetchall()]
+            self._journal(cursor, [(campaign_id, EVENT_DESIGN_ADDED, None, design_id, None)
+                                   for design_id in design_ids])
+            return design_ids
+    
+    def get_active_designs(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Design]:
+        """Get a campaign's active designs"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = _design_row
+            cursor.execute(f'''
+                SELECT {DESIGN_COLUMNS}
+                FROM designs
+                WHERE campaign_id = ? AND is_active = 1
                 ORDER BY display_order, created_at DESC
-            ''')
-            rows = cursor.fetchall()
-            
-            designs = []
-            for row in rows:
-                designs.append(Design(
-                    id=row['id'],
-                    name=row['name'],
-                    description=row['description'] or '',
-                    image_file_id=row['image_file_id'],
-                    created_at=datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S'),
-                    is_active=bool(row['is_active'])
-                ))
-            return designs
+            ''', (campaign_id,))
+            return cursor.fetchall()
     
     def get_design(self, design_id: int) -> Optional[Design]:
         """Get design by ID"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, name, description, image_file_id, created_at, is_active
+            cursor.row_factory = _design_row
+            cursor.execute(f'''
+                SELECT {DESIGN_COLUMNS}
                 FROM designs WHERE id = ?
             ''', (design_id,))
-            row = cursor.fetchone()
-            
-            if row:
-                return Design(
-                    id=row['id'],
-                    name=row['name'],
-                    description=row['description'] or '',
-                    image_file_id=row['image_file_id'],
-                    created_at=datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S'),
-                    is_active=bool(row['is_active'])
-                )
-            return None
+            return cursor.fetchone()
     
     def update_design(self, design_id: int, name: str = None, description: str = None, 
                       image_file_id: str = None, is_active: bool = None):
@@ -255,19 +678,24 @@ class Database:
             cursor = conn.cursor()
             updates = []
             params = []
+            changes = {}
             
             if name is not None:
                 updates.append("name = ?")
                 params.append(name)
+                changes['name'] = name
             if description is not None:
                 updates.append("description = ?")
                 params.append(description)
+                changes['description'] = description
             if image_file_id is not None:
                 updates.append("image_file_id = ?")
                 params.append(image_file_id)
+                changes['image_file_id'] = image_file_id
             if is_active is not None:
                 updates.append("is_active = ?")
                 params.append(1 if is_active else 0)
+                changes['is_active'] = bool(is_active)
             
             if updates:
                 params.append(design_id)
@@ -276,48 +704,430 @@ class Database:
                     SET {', '.join(updates)}
                     WHERE id = ?
                 ''', params)
-    
-    def delete_design(self, design_id: int):
-        """Soft delete a design"""
-        self.update_design(design_id, is_active=False)
+                # Journaled with the design's campaign, and not at all for an unknown ID
+                cursor.execute('''
+                    INSERT INTO events (campaign_id, kind, subject, value)
+                    SELECT campaign_id, ?, id, ? FROM designs WHERE id = ?
+                ''', (EVENT_DESIGN_CHANGED, json.dumps(changes), design_id))
     
     # Statistics operations (updated)
-    def get_vote_results(self) -> List[Tuple[str, int]]:
-        """Get vote counts per design"""
+    def get_vote_results(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Tuple[str, int]]:
+        """Get vote counts per design in a campaign"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT d.name, COUNT(u.vote_choice) as count
+                SELECT d.name,
+                       (SELECT COUNT(*) FROM votes v
+                        WHERE v.campaign_id = d.campaign_id AND v.design_id = d.id) as count
                 FROM designs d
-                LEFT JOIN users u ON u.vote_choice = CAST(d.id AS TEXT) AND u.has_voted = 1
-                WHERE d.is_active = 1
-                GROUP BY d.id, d.name
+                WHERE d.campaign_id = ? AND d.is_active = 1
                 ORDER BY count DESC
-            ''')
+            ''', (campaign_id,))
             return cursor.fetchall()
     
-    def get_total_orders(self) -> int:
-        """Get total number of orders"""
+    def get_receipts(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Tuple[int, int, str, str, Optional[str]]]:
+        """(order id, shirt number, shirt name, receipt file id, unique id) per order, oldest payment first"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, shirt_number, shirt_name, receipt_file_id, receipt_file_unique_id
+                FROM orders
+                WHERE campaign_id = ?
+                ORDER BY payment_time, id
+            ''', (campaign_id,))
+            return [tuple(row) for row in cursor.fetchall()]
+    
+    # Receipt review
+    def get_unreviewed_orders(self, campaign_id: int, after: Optional[int] = None,
+                              limit: int = 10) -> List[Tuple[int, str, int, str, str, str]]:
+        """(order id, full name, shirt number, shirt name, size, receipt file id) of orders
+        nobody reviewed yet, by order ID, which is also the cursor
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, full_name, shirt_number, shirt_name, size, receipt_file_id
+                FROM orders
+                WHERE campaign_id = ? AND review_status IS NULL AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (campaign_id, after or 0, limit))
+            return [tuple(row) for row in cursor.fetchall()]
+    
+    def count_unreviewed_orders(self, campaign_id: int) -> int:
+        """Orders of a campaign nobody reviewed yet"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM orders')
+            cursor.execute('''
+                SELECT COUNT(*) FROM orders WHERE campaign_id = ? AND review_status IS NULL
+            ''', (campaign_id,))
             return cursor.fetchone()[0]
     
-    def export_orders_to_csv(self) -> str:
-        """Export orders to CSV format"""
+    def review_orders(self, decisions: Sequence[Tuple[int, str]], reviewer: int) -> List[int]:
+        """Record (order id, REVIEW_APPROVED or REVIEW_REJECTED) decisions
+        
+        Orders already reviewed, or unknown, are left alone. Returns the IDs
+        of the orders this call reviewed.
+        """
+        check_review_statuses(decisions)
+        if not decisions:
+            return []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Nobody else may review these between the check and the update
+            cursor.execute('BEGIN IMMEDIATE')
+            order_ids = [order_id for order_id, _ in decisions]
+            cursor.execute(f'''
+                SELECT id FROM orders
+                WHERE review_status IS NULL AND id IN ({', '.join('?' * len(order_ids))})
+            ''', order_ids)
+            pending = {row[0] for row in cursor.fetchall()}
+            reviewed = []
+            for order_id, status in decisions:
+                # The first decision for an order counts
+                if order_id in pending:
+                    pending.discard(order_id)
+                    reviewed.append((order_id, status))
+            cursor.executemany('''
+                UPDATE orders SET review_status = ?, reviewed_by = ?, reviewed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', [(status, reviewer, order_id) for order_id, status in reviewed])
+            cursor.executemany(f'''
+                INSERT INTO events (campaign_id, kind, telegram_id, subject, value)
+                SELECT campaign_id, {EVENT_ORDER_REVIEWED}, ?, id, ? FROM orders WHERE id = ?
+            ''', [(reviewer, status, order_id) for order_id, status in reviewed])
+            return [order_id for order_id, _ in reviewed]
+    
+    # Keyset-paginated listings
+    def get_designs_page(self, campaign_id: int, after: Optional[Tuple[int, int]] = None,
+                         before: Optional[Tuple[int, int]] = None, limit: int = 20) -> List[Design]:
+        """Active designs ordered by (display_order, id), which is also the cursor"""
+        if before is not None:
+            keyset, params, direction = 'AND (display_order, id) < (?, ?)', before, 'DESC'
+        elif after is not None:
+            keyset, params, direction = 'AND (display_order, id) > (?, ?)', after, 'ASC'
+        else:
+            keyset, params, direction = '', (), 'ASC'
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = _design_row
+            cursor.execute(f'''
+                SELECT {DESIGN_COLUMNS}
+                FROM designs
+                WHERE campaign_id = ? AND is_active = 1 {keyset}
+                ORDER BY display_order {direction}, id {direction}
+                LIMIT ?
+            ''', (campaign_id, *params, limit))
+            rows = cursor.fetchall()
+        return rows[::-1] if before is not None else rows
+    
+    def get_results_page(self, campaign_id: int, after: Optional[Tuple[int, int]] = None,
+                         before: Optional[Tuple[int, int]] = None,
+                         limit: int = 20) -> List[Tuple[int, str, int]]:
+        """(design id, name, votes) per active design, most votes first, then by ID"""
+        # Votes descend while IDs ascend, so a row value comparison won't do
+        if before is not None:
+            keyset, order = 'WHERE votes > ? OR (votes = ? AND id < ?)', 'votes, id DESC'
+            params = (before[0], *before)
+        elif after is not None:
+            keyset, order = 'WHERE votes < ? OR (votes = ? AND id > ?)', 'votes DESC, id'
+            params = (after[0], *after)
+        else:
+            keyset, params, order = '', (), 'votes DESC, id'
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, name, votes FROM (
+                    SELECT d.id, d.name,
+                           (SELECT COUNT(*) FROM votes v
+                            WHERE v.campaign_id = d.campaign_id AND v.design_id = d.id) AS votes
+                    FROM designs d
+                    WHERE d.campaign_id = ? AND d.is_active = 1
+                )
+                {keyset}
+                ORDER BY {order}
+                LIMIT ?
+            ''', (campaign_id, *params, limit))
+            rows = [tuple(row) for row in cursor.fetchall()]
+        return rows[::-1] if before is not None else rows
+    
+    def get_final_results_page(self, campaign_id: int, deadline: datetime, after: Optional[int] = None,
+                               before: Optional[int] = None, limit: int = 20) -> List[Tuple[int, str, int]]:
+        """(position, design name, votes) from the freeze_results snapshot at `deadline`"""
+        if before is not None:
+            keyset, params, direction = 'AND position < ?', (before,), 'DESC'
+        else:
+            keyset, params, direction = 'AND position > ?', (after or 0,), 'ASC'
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT position, design_name, votes FROM final_results
+                WHERE campaign_id = ? AND vote_deadline = ? {keyset}
+                ORDER BY position {direction}
+                LIMIT ?
+            ''', (campaign_id, deadline.strftime(DATE_FORMAT), *params, limit))
+            rows = [tuple(row) for row in cursor.fetchall()]
+        return rows[::-1] if before is not None else rows
+    
+    def count_results(self, campaign_id: int, deadline: Optional[datetime] = None) -> Tuple[int, int]:
+        """(designs, total votes) of the live results, or of the snapshot taken at `deadline`"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if deadline is not None:
+                cursor.execute('''
+                    SELECT COUNT(*), COALESCE(SUM(votes), 0) FROM final_results
+                    WHERE campaign_id = ? AND vote_deadline = ?
+                ''', (campaign_id, deadline.strftime(DATE_FORMAT)))
+            else:
+                cursor.execute('''
+                    SELECT COUNT(*), COALESCE(SUM(
+                        (SELECT COUNT(*) FROM votes v
+                         WHERE v.campaign_id = d.campaign_id AND v.design_id = d.id)
+                    ), 0)
+                    FROM designs d
+                    WHERE d.campaign_id = ? AND d.is_active = 1
+                ''', (campaign_id,))
+            return tuple(cursor.fetchone())
+    
+    def get_total_orders(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> int:
+        """Get total number of orders in a campaign"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM orders WHERE campaign_id = ?', (campaign_id,))
+            return cursor.fetchone()[0]
+    
+    def export_orders_to_csv(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> str:
+        """Export a campaign's orders to CSV format"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT o.telegram_id, o.full_name, o.shirt_number, 
                        o.shirt_name, o.size, o.payment_time
                 FROM orders o
+                WHERE o.campaign_id = ?
                 ORDER BY o.payment_time DESC
-            ''')
+            ''', (campaign_id,))
+            return orders_to_csv(cursor)
+    
+    # Final snapshots
+    @staticmethod
+    def _snapshot_taken(cursor: sqlite3.Cursor, campaign_id: int, kind: str, deadline: str) -> bool:
+        cursor.execute('''
+            SELECT 1 FROM final_snapshots WHERE campaign_id = ? AND kind = ? AND deadline = ?
+        ''', (campaign_id, kind, deadline))
+        return cursor.fetchone() is not None
+    
+    def freeze_results(self, campaign_id: int, deadline: datetime) -> List[Tuple[str, int]]:
+        """Final vote results at `deadline`, snapshotted by the first call"""
+        key = deadline.strftime(DATE_FORMAT)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if not self._snapshot_taken(cursor, campaign_id, 'results', key):
+                cursor.execute('BEGIN IMMEDIATE')
+                # Another process may have taken it while we waited for the lock
+                if not self._snapshot_taken(cursor, campaign_id, 'results', key):
+                    cursor.execute('''
+                        SELECT d.name,
+                               (SELECT COUNT(*) FROM votes v
+                                WHERE v.campaign_id = d.campaign_id AND v.design_id = d.id) as count
+                        FROM designs d
+                        WHERE d.campaign_id = ? AND d.is_active = 1
+                        ORDER BY count DESC
+                    ''', (campaign_id,))
+                    rows = cursor.fetchall()
+                    cursor.executemany('''
+                        INSERT INTO final_results (campaign_id, vote_deadline, position, design_name, votes)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', [(campaign_id, key, position, name, count)
+                          for position, (name, count) in enumerate(rows, 1)])
+                    cursor.execute('''
+                        INSERT INTO final_snapshots (campaign_id, kind, deadline, row_count)
+                        VALUES (?, 'results', ?, ?)
+                    ''', (campaign_id, key, len(rows)))
+            cursor.execute('''
+                SELECT design_name, votes FROM final_results
+                WHERE campaign_id = ? AND vote_deadline = ?
+                ORDER BY position
+            ''', (campaign_id, key))
+            return cursor.fetchall()
+    
+    def freeze_orders(self, campaign_id: int, deadline: datetime) -> int:
+        """Snapshot a campaign's orders at `deadline` once, returning how many there are"""
+        key = deadline.strftime(DATE_FORMAT)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if not self._snapshot_taken(cursor, campaign_id, 'orders', key):
+                cursor.execute('BEGIN IMMEDIATE')
+                if not self._snapshot_taken(cursor, campaign_id, 'orders', key):
+                    cursor.execute('''
+                        INSERT INTO final_orders
+                        (campaign_id, payment_deadline, payment_time, id, telegram_id, full_name,
+                         shirt_number, shirt_name, size, receipt_file_id)
+                        SELECT campaign_id, ?, payment_time, id, telegram_id, full_name,
+                               shirt_number, shirt_name, size, receipt_file_id
+                        FROM orders WHERE campaign_id = ?
+                    ''', (key, campaign_id))
+                    orders = cursor.rowcount
+                    cursor.execute('''
+                        INSERT INTO final_snapshots (campaign_id, kind, deadline, row_count)
+                        VALUES (?, 'orders', ?, ?)
+                    ''', (campaign_id, key, orders))
+            cursor.execute('''
+                SELECT row_count FROM final_snapshots
+                WHERE campaign_id = ? AND kind = 'orders' AND deadline = ?
+            ''', (campaign_id, key))
+            return cursor.fetchone()[0]
+    
+    def export_final_orders_to_csv(self, campaign_id: int, deadline: datetime) -> str:
+        """Export the orders snapshot taken at `deadline` to CSV format"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT telegram_id, full_name, shirt_number, shirt_name, size, payment_time
+                FROM final_orders
+                WHERE campaign_id = ? AND payment_deadline = ?
+                ORDER BY payment_time DESC, id DESC
+            ''', (campaign_id, deadline.strftime(DATE_FORMAT)))
+            return orders_to_csv(cursor)
+    
+    # Campaign archiving
+    def archive_campaign(self, label: str, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Dict[str, int]:
+        """Move a finished campaign's data into the archive tables and reset
+        
+        The campaign's votes, orders and inactive designs are copied into
+        the archived_* tables under `label` and removed from the live
+        tables, and its deadlines are reset, all in one transaction. Active
+        designs and the campaign itself stay for the next season.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Take the write lock up front so no vote or order can land
+            # between the copy and the delete
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            cursor.execute('SELECT 1 FROM archived_campaigns WHERE label = ?', (label,))
+            if cursor.fetchone():
+                raise ValueError(f"Campaign '{label}' is already archived")
+            
+            cursor.execute('''
+                INSERT INTO archived_votes (campaign, telegram_id, design_id, design_name)
+                SELECT ?, v.telegram_id, v.design_id, d.name
+                FROM votes v
+                LEFT JOIN designs d ON d.id = v.design_id
+                WHERE v.campaign_id = ?
+            ''', (label, campaign_id))
+            votes = cursor.rowcount
+            
+            cursor.execute('''
+                INSERT INTO archived_orders
+                (campaign, id, telegram_id, full_name, shirt_number, shirt_name,
+                 size, receipt_file_id, payment_time, receipt_file_unique_id,
+                 review_status, reviewed_by, reviewed_at)
+                SELECT ?, id, telegram_id, full_name, shirt_number, shirt_name,
+                       size, receipt_file_id, payment_time, receipt_file_unique_id,
+                       review_status, reviewed_by, reviewed_at
+                FROM orders WHERE campaign_id = ?
+            ''', (label, campaign_id))
+            orders = cursor.rowcount
+            
+            cursor.execute('''
+                INSERT INTO archived_designs
+                (campaign, id, name, description, image_file_id, created_at, display_order)
+                SELECT ?, id, name, description, image_file_id, created_at, display_order
+                FROM designs WHERE campaign_id = ? AND is_active = 0
+            ''', (label, campaign_id))
+            designs = cursor.rowcount
+            
+            cursor.execute('DELETE FROM votes WHERE campaign_id = ?', (campaign_id,))
+            cursor.execute('DELETE FROM orders WHERE campaign_id = ?', (campaign_id,))
+            cursor.execute('DELETE FROM designs WHERE campaign_id = ? AND is_active = 0', (campaign_id,))
+            # The season's final snapshots go with it. Their delete guards are
+            # dropped and recreated inside this transaction, so no other
+            # connection ever sees the tables unguarded.
+            for table in FINAL_TABLES:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {table}_undeletable')
+                cursor.execute(f'DELETE FROM {table} WHERE campaign_id = ?', (campaign_id,))
+            self._guard_final_tables(cursor)
             
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['Telegram ID', 'Full Name', 'Shirt Number', 
-                           'Shirt Name', 'Size', 'Payment Time'])
-            writer.writerows(cursor.fetchall())
+            cursor.execute('''
+                SELECT vote_deadline, payment_deadline FROM campaigns WHERE id = ?
+            ''', (campaign_id,))
+            old_deadlines = cursor.fetchone()
+            default_date = self.default_deadline().strftime(DATE_FORMAT)
+            cursor.execute('''
+                UPDATE campaigns SET vote_deadline = ?, payment_deadline = ? WHERE id = ?
+            ''', (default_date, default_date, campaign_id))
+            
+            cursor.execute('''
+                INSERT INTO archived_campaigns
+                (label, vote_deadline, payment_deadline, votes, orders, designs)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (label, old_deadlines['vote_deadline'], old_deadlines['payment_deadline'],
+                  votes, orders, designs))
+            self._journal(cursor, [(campaign_id, EVENT_ARCHIVED, None, None, label)])
             
-            return output.getvalue()
\ No newline at end of file
+            return {'votes': votes, 'orders': orders, 'designs': designs}
+    
+    def get_archived_campaigns(self) -> List[sqlite3.Row]:
+        """List archived campaigns, newest first"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT label, archived_at, votes, orders, designs
+                FROM archived_campaigns
+                ORDER BY archived_at DESC, rowid DESC
+            ''')
+            return cursor.fetchall()
+    
+    def export_archived_orders_to_csv(self, label: str) -> str:
+        """Export an archived campaign's orders and their reviews to CSV format"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT o.telegram_id, o.full_name, o.shirt_number, 
+                       o.shirt_name, o.size, o.payment_time, o.review_status
+                FROM archived_orders o
+                WHERE o.campaign = ?
+                ORDER BY o.payment_time DESC
+            ''', (label,))
+            return orders_to_csv(cursor, ARCHIVED_ORDER_CSV_HEADER)
+    
+    # Event journal
+    def get_events(self, after: int = 0, limit: int = 10000) -> List[Event]:
+        """Up to `limit` events with seq greater than `after`, in seq order"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Plain tuples, replay reads millions of them
+            cursor.row_factory = None
+            cursor.execute('''
+                SELECT seq, campaign_id, kind, telegram_id, subject, value, at
+                FROM events
+                WHERE seq > ?
+                ORDER BY seq
+                LIMIT ?
+            ''', (after, limit))
+            return cursor.fetchall()
+    
+    def get_last_event_seq(self) -> int:
+        """seq of the newest event, 0 when the journal is empty"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MAX(seq) FROM events')
+            return cursor.fetchone()[0] or 0
+    
+    def get_checkpoint(self) -> Optional[Tuple[int, bytes]]:
+        """(seq, state) of the latest replay checkpoint, None if there is none"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT seq, state FROM event_checkpoints ORDER BY seq DESC LIMIT 1')
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else None
+    
+    def save_checkpoint(self, seq: int, state: bytes):
+        """Store replay state covering the events up to `seq`, replacing older checkpoints"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO event_checkpoints (seq, state) VALUES (?, ?)
+            ''', (seq, state))
+            cursor.execute('DELETE FROM event_checkpoints WHERE seq < ?', (seq,))
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Fake Telegram Bot API for offline benchmarks
+
+FakeBotApi answers the Bot API methods the bot uses with plausible
+results. It can add latency, enforce per-chat and global flood limits
+(answering 429 with retry_after like the real API) and inject errors.
+It is reachable two ways:
+
+* in-process, by plugging FakeBotRequest into python-telegram-bot:
+
+    request = FakeBotRequest(FakeBotApi(latency=0.05))
+    builder = Application.builder().token(BOT_TOKEN).request(request)
+
+* over HTTP, by running FakeTelegramServer and pointing the bot at it:
+
+    python fake_telegram.py --port 8081 --latency 0.05 --chat-limit 1
+    builder = Application.builder().token(BOT_TOKEN).base_url('http://127.0.0.1:8081/bot') \
+        .base_file_url('http://127.0.0.1:8081/file/bot')
+
+Files registered with `add_file()` are served by getFile and downloaded
+from /file/bot<token>/<file_path>, like the real file endpoint.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {
+    'id': 100000001,
+    'is_bot': True,
+    'first_name': 'Jersey Bot',
+    'username': 'jersey_test_bot',
+    'can_join_groups': True,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False,
+}
+
+# Methods that count against Telegram's flood limits
+LIMITED_PREFIXES = ('send', 'edit', 'copy', 'forward')
+# Marks file downloads in URLs, after the base URL and before the token
+FILE_PATH_PREFIX = '/file/bot'
+
+
+class FakeApiError(Exception):
+    """Raised by a method to answer with a Bot API error"""
+
+    def __init__(self, error_code: int, description: str):
+        super().__init__(description)
+        self.error_code = error_code
+        self.description = description
+
+
+class FakeBotApi:
+    """In-memory stand-in for the Telegram Bot API"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        chat_limit: int = 0,
+        chat_window: float = 1.0,
+        global_limit: int = 0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.chat_limit = chat_limit
+        self.chat_window = chat_window
+        self.global_limit = global_limit
+        self.error_rate = error_rate
+
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.flood_rejections = 0
+        self.injected_errors = 0
+        self.webhook_url = ''
+
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._message_ids = itertools.count(1)
+        self._chat_sends: Dict[int, Deque[float]] = defaultdict(deque)
+        self._global_sends: Deque[float] = deque()
+        self._errors: Dict[str, List[Tuple[int, str, Optional[int]]]] = defaultdict(list)
+
+        self._updates_ready = threading.Condition(self._lock)
+        self._updates: Deque[Dict[str, Any]] = deque()
+        self._update_ids = itertools.count(1)
+
+        # file_id -> (file_unique_id, file_path), file_path -> contents
+        self._files: Dict[str, Tuple[str, str]] = {}
+        self._file_contents: Dict[str, bytes] = {}
+
+        self._methods: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            'getme': lambda params: BOT_USER,
+            'getupdates': self._get_updates,
+            'setwebhook': self._set_webhook,
+            'deletewebhook': self._delete_webhook,
+            'answercallbackquery': lambda params: True,
+            'getfile': self._get_file,
+            'sendmessage': lambda params: self._message(params, text=params.get('text', '')),
+            'sendphoto': lambda params: self._message(params, caption=params.get('caption')),
+            'senddocument': lambda params: self._message(params, caption=params.get('caption')),
+            'sendmediagroup': self._send_media_group,
+            'editmessagecaption': self._edit,
+            'editmessagetext': self._edit,
+            'editmessagereplymarkup': self._edit,
+            'pinchatmessage': lambda params: True,
+            'unpinchatmessage': lambda params: True,
+        }
+
+    # ==================== TEST CONTROLS ====================
+
+    def inject_error(self, method: str, error_code: int = 400,
+                     description: str = 'Bad Request: injected error',
+                     count: int = 1, retry_after: Optional[int] = None):
+        """Make the next `count` calls of `method` fail with the given error"""
+        with self._lock:
+            self._errors[method.lower()].extend([(error_code, description, retry_after)] * count)
+
+    def push_update(self, payload: Dict[str, Any]) -> int:
+        """Queue an update for getUpdates, assigning an update_id if missing"""
+        with self._updates_ready:
+            payload.setdefault('update_id', next(self._update_ids))
+            self._updates.append(payload)
+            self._updates_ready.notify_all()
+            return payload['update_id']
+
+    def add_file(self, file_id: str, data: bytes, file_unique_id: Optional[str] = None) -> str:
+        """Make a file available to getFile and downloads, returns its file_unique_id
+
+        Several file_ids may share a file_unique_id, as for the same photo
+        sent twice.
+        """
+        with self._lock:
+            file_unique_id = file_unique_id or f'u{len(self._file_contents) + 1}'
+            file_path = f'photos/{file_unique_id}.jpg'
+            self._files[file_id] = (file_unique_id, file_path)
+            self._file_contents[file_path] = data
+        return file_unique_id
+
+    def download(self, file_path: str) -> Optional[bytes]:
+        """Contents of a file by getFile's file_path, None when unknown"""
+        with self._lock:
+            self.calls['download'] += 1
+            return self._file_contents.get(file_path)
+
+    def delay(self) -> float:
+        """Seconds to wait before answering the next call"""
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._rng.uniform(0, self.jitter)
+
+    # ==================== METHODS ====================
+
+    def _message(self, params: Dict[str, Any], **content) -> Dict[str, Any]:
+        chat_id = int(params.get('chat_id', 0))
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+            'from': BOT_USER,
+        }
+        message.update({key: value for key, value in content.items() if value is not None})
+        return message
+
+    def _edit(self, params: Dict[str, Any]) -> Any:
+        if params.get('inline_message_id'):
+            return True
+        return self._message(params, caption=params.get('caption'), text=params.get('text'))
+
+    def _send_media_group(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        media = params.get('media') or []
+        if not 2 <= len(media) <= 10:
+            raise FakeApiError(400, 'Bad Request: wrong number of messages in the media group')
+        return [
+            self._message(params, caption=item.get('caption'), photo=[{
+                'file_id': item.get('media'), 'file_unique_id': f"u{item.get('media')}",
+                'width': 1280, 'height': 960,
+            }])
+            for item in media
+        ]
+
+    def _get_file(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        file_id = str(params.get('file_id', ''))
+        if file_id not in self._files:
+            raise FakeApiError(400, 'Bad Request: invalid file_id')
+        file_unique_id, file_path = self._files[file_id]
+        return {
+            'file_id': file_id,
+            'file_unique_id': file_unique_id,
+            'file_size': len(self._file_contents[file_path]),
+            'file_path': file_path,
+        }
+
+    def _set_webhook(self, params: Dict[str, Any]) -> bool:
+        self.webhook_url = params.get('url', '')
+        return True
+
+    def _delete_webhook(self, params: Dict[str, Any]) -> bool:
+        self.webhook_url = ''
+        return True
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        with self._updates_ready:
+            # Updates below the offset have been confirmed by the client
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_ready.wait(deadline - time.monotonic())
+            return list(itertools.islice(self._updates, limit))
+
+    # ==================== LIMITS AND ERRORS ====================
+
+    def _check_flood(self, name: str, params: Dict[str, Any]) -> Optional[int]:
+        """Return retry_after seconds if this call exceeds a flood limit"""
+        if not name.startswith(LIMITED_PREFIXES):
+            return None
+        now = time.monotonic()
+        windows = []
+        if self.global_limit:
+            windows.append((self._global_sends, self.global_limit, 1.0))
+        if self.chat_limit and params.get('chat_id') is not None:
+            windows.append((self._chat_sends[int(params['chat_id'])], self.chat_limit, self.chat_window))
+
+        for sends, limit, window in windows:
+            while sends and sends[0] <= now - window:
+                sends.popleft()
+            if len(sends) >= limit:
+                return max(1, math.ceil(sends[0] + window - now))
+        for sends, _, _ in windows:
+            sends.append(now)
+        return None
+
+    @staticmethod
+    def _error(error_code: int, description: str, retry_after: Optional[int] = None):
+        body = {'ok': False, 'error_code': error_code, 'description': description}
+        if retry_after is not None:
+            body['parameters'] = {'retry_after': retry_after}
+        return error_code, body
+
+    def handle(self, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Answer one API call, returning the HTTP status and JSON body"""
+        name = method.lower()
+        handler = self._methods.get(name)
+        if handler is None:
+            return self._error(404, 'Not Found: method not found')
+
+        with self._lock:
+            self.calls[name] += 1
+            if self._errors[name]:
+                self.injected_errors += 1
+                return self._error(*self._errors[name].pop(0))
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.injected_errors += 1
+                return self._error(502, 'Bad Gateway')
+            retry_after = self._check_flood(name, params)
+            if retry_after is not None:
+                self.flood_rejections += 1
+                return self._error(429, f'Too Many Requests: retry after {retry_after}', retry_after)
+            if name != 'getupdates':
+                return self._answer(handler, params)
+        # getUpdates long-polls on a condition that takes the lock itself
+        return self._answer(handler, params)
+
+    def _answer(self, handler: Callable[[Dict[str, Any]], Any],
+                params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        try:
+            return 200, {'ok': True, 'result': handler(params)}
+        except FakeApiError as e:
+            return self._error(e.error_code, e.description)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': dict(sorted(self.calls.items())),
+                'flood_rejections': self.flood_rejections,
+                'injected_errors': self.injected_errors,
+            }
+
+
+# ==================== IN-PROCESS TRANSPORT ====================
+
+class FakeBotRequest(BaseRequest):
+    """BaseRequest that answers from a FakeBotApi instead of the network"""
+
+    def __init__(self, api: Optional[FakeBotApi] = None):
+        self.api = api or FakeBotApi()
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=BaseRequest.DEFAULT_NONE,
+        write_timeout=BaseRequest.DEFAULT_NONE,
+        connect_timeout=BaseRequest.DEFAULT_NONE,
+        pool_timeout=BaseRequest.DEFAULT_NONE,
+    ) -> Tuple[int, bytes]:
+        delay = self.api.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        if method == 'GET' and FILE_PATH_PREFIX in url:
+            # .../file/bot<token>/<file_path>
+            data = self.api.download(unquote(url.split(FILE_PATH_PREFIX, 1)[1].split('/', 1)[1]))
+            return (200, data) if data is not None else (404, b'Not Found')
+        params = request_data.parameters if request_data else {}
+        api_method = url.rsplit('/', 1)[-1]
+        if api_method.lower() == 'getupdates':
+            # Long polling blocks, keep it off the event loop
+            status, body = await asyncio.to_thread(self.api.handle, api_method, params)
+        else:
+            status, body = self.api.handle(api_method, params)
+        return status, json.dumps(body).encode('utf-8')
+
+
+# ==================== HTTP SERVER ====================
+
+def _parse_value(value: str) -> Any:
+    """python-telegram-bot JSON-encodes non-string parameters"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _parse_body(content_type: str, body: bytes) -> Dict[str, Any]:
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body
+        )
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            payload = part.get_payload(decode=True) or b''
+            if part.get_filename():
+                params[name] = {'filename': part.get_filename(), 'size': len(payload)}
+            else:
+                params[name] = _parse_value(payload.decode('utf-8'))
+        return params
+    return {key: _parse_value(value) for key, value in parse_qsl(body.decode('utf-8'))}
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    """Routes /bot<token>/<method> requests to the server's FakeBotApi"""
+
+    server: 'FakeTelegramServer'
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        if url.path.startswith(FILE_PATH_PREFIX):
+            self._download(url.path)
+            return
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or not parts[0].startswith('bot'):
+            self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        params = _parse_body(self.headers.get('Content-Type', ''), self.rfile.read(length))
+        params.update({key: _parse_value(value) for key, value in parse_qsl(url.query)})
+
+        delay = self.server.api.delay()
+        if delay:
+            time.sleep(delay)
+        self._reply(*self.server.api.handle(parts[1], params))
+
+    def _download(self, path: str):
+        """Serve /file/bot<token>/<file_path>"""
+        parts = path[len(FILE_PATH_PREFIX):].split('/', 1)
+        delay = self.server.api.delay()
+        if delay:
+            time.sleep(delay)
+        data = self.server.api.download(unquote(parts[1])) if len(parts) == 2 else None
+        if data is None:
+            self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _reply(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        # Suppress log messages
+        pass
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    """Threaded HTTP server exposing a FakeBotApi"""
+
+    daemon_threads = True
+
+    def __init__(self, api: FakeBotApi, host: str = '127.0.0.1', port: int = 0):
+        self.api = api
+        super().__init__((host, port), FakeTelegramHandler)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    @property
+    def base_file_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}{FILE_PATH_PREFIX}'
+
+    def start_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Telegram Bot API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every call')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='extra random latency of up to this many seconds')
+    parser.add_argument('--chat-limit', type=int, default=0,
+                        help='messages allowed per chat per --chat-window (0 = unlimited)')
+    parser.add_argument('--chat-window', type=float, default=1.0)
+    parser.add_argument('--global-limit', type=int, default=0,
+                        help='messages allowed per second across all chats (0 = unlimited)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of calls failing with 502 Bad Gateway')
+    args = parser.parse_args()
+
+    api = FakeBotApi(
+        latency=args.latency, jitter=args.jitter, chat_limit=args.chat_limit, chat_window=args.chat_window,
+        global_limit=args.global_limit, error_rate=args.error_rate
+    )
+    server = FakeTelegramServer(api, args.host, args.port)
+    print(f"🤖 Fake Bot API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📡 {api.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,127 @@
-from flask import Flask
-import threading
+"""
+Health check server
+
+Render expects something listening on $PORT. `start()` binds it right at
+process start, before python-telegram-bot is imported or the database is
+opened, and GET / answers 503 until `set_ready()` reports that updates
+are actually being served. GET /metrics serves the registered metrics
+providers as JSON. POSTs go to the handler registered for their path in
+`post_routes`, which is how webhook updates arrive (see workers.py).
+
+Providers read state the bot's event loop changes, so once the bot hands
+its loop to `set_metrics_loop()` the snapshot is taken on that loop
+instead of on the server thread. A provider that fails shows its error
+under its name without failing the others.
+"""
+
+import asyncio
+import concurrent.futures
+import json
 import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Mapping, Optional
+
+# Seconds /metrics waits for the event loop before snapshotting from the
+# server thread, so a stalled loop still shows up in the metrics
+METRICS_TIMEOUT = 2.0
+
+# Runtime metrics served as JSON on /metrics, name -> snapshot function
+metrics_providers: Dict[str, Callable[[], Any]] = {}
+
+# POST path -> handler(headers, body) returning the status code to answer
+post_routes: Dict[str, Callable[[Mapping[str, str], bytes], int]] = {}
+
+_ready = threading.Event()
+
+# Event loop the providers' state belongs to, None to call them directly
+_metrics_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def set_ready(ready: bool = True):
+    """Report whether the bot is serving updates"""
+    if ready:
+        _ready.set()
+    else:
+        _ready.clear()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def set_metrics_loop(loop: Optional[asyncio.AbstractEventLoop]):
+    """Take /metrics snapshots on `loop` from now on, or on the server thread for None"""
+    global _metrics_loop
+    _metrics_loop = loop
+
+
+def _collect_metrics() -> Dict[str, Any]:
+    metrics = {}
+    for name, provider in list(metrics_providers.items()):
+        try:
+            metrics[name] = provider()
+        except Exception as e:
+            metrics[name] = {'error': f'{type(e).__name__}: {e}'}
+    return metrics
+
+
+async def _collect_metrics_async() -> Dict[str, Any]:
+    return _collect_metrics()
+
+
+def snapshot_metrics() -> Dict[str, Any]:
+    """Every provider's snapshot by name, taken on the metrics loop when there is one"""
+    loop = _metrics_loop
+    if loop is not None and loop.is_running():
+        future = asyncio.run_coroutine_threadsafe(_collect_metrics_async(), loop)
+        try:
+            return future.result(METRICS_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+    return _collect_metrics()
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    # Keep-alive, Telegram reuses its webhook connections
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = json.dumps(snapshot_metrics())
+            self._reply(200, 'application/json', body)
+        elif _ready.is_set():
+            self._reply(200, 'text/html', 'Jersey Bot is running!')
+        else:
+            self._reply(503, 'text/html', 'Jersey Bot is starting')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        handler = post_routes.get(self.path)
+        self._reply(handler(self.headers, body) if handler else 404, 'text/plain', '')
+
+    def _reply(self, status: int, content_type: str, body: str):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
 
-app = Flask(__name__)
+    def log_message(self, format, *args):
+        # Suppress log messages
+        pass
 
-@app.route('/')
-def health():
-    return "Bot is running!"
 
-def run_flask():
-    port = int(os.environ.get('PORT', 10000))
-    app.run(host='0.0.0.0', port=port)
+def start(port: Optional[int] = None) -> ThreadingHTTPServer:
+    """Bind the health check port and serve it from a background thread
 
-# This will run the Flask server in a separate thread
-threading.Thread(target=run_flask, daemon=True).start()
\ No newline at end of file
+    The port is bound before this returns, so callers need not wait.
+    """
+    if port is None:
+        port = int(os.environ.get('PORT', 10000))
+    server = ThreadingHTTPServer(('0.0.0.0', port), HealthHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='health', daemon=True).start()
+    print(f"🌐 Health check server running on port {port}")
+    return server
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Event journal benchmark
+
+Fills a fresh database's journal with N synthetic events (votes with some
+revotes, orders, design changes, over several campaigns) and reports:
+
+* append throughput, one event per transaction as the bot's writes do
+  versus batched executemany inserts,
+* a full replay of every event (journal.replay from scratch),
+* storing a checkpoint, and replaying from it after more events arrive.
+
+Each replay is checked against tallies counted while generating the
+events. Exits with status 1 on any mismatch.
+
+Usage:
+    python journal_benchmark.py                      # 1M events
+    python journal_benchmark.py --events 200000 --batch 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, List, Tuple
+
+import journal
+from config import SHIRT_SIZES
+from database import Database
+from repository import EVENT_DESIGN_ADDED, EVENT_DESIGN_CHANGED, EVENT_ORDER, EVENT_VOTE
+
+CAMPAIGNS = 4
+DESIGNS = 12  # per campaign
+
+
+class Expected:
+    """What a replay of the generated events must come to"""
+
+    def __init__(self):
+        self.votes: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self.sizes: Dict[int, Counter] = defaultdict(Counter)
+        self.inactive = set()
+
+    def results(self, campaign_id: int) -> Dict[int, int]:
+        tally = Counter(self.votes[campaign_id].values())
+        first = (campaign_id - 1) * DESIGNS + 1
+        return {d: tally[d] for d in range(first, first + DESIGNS) if d not in self.inactive}
+
+
+def generate(count: int, users: int, expected: Expected, seed: int) -> Iterator[Tuple]:
+    """(campaign_id, kind, telegram_id, subject, value) rows, designs first"""
+    rng = random.Random(seed)
+    for design_id in range(1, CAMPAIGNS * DESIGNS + 1):
+        yield (design_id - 1) // DESIGNS + 1, EVENT_DESIGN_ADDED, None, design_id, None
+    ordered = set()
+    for _ in range(count - CAMPAIGNS * DESIGNS):
+        telegram_id = rng.randint(1, users)
+        campaign_id = telegram_id % CAMPAIGNS + 1
+        roll = rng.random()
+        if roll < 0.0001:
+            design_id = (campaign_id - 1) * DESIGNS + rng.randint(1, DESIGNS)
+            active = rng.random() < 0.5
+            (expected.inactive.discard if active else expected.inactive.add)(design_id)
+            yield campaign_id, EVENT_DESIGN_CHANGED, None, design_id, f'{{"is_active": {str(active).lower()}}}'
+        elif roll < 0.7 or (campaign_id, telegram_id) in ordered:
+            design_id = (campaign_id - 1) * DESIGNS + rng.randint(1, DESIGNS)
+            expected.votes[campaign_id][telegram_id] = design_id
+            yield campaign_id, EVENT_VOTE, telegram_id, design_id, None
+        else:
+            size = rng.choice(SHIRT_SIZES)
+            ordered.add((campaign_id, telegram_id))
+            expected.sizes[campaign_id][size] += 1
+            yield campaign_id, EVENT_ORDER, telegram_id, len(ordered), size
+
+
+def append(db: Database, rows: List[Tuple], batch: int) -> float:
+    """Seconds to append `rows` in executemany batches of `batch`"""
+    started = time.perf_counter()
+    for start in range(0, len(rows), batch):
+        with db.get_connection() as conn:
+            Database._journal(conn.cursor(), rows[start:start + batch])
+    return time.perf_counter() - started
+
+
+def check(aggregates: journal.Aggregates, expected: Expected, what: str) -> List[str]:
+    problems = []
+    for campaign_id in range(1, CAMPAIGNS + 1):
+        if aggregates.results(campaign_id) != expected.results(campaign_id):
+            problems.append(f"{what}: campaign {campaign_id} tallies differ")
+        if aggregates.order_sizes(campaign_id) != expected.sizes[campaign_id]:
+            problems.append(f"{what}: campaign {campaign_id} sizes differ")
+        if len(aggregates.votes.get(campaign_id, ())) != len(expected.votes[campaign_id]):
+            problems.append(f"{what}: campaign {campaign_id} voters differ")
+    return problems
+
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark event journal appends and replay')
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=300_000)
+    parser.add_argument('--batch', type=int, default=10_000, help='events per append batch and per replay read')
+    parser.add_argument('--single', type=int, default=2_000, help='events appended one per transaction')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    expected = Expected()
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'journal.db'))
+        rows = list(generate(args.events, args.users, expected, args.seed))
+        tail = rows[-args.events // 100:]
+        head = rows[:len(rows) - len(tail)]
+        print(f"📜 {len(rows):,} events, {args.users:,} users, {CAMPAIGNS} campaigns\n")
+
+        single = head[:args.single]
+        elapsed = append(db, single, 1)
+        print(f"append, 1 per transaction   {len(single) / elapsed:>12,.0f} events/s")
+        elapsed = append(db, head[len(single):], args.batch)
+        print(f"append, {args.batch:,} per batch{'':<{9 - len(f'{args.batch:,}')}}"
+              f"{(len(head) - len(single)) / elapsed:>12,.0f} events/s")
+        print(f"journal size                {os.path.getsize(db.db_name) / len(head):>12.1f} bytes/event\n")
+
+        aggregates, elapsed = timed(lambda: journal.replay(db, journal.Aggregates(), batch=args.batch,
+                                                           checkpoint_every=0))
+        print(f"full replay                 {elapsed:>12.2f} s   {aggregates.events / elapsed:>10,.0f} events/s")
+        state, elapsed = timed(aggregates.dumps)
+        db.save_checkpoint(aggregates.seq, state)
+        print(f"checkpoint                  {elapsed:>12.2f} s   {len(state) / 1e6:>10.1f} MB")
+
+        append(db, tail, args.batch)
+        resumed, elapsed = timed(lambda: journal.replay(db, batch=args.batch, checkpoint_every=0))
+        print(f"replay from checkpoint      {elapsed:>12.2f} s   {len(tail):>10,} newer events")
+        full, elapsed = timed(lambda: journal.replay(db, journal.Aggregates(), batch=args.batch,
+                                                     checkpoint_every=0))
+        print(f"full replay, same events    {elapsed:>12.2f} s")
+
+        problems += check(resumed, expected, "replay from checkpoint")
+        problems += check(full, expected, "full replay")
+        if not resumed.seq == resumed.events == full.seq == full.events == len(rows):
+            problems.append(f"replays ended at {resumed.seq} and {full.seq}, expected {len(rows)}")
+
+    for problem in problems:
+        print(f"   ❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("\n✅ Both replays match the generated votes and orders")
+
+
+if __name__ == '__main__':
+    main()
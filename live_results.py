@@ -0,0 +1,154 @@
+"""
+Live voting results
+
+LiveResults keeps one pinned results message per admin chat up to date by
+editing it in place. Votes only mark their campaign dirty; the tally is
+recomputed and pushed at most once per `interval` seconds per campaign,
+and the edit is skipped when the tally has not changed. A burst of votes
+therefore costs a handful of queries and editMessageText calls instead of
+one per vote.
+
+Subscriptions live in memory: after a restart the pinned message stays
+as it was until an admin sends /live_results again. When other processes
+take votes too (see workers.py), `mark_all_dirty()` on a timer stands in
+for their mark_dirty() calls.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+Results = List[Tuple[str, int]]
+
+
+class LiveResults:
+    """Coalesces vote changes into periodic edits of pinned messages"""
+
+    def __init__(
+        self,
+        bot,
+        load: Callable[[int], Sequence[Sequence[Any]]],
+        render: Callable[[Results], str],
+        interval: float = 5.0,
+    ):
+        self.bot = bot
+        self.load = load  # campaign_id -> vote results
+        self.render = render  # vote results -> Markdown text
+        self.interval = interval
+        # campaign_id -> chat_id -> message_id
+        self._messages: Dict[int, Dict[int, int]] = {}
+        self._chat_campaigns: Dict[int, int] = {}
+        self._last_results: Dict[int, Results] = {}
+        self._last_flush: Dict[int, float] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.changes = 0
+        self.refreshes = 0
+        self.unchanged = 0
+        self.edits = 0
+
+    def subscribe(self, campaign_id: int, chat_id: int, message_id: int,
+                  results: Sequence[Sequence[Any]]) -> Optional[int]:
+        """Keep a message showing `results` up to date
+
+        Returns the message_id this chat had live before, if any.
+        """
+        previous = self.unsubscribe(chat_id)
+        self._messages.setdefault(campaign_id, {})[chat_id] = message_id
+        self._chat_campaigns[chat_id] = campaign_id
+        self._last_results[campaign_id] = [tuple(row) for row in results]
+        return previous
+
+    def unsubscribe(self, chat_id: int) -> Optional[int]:
+        """Stop updating a chat's live message, returning its message_id"""
+        campaign_id = self._chat_campaigns.pop(chat_id, None)
+        if campaign_id is None:
+            return None
+        messages = self._messages[campaign_id]
+        message_id = messages.pop(chat_id)
+        if not messages:
+            del self._messages[campaign_id]
+            self._last_results.pop(campaign_id, None)
+            timer = self._timers.pop(campaign_id, None)
+            if timer:
+                timer.cancel()
+        return message_id
+
+    def mark_dirty(self, campaign_id: int):
+        """Note that a campaign's tally may have changed"""
+        if campaign_id not in self._messages:
+            return
+        self.changes += 1
+        if campaign_id in self._timers:
+            return  # the pending refresh will pick this change up
+        # First change after a quiet period goes out at once, the rest of a
+        # burst waits for the interval to pass
+        delay = self._last_flush.get(campaign_id, float('-inf')) + self.interval - time.monotonic()
+        self._timers[campaign_id] = asyncio.get_running_loop().call_later(
+            max(0.0, delay), self._start_refresh, campaign_id
+        )
+
+    def mark_all_dirty(self):
+        """Check every live campaign, for votes this process did not see"""
+        for campaign_id in list(self._messages):
+            self.mark_dirty(campaign_id)
+
+    def _start_refresh(self, campaign_id: int):
+        self._timers.pop(campaign_id, None)
+        task = asyncio.get_running_loop().create_task(self._refresh(campaign_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, campaign_id: int):
+        self._last_flush[campaign_id] = time.monotonic()
+        messages = self._messages.get(campaign_id)
+        if not messages:
+            return
+        self.refreshes += 1
+        try:
+            results = [tuple(row) for row in self.load(campaign_id)]
+        except Exception as e:
+            logger.error("Loading live results for campaign %s failed: %s", campaign_id, e)
+            return
+        if results == self._last_results.get(campaign_id):
+            self.unchanged += 1
+            return
+        self._last_results[campaign_id] = results
+
+        text = self.render(results)
+        for chat_id, message_id in list(messages.items()):
+            try:
+                await self.bot.edit_message_text(
+                    text, chat_id=chat_id, message_id=message_id, parse_mode='Markdown'
+                )
+                self.edits += 1
+            except RetryAfter as e:
+                # Try again once Telegram allows it, with whatever is newest then
+                logger.warning("Live results edit throttled for %ss", e.retry_after)
+                self._last_results.pop(campaign_id, None)
+                self._last_flush[campaign_id] = time.monotonic() + float(e.retry_after) - self.interval
+                self.mark_dirty(campaign_id)
+                return
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    continue
+                # Deleted message or chat we can no longer write to
+                logger.warning("Dropping live results in chat %s: %s", chat_id, e)
+                self.unsubscribe(chat_id)
+            except TelegramError as e:
+                logger.warning("Live results edit in chat %s failed: %s", chat_id, e)
+                self._last_results.pop(campaign_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'messages': len(self._chat_campaigns),
+            'changes': self.changes,
+            'refreshes': self.refreshes,
+            'unchanged': self.unchanged,
+            'edits': self.edits,
+        }
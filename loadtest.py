@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the bot handlers
+
+Builds realistic Update objects for thousands of simulated users and feeds
+them through the real Application (every handler registered by
+bot.build_application) against a temporary database. Bot API calls are
+answered by fake_telegram.FakeBotApi with a configurable latency.
+
+Each simulated user runs the full journey: /start, /vote, a vote button,
+/order and every step of the order conversation. Admins poll /results and
+/export while the load runs. At the end, throughput and p50/p95/p99
+latency per handler are reported together with the share of time spent in
+the database versus the (fake) network.
+
+With --http the calls go through the bot's HTTP client
+(api_client.BotApiRequest) to a local fake_telegram.FakeTelegramServer,
+and the report adds how long each method waited for a pooled
+connection. --chat-limit/--global-limit make the server answer 429
+RetryAfter like Telegram's flood control.
+
+Usage:
+    python loadtest.py --users 2000 --rate 100 --latency 0.05
+    python loadtest.py --http --chat-limit 1 --global-limit 30
+"""
+
+import argparse
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+import bot
+from api_client import BotApiRequest
+from config import ADMIN_IDS, API_POOL_TIMEOUT, BOT_TOKEN, MAX_CONCURRENT_UPDATES, SHIRT_SIZES
+from database import DEFAULT_CAMPAIGN_ID, Database
+from fake_telegram import FakeBotApi, FakeBotRequest, FakeTelegramServer
+
+
+@dataclass
+class Sample:
+    """Timing of a single processed update"""
+    label: str
+    arrived: float
+    db_time: float = 0.0
+    net_time: float = 0.0
+    shed: bool = False
+    finished: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+_current_sample: contextvars.ContextVar[Optional[Sample]] = contextvars.ContextVar(
+    'loadtest_sample', default=None
+)
+
+
+class TimedDatabase(Database):
+    """Database that charges connection time to the current update"""
+
+    @contextmanager
+    def get_connection(self):
+        started = time.perf_counter()
+        try:
+            with super().get_connection() as conn:
+                yield conn
+        finally:
+            sample = _current_sample.get()
+            if sample:
+                sample.db_time += time.perf_counter() - started
+
+
+class TimedRequestMixin:
+    """Charges Bot API call time to the current update"""
+
+    async def do_request(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(*args, **kwargs)
+        finally:
+            sample = _current_sample.get()
+            if sample:
+                sample.net_time += time.perf_counter() - started
+
+
+class TimedFakeRequest(TimedRequestMixin, FakeBotRequest):
+    pass
+
+
+class TimedBotApiRequest(TimedRequestMixin, BotApiRequest):
+    pass
+
+
+# ==================== SYNTHETIC UPDATES ====================
+
+class UpdateFactory:
+    """Builds Bot API update payloads for simulated users"""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    @staticmethod
+    def _user(user_id: int) -> Dict[str, Any]:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'language_code': 'en'}
+
+    def _message(self, user_id: int, **content) -> Dict[str, Any]:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': f'User{user_id}'},
+            'from': self._user(user_id),
+        }
+        message.update(content)
+        return message
+
+    def command(self, user_id: int, command: str, args: str = '') -> Dict[str, Any]:
+        text = f'/{command} {args}' if args else f'/{command}'
+        return {
+            'update_id': next(self._update_ids),
+            'message': self._message(
+                user_id, text=text,
+                entities=[{'type': 'bot_command', 'offset': 0, 'length': len(command) + 1}]
+            ),
+        }
+
+    def text(self, user_id: int, text: str) -> Dict[str, Any]:
+        return {'update_id': next(self._update_ids), 'message': self._message(user_id, text=text)}
+
+    def photo(self, user_id: int) -> Dict[str, Any]:
+        unique = f'{user_id}-{next(self._message_ids)}'
+        sizes = [
+            {'file_id': f'photo-{unique}-{width}', 'file_unique_id': f'u-{unique}-{width}',
+             'width': width, 'height': width, 'file_size': width * 100}
+            for width in (90, 320, 1280)
+        ]
+        return {'update_id': next(self._update_ids), 'message': self._message(user_id, photo=sizes)}
+
+    def callback(self, user_id: int, data: str) -> Dict[str, Any]:
+        return {
+            'update_id': next(self._update_ids),
+            'callback_query': {
+                'id': str(next(self._message_ids)),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': self._message(user_id, caption='design'),
+            },
+        }
+
+
+def user_journey(factory: UpdateFactory, user_id: int, design_ids: List[int], rng: random.Random):
+    """Yield (handler label, update payload) for one user's full session"""
+    yield 'start', factory.command(user_id, 'start')
+    yield 'vote', factory.command(user_id, 'vote')
+    yield 'vote_callback', factory.callback(user_id, f'vote_{rng.choice(design_ids)}')
+    yield 'order_start', factory.command(user_id, 'order')
+    yield 'get_name', factory.text(user_id, f'Simulated User {user_id}')
+    yield 'get_shirt_number', factory.text(user_id, str(rng.randint(0, 99)))
+    yield 'get_shirt_name', factory.text(user_id, f'U{user_id}'[:15])
+    yield 'size_callback', factory.callback(user_id, f'size_{rng.choice(SHIRT_SIZES)}')
+    yield 'get_receipt', factory.photo(user_id)
+
+
+# ==================== LOAD GENERATOR ====================
+
+class LoadTest:
+    """Drives an Application with simulated users and collects samples"""
+
+    def __init__(self, application: Application, think_time: float, seed: int):
+        self.application = application
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.factory = UpdateFactory()
+        self.samples: List[Sample] = []
+        self._pending: Dict[int, Sample] = {}
+
+        # Wrap the update processor so every update is timed from queueing
+        # to completion, including updates it sheds under load
+        processor = application.update_processor
+        process = processor.do_process_update
+        shed = getattr(processor, 'shed_callback', None)
+
+        async def timed_process(update, coroutine):
+            _current_sample.set(self._pending.get(update.update_id))
+            try:
+                await process(update, coroutine)
+            finally:
+                self._finish(update)
+
+        async def timed_shed(update):
+            sample = self._pending.get(update.update_id)
+            if sample:
+                sample.shed = True
+            try:
+                if shed:
+                    await shed(update)
+            finally:
+                self._finish(update)
+
+        processor.do_process_update = timed_process
+        if hasattr(processor, 'shed_callback'):
+            processor.shed_callback = timed_shed
+
+    def _finish(self, update: Update):
+        sample = self._pending.pop(update.update_id, None)
+        if sample:
+            sample.finished = time.perf_counter()
+            sample.done.set()
+
+    async def dispatch(self, label: str, payload: Dict[str, Any]) -> Sample:
+        """Queue one update without waiting for it to be processed"""
+        sample = Sample(label=label, arrived=time.perf_counter())
+        self._pending[payload['update_id']] = sample
+        self.samples.append(sample)
+        await self.application.update_queue.put(Update.de_json(payload, self.application.bot))
+        return sample
+
+    async def send(self, label: str, payload: Dict[str, Any]) -> Sample:
+        """Queue one update and wait until the application has processed it"""
+        sample = await self.dispatch(label, payload)
+        await sample.done.wait()
+        return sample
+
+    async def run_user(self, user_id: int, design_ids: List[int]):
+        for label, payload in user_journey(self.factory, user_id, design_ids, self.rng):
+            await self.send(label, payload)
+            if self.think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+    async def run_admin(self, admin_id: int, interval: float, stop: asyncio.Event):
+        commands = itertools.cycle(['results', 'export'])
+        while not stop.is_set():
+            command = next(commands)
+            await self.send(command, self.factory.command(admin_id, command))
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, users: int, rate: float, design_ids: List[int], admin_interval: float):
+        stop = asyncio.Event()
+        admin = asyncio.create_task(self.run_admin(ADMIN_IDS[0], admin_interval, stop))
+        sessions = []
+        for user_id in range(1, users + 1):
+            sessions.append(asyncio.create_task(self.run_user(1_000_000 + user_id, design_ids)))
+            if rate:
+                await asyncio.sleep(self.rng.expovariate(rate))
+        await asyncio.gather(*sessions)
+        stop.set()
+        await admin
+
+
+# ==================== REPORT ====================
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report_pool(request: BotApiRequest):
+    """Where Bot API call time went: waiting for a connection or the call itself"""
+    stats = request.stats()
+    print(f"\n🔌 Connection pool of {stats['pool_size']}: {stats['pool_wait_share']:.1%} of API time "
+          f"spent waiting for a connection, {stats['pool_timeouts']} pool timeouts")
+    print(f"{'method':<22}{'calls':>7}{'avg ms':>9}{'max ms':>9}{'wait avg':>10}{'wait max':>10}")
+    for method, method_stats in stats['methods'].items():
+        print(f"{method:<22}{method_stats['calls']:>7}{method_stats['avg_ms']:>9.1f}"
+              f"{method_stats['max_ms']:>9.1f}{method_stats['pool_wait_avg_ms']:>10.1f}"
+              f"{method_stats['pool_wait_max_ms']:>10.1f}")
+
+
+def report(samples: List[Sample], elapsed: float, api: FakeBotApi):
+    finished = [s for s in samples if s.finished is not None and not s.shed]
+    shed: Dict[str, int] = defaultdict(int)
+    for sample in samples:
+        if sample.shed:
+            shed[sample.label] += 1
+    by_label: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in finished:
+        by_label[sample.label].append(sample)
+
+    print(f"\n📊 {len(finished)} updates in {elapsed:.1f}s "
+          f"({len(finished) / elapsed:.1f} updates/s)")
+    print(f"{'handler':<18}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'db ms':>9}{'net ms':>9}{'shed':>7}")
+    for label in sorted(by_label):
+        group = by_label[label]
+        latencies = [(s.finished - s.arrived) * 1000 for s in group]
+        print(f"{label:<18}{len(group):>7}"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+              f"{percentile(latencies, 99):>9.1f}"
+              f"{sum(s.db_time for s in group) / len(group) * 1000:>9.2f}"
+              f"{sum(s.net_time for s in group) / len(group) * 1000:>9.2f}"
+              f"{shed[label]:>7}")
+
+    total = sum((s.finished - s.arrived) for s in finished)
+    db_total = sum(s.db_time for s in finished)
+    net_total = sum(s.net_time for s in finished)
+    if total:
+        print(f"\n⏱️ Time in database: {db_total / total:.1%}, "
+              f"in Bot API calls: {net_total / total:.1%}, "
+              f"other (queueing, handler code): {(total - db_total - net_total) / total:.1%}")
+    stats = api.stats()
+    print(f"🚧 Updates shed under load: {sum(shed.values())}")
+    print(f"📡 API calls: {stats['calls']}")
+    print(f"🚦 Flood rejections (429): {stats['flood_rejections']}, "
+          f"injected errors: {stats['injected_errors']}")
+
+
+# ==================== MAIN ====================
+
+def fake_api_builder(api: FakeBotApi, http: bool = False, pool_size: int = 8):
+    """Return an ApplicationBuilder wired to `api`, plus the HTTP server if any"""
+    builder = Application.builder().token(BOT_TOKEN).updater(None)
+    if not http:
+        return builder.request(TimedFakeRequest(api)).get_updates_request(FakeBotRequest(api)), None
+    server = FakeTelegramServer(api)
+    server.start_background()
+    builder = builder.base_url(server.base_url).base_file_url(server.base_file_url).request(
+        TimedBotApiRequest(pool_size, pool_timeout=API_POOL_TIMEOUT)
+    )
+    return builder, server
+
+
+def seed_designs(db: Database, count: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[int]:
+    return [
+        db.add_design(f'Design {i}', f'Synthetic design {i}', f'design-file-{campaign_id}-{i}',
+                      display_order=i, campaign_id=campaign_id)
+        for i in range(1, count + 1)
+    ]
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        bot.db = TimedDatabase(os.path.join(tmp, 'loadtest.db'))
+        design_ids = seed_designs(bot.db, args.designs)
+
+        api = FakeBotApi(
+            latency=args.latency, chat_limit=args.chat_limit,
+            global_limit=args.global_limit, error_rate=args.error_rate, seed=args.seed
+        )
+        builder, server = fake_api_builder(api, args.http, args.pool_size)
+        application = bot.build_application(builder, args.concurrency)
+        load = LoadTest(application, think_time=args.think_time, seed=args.seed)
+
+        async with application:
+            await application.start()
+            if args.live_results:
+                await load.send('live_results', load.factory.command(ADMIN_IDS[0], 'live_results'))
+            started = time.perf_counter()
+            await load.run(args.users, args.rate, design_ids, args.admin_interval)
+            elapsed = time.perf_counter() - started
+            await application.stop()
+
+        if server:
+            server.shutdown()
+            server.server_close()
+        report(load.samples, elapsed, api)
+        if isinstance(application.bot.request, BotApiRequest):
+            report_pool(application.bot.request)
+        if args.live_results:
+            print(f"📌 Live results: {bot.live_results.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the bot handlers with synthetic updates')
+    parser.add_argument('--users', type=int, default=1000, help='number of simulated users')
+    parser.add_argument('--rate', type=float, default=50.0,
+                        help='new users arriving per second (0 = all at once)')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='simulated Bot API latency in seconds')
+    parser.add_argument('--think-time', type=float, default=0.5,
+                        help='mean pause between a user\'s messages in seconds')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_UPDATES,
+                        help='updates processed concurrently (1 = sequential)')
+    parser.add_argument('--designs', type=int, default=6, help='number of active designs')
+    parser.add_argument('--admin-interval', type=float, default=2.0,
+                        help='seconds between admin /results and /export calls')
+    parser.add_argument('--live-results', action='store_true',
+                        help='have the admin pin /live_results before the load starts')
+    parser.add_argument('--http', action='store_true',
+                        help='call a local fake Bot API server over HTTP instead of in-process')
+    parser.add_argument('--pool-size', type=int, default=8,
+                        help='HTTP connection pool size with --http')
+    parser.add_argument('--chat-limit', type=int, default=0,
+                        help='fake API messages per chat per second (0 = unlimited)')
+    parser.add_argument('--global-limit', type=int, default=0,
+                        help='fake API messages per second overall (0 = unlimited)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of fake API calls failing with 502')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='keep the bot\'s INFO logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Non-blocking logging pipeline
+
+setup_logging() routes every log record through a QueueHandler into a
+QueueListener thread, so handlers on the event loop only enqueue the
+record. Messages are formatted on the listener thread, which also does
+all stream I/O, optionally as one JSON object per line.
+
+SamplingFilter thins out high-volume loggers (one log line per design
+per voter) to every Nth record.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves all formatting to the listener thread
+
+    The stock QueueHandler renders the message (and any traceback) in the
+    calling thread so records can be pickled. Our queue never leaves the
+    process, so the record is passed through untouched and `msg % args`
+    happens on the listener instead of the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object, including `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({
+            key: value for key, value in vars(record).items()
+            if key not in _RECORD_FIELDS and not key.startswith('_')
+        })
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through only every `every`-th record of the logger it is on"""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        self._seen += 1
+        if self._seen % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+
+def setup_logging(level: int = logging.INFO, json_output: bool = False) -> logging.handlers.QueueListener:
+    """Install the queue-based pipeline on the root logger"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued on interpreter exit
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,143 @@
+"""
+Who voted and who ordered, in memory
+
+Every /vote, vote button and /order first asks whether the user already
+voted or ordered in their campaign. MembershipIndex answers from memory
+instead of opening a database connection per check. Per campaign it keeps
+the Telegram IDs that voted and those that ordered, each as an IdSet: a
+sorted array('q') (8 bytes per ID, searched by bisection) plus a small
+set of IDs added since the array was last rebuilt. A plain set of ints
+costs several times that per ID, see membership_benchmark.py.
+
+load() bulk-reads the tables, the bot adds its own votes and orders as
+they are saved, and sync() applies the event journal written since the
+last load or sync, so votes, orders and archives made by other processes
+(webhook workers, scripts) show up as well.
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Set
+
+from repository import EVENT_ARCHIVED, EVENT_ORDER, EVENT_VOTE, Repository
+
+
+class IdSet:
+    """Set of 64-bit integers held in a sorted array plus recent additions"""
+
+    __slots__ = ('_sorted', '_recent')
+
+    # Additions held in the set before merging them into the array: at
+    # least this many, and at least an eighth of the array, so rebuilding
+    # the array stays a small share of the adds
+    MERGE_AT = 1024
+
+    def __init__(self, ids: Iterable[int] = ()):
+        """`ids` may be in any order and repeat"""
+        self._sorted = array('q', sorted(set(ids)))
+        self._recent: Set[int] = set()
+
+    @classmethod
+    def from_sorted(cls, ids: Iterable[int]) -> 'IdSet':
+        """IdSet of IDs that are already ascending and unique, as storage lists them"""
+        id_set = cls()
+        id_set._sorted = array('q', ids)
+        return id_set
+
+    def __contains__(self, telegram_id: int) -> bool:
+        if telegram_id in self._recent:
+            return True
+        ids = self._sorted
+        i = bisect_left(ids, telegram_id)
+        return i < len(ids) and ids[i] == telegram_id
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent)
+
+    def add(self, telegram_id: int):
+        if telegram_id in self:
+            return
+        self._recent.add(telegram_id)
+        if len(self._recent) >= max(self.MERGE_AT, len(self._sorted) // 8):
+            merged = array('q', self._sorted)
+            merged.extend(self._recent)
+            self._sorted = array('q', sorted(merged))
+            self._recent = set()
+
+    def nbytes(self) -> int:
+        """Memory held, not counting the ints of the recent set"""
+        return self._sorted.itemsize * self._sorted.buffer_info()[1] + self._recent.__sizeof__()
+
+
+class MembershipIndex:
+    """has_voted / has_ordered per campaign, kept in step with the journal"""
+
+    def __init__(self, db: Repository, batch: int = 10000):
+        self.db = db
+        self.batch = batch
+        # Last journal event reflected here
+        self.seq = 0
+        self._voted: Dict[int, IdSet] = {}
+        self._ordered: Dict[int, IdSet] = {}
+        self.synced = 0
+
+    def load(self):
+        """Read every campaign's voters and orderers, replacing what is held"""
+        # Events from here on may be applied twice, which adds are immune to
+        seq = self.db.get_last_event_seq()
+        voted, ordered = {}, {}
+        for campaign in self.db.get_campaigns():
+            voted[campaign.id] = IdSet.from_sorted(self.db.get_voter_ids(campaign.id))
+            ordered[campaign.id] = IdSet.from_sorted(self.db.get_orderer_ids(campaign.id))
+        self._voted, self._ordered, self.seq = voted, ordered, seq
+        self.sync()
+
+    def sync(self) -> int:
+        """Apply journal events newer than the last load or sync, returns how many"""
+        applied = 0
+        while True:
+            events = self.db.get_events(self.seq, self.batch)
+            if not events:
+                return applied
+            for _, campaign_id, kind, telegram_id, _, _, _ in events:
+                if kind == EVENT_VOTE:
+                    self.add_vote(telegram_id, campaign_id)
+                elif kind == EVENT_ORDER:
+                    self.add_order(telegram_id, campaign_id)
+                elif kind == EVENT_ARCHIVED:
+                    self.clear(campaign_id)
+            self.seq = events[-1][0]
+            applied += len(events)
+            self.synced += len(events)
+
+    def has_voted(self, telegram_id: int, campaign_id: int) -> bool:
+        ids = self._voted.get(campaign_id)
+        return ids is not None and telegram_id in ids
+
+    def has_ordered(self, telegram_id: int, campaign_id: int) -> bool:
+        ids = self._ordered.get(campaign_id)
+        return ids is not None and telegram_id in ids
+
+    def add_vote(self, telegram_id: int, campaign_id: int):
+        """Record a vote that was saved"""
+        self._voted.setdefault(campaign_id, IdSet()).add(telegram_id)
+
+    def add_order(self, telegram_id: int, campaign_id: int):
+        """Record an order that was saved"""
+        if telegram_id is not None:
+            self._ordered.setdefault(campaign_id, IdSet()).add(telegram_id)
+
+    def clear(self, campaign_id: int):
+        """Forget a campaign's voters and orderers, after it was archived"""
+        self._voted.pop(campaign_id, None)
+        self._ordered.pop(campaign_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        sets = list(self._voted.values()) + list(self._ordered.values())
+        return {
+            'seq': self.seq,
+            'voters': sum(map(len, self._voted.values())),
+            'orderers': sum(map(len, self._ordered.values())),
+            'bytes': sum(ids.nbytes() for ids in sets),
+            'synced_events': self.synced,
+        }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Membership index benchmark
+
+Holds N Telegram IDs (random, spread over the 64-bit ID range real users
+have) the way membership.IdSet does and as a plain set of ints, and
+reports for each:
+
+* memory retained once built, and the peak while building (tracemalloc),
+* lookups per second, half of them IDs that are held and half not.
+
+It then fills a database with N voters in one campaign and compares
+Database.has_user_voted with MembershipIndex.has_voted, including how
+long MembershipIndex.load() takes at startup. Exits with status 1 when
+IdSet or the index disagree with the set or the table.
+
+Usage:
+    python membership_benchmark.py                   # 1M users
+    python membership_benchmark.py --users 200000 --lookups 50000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from typing import Callable, List, Tuple
+
+from database import Database
+from membership import IdSet, MembershipIndex
+from repository import DEFAULT_CAMPAIGN_ID
+
+
+def measure(build: Callable[[], object]) -> Tuple[object, int, int]:
+    """(result, bytes retained, peak bytes) of building something"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, retained, peak
+
+
+def lookups_per_second(contains: Callable[[int], bool], probes: List[int]) -> float:
+    started = time.perf_counter()
+    for telegram_id in probes:
+        contains(telegram_id)
+    return len(probes) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare IdSet with a set of ints, and the index with SQLite')
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Kept as an array, so building a structure creates its own int objects
+    ids = array('q', rng.sample(range(1, 8_000_000_000), args.users))
+    held = set(rng.sample(range(args.users), args.lookups // 2))
+    probes = [ids[i] for i in held] + [rng.randrange(8_000_000_000, 9_000_000_000) for _ in held]
+    rng.shuffle(probes)
+    expected = [True] * len(held) + [False] * len(held)
+    problems = []
+
+    print(f"👥 {args.users:,} Telegram IDs, {len(probes):,} lookups\n")
+    print(f"{'':<24}{'retained':>12}{'per ID':>9}{'peak':>12}{'lookups/s':>14}")
+    rows = []
+    ascending = array('q', sorted(ids))
+    builds = (
+        ('set of ints', lambda: set(ids)),
+        ('IdSet', lambda: IdSet(ids)),
+        # How MembershipIndex.load() builds it from storage
+        ('IdSet.from_sorted', lambda: IdSet.from_sorted(ascending)),
+    )
+    for name, build in builds:
+        structure, retained, peak = measure(build)
+        rate = lookups_per_second(structure.__contains__, probes)
+        rows.append(retained)
+        print(f"{name:<24}{retained / 1e6:>10.1f}MB{retained / args.users:>8.1f}B"
+              f"{peak / 1e6:>10.1f}MB{rate:>14,.0f}")
+        if sorted(map(structure.__contains__, probes)) != sorted(expected):
+            problems.append(f"{name} answers differ from the IDs held")
+        del structure
+    print(f"\nIdSet holds the same IDs in {rows[1] / rows[0]:.0%} of the set's memory\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'membership.db'))
+        with db.get_connection() as conn:
+            conn.executemany('INSERT INTO votes (campaign_id, telegram_id, design_id) VALUES (?, ?, 1)',
+                             ((DEFAULT_CAMPAIGN_ID, telegram_id) for telegram_id in ids))
+        index = MembershipIndex(db)
+        started = time.perf_counter()
+        index.load()
+        print(f"MembershipIndex.load()  {time.perf_counter() - started:>10.2f} s for {args.users:,} voters")
+
+        sample = probes[:max(1, len(probes) // 20)]
+        sqlite_rate = lookups_per_second(lambda telegram_id: db.has_user_voted(telegram_id, DEFAULT_CAMPAIGN_ID),
+                                         sample)
+        index_rate = lookups_per_second(lambda telegram_id: index.has_voted(telegram_id, DEFAULT_CAMPAIGN_ID),
+                                        probes)
+        print(f"has_user_voted, SQLite  {sqlite_rate:>10,.0f} lookups/s")
+        print(f"has_voted, index        {index_rate:>10,.0f} lookups/s   {index_rate / sqlite_rate:,.0f}x")
+        if any(index.has_voted(telegram_id, DEFAULT_CAMPAIGN_ID) != db.has_user_voted(telegram_id, DEFAULT_CAMPAIGN_ID)
+               for telegram_id in sample):
+            problems.append("the index disagrees with the votes table")
+
+    for problem in problems:
+        print(f"   ❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("\n✅ IdSet and the index agree with the set and the votes table")
+
+
+if __name__ == '__main__':
+    main()
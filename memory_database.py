@@ -0,0 +1,458 @@
+"""
+In-memory storage engine
+
+MemoryDatabase implements the Repository interface with plain dicts, sets
+and lists, indexed the same way the SQLite schema is: everything hot is
+keyed by campaign first, and per-design vote counts are kept up to date on
+every vote so results never walk the votes.
+
+Nothing is persisted. It exists so tests and benchmarks can run the bot
+without disk I/O, and as a baseline for storage_benchmark.py.
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+from config import DATE_FORMAT, DEFAULT_CAMPAIGN_CODE, DEFAULT_CAMPAIGN_NAME
+from models import User, Order, Deadlines, Design, Campaign
+from repository import (
+    ARCHIVED_ORDER_CSV_HEADER, DEFAULT_CAMPAIGN_ID, EVENT_ARCHIVED, EVENT_DESIGN_ADDED, EVENT_DESIGN_CHANGED,
+    EVENT_ORDER, EVENT_ORDER_REVIEWED, EVENT_VOTE, Event, Repository, check_review_statuses, orders_to_csv
+)
+
+
+class _OrderRow(NamedTuple):
+    id: int
+    telegram_id: int
+    full_name: str
+    shirt_number: int
+    shirt_name: str
+    size: str
+    receipt_file_id: str
+    payment_time: str  # DATE_FORMAT, as SQLite stores it
+    receipt_file_unique_id: Optional[str] = None
+
+    def csv_row(self) -> Tuple[Any, ...]:
+        return (self.telegram_id, self.full_name, self.shirt_number,
+                self.shirt_name, self.size, self.payment_time)
+
+
+def _minutes(value: datetime) -> datetime:
+    """Drop seconds, like a DATE_FORMAT round trip through SQLite"""
+    return datetime.strptime(value.strftime(DATE_FORMAT), DATE_FORMAT)
+
+
+def _keyset_page(keyed_rows: List[Tuple[Tuple, Any]], after: Optional[Tuple],
+                 before: Optional[Tuple], limit: int) -> List[Any]:
+    """Rows of (key, row) pairs strictly after or before a key, like a LIMITed keyset query"""
+    keyed_rows.sort(key=lambda keyed: keyed[0])
+    if before is not None:
+        page = [row for key, row in keyed_rows if key < before]
+        return page[max(0, len(page) - limit):]
+    return [row for key, row in keyed_rows if after is None or key > after][:limit]
+
+
+def _utc_now() -> datetime:
+    """Naive UTC timestamp with second precision, like CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+class MemoryDatabase(Repository):
+    """Repository kept entirely in process memory"""
+
+    def __init__(self):
+        # The bot calls in from the event loop and from worker threads
+        self._lock = threading.RLock()
+        self._ids = {name: itertools.count(1) for name in ('campaign', 'design', 'order')}
+
+        self._campaigns: Dict[int, Campaign] = {}
+        self._campaign_codes: Dict[str, int] = {}
+        self._users: Dict[int, int] = {}  # telegram_id -> campaign_id
+
+        # campaign_id -> telegram_id -> design_id
+        self._votes: Dict[int, Dict[int, int]] = defaultdict(dict)
+        # campaign_id -> design_id -> number of votes
+        self._vote_counts: Dict[int, Counter] = defaultdict(Counter)
+        # campaign_id -> orders in insertion (id) order
+        self._orders: Dict[int, List[_OrderRow]] = defaultdict(list)
+        # campaign_id -> users with at least one order
+        self._ordered: Dict[int, Set[int]] = defaultdict(set)
+        # order id -> review status, once reviewed
+        self._reviews: Dict[int, str] = {}
+
+        self._designs: Dict[int, Design] = {}
+        # campaign_id -> design ids, active or not
+        self._campaign_designs: Dict[int, List[int]] = defaultdict(list)
+
+        self._archives: Dict[str, Dict[str, Any]] = {}
+        self._archived_orders: Dict[str, List[_OrderRow]] = {}
+        # label -> order id -> review status, for the archived orders reviewed
+        self._archived_reviews: Dict[str, Dict[int, str]] = {}
+        self._archived_votes: Dict[str, List[Tuple[int, int, Optional[str]]]] = {}
+        self._archived_designs: Dict[str, List[Design]] = {}
+
+        # (campaign_id, deadline in DATE_FORMAT) -> frozen rows
+        self._final_results: Dict[Tuple[int, str], List[Tuple[str, int]]] = {}
+        self._final_orders: Dict[Tuple[int, str], Tuple[_OrderRow, ...]] = {}
+
+        # Event journal, events[i] has seq i + 1
+        self._events: List[Event] = []
+        self._checkpoint: Optional[Tuple[int, bytes]] = None
+
+        deadline = _minutes(self.default_deadline())
+        self._add_campaign(DEFAULT_CAMPAIGN_CODE, DEFAULT_CAMPAIGN_NAME, deadline, deadline)
+
+    def _add_campaign(self, code: str, name: str, vote_deadline: datetime,
+                      payment_deadline: datetime) -> int:
+        if code in self._campaign_codes:
+            raise ValueError(f"Campaign code '{code}' is already taken")
+        campaign_id = next(self._ids['campaign'])
+        self._campaigns[campaign_id] = Campaign(campaign_id, code, name, vote_deadline, payment_deadline)
+        self._campaign_codes[code] = campaign_id
+        return campaign_id
+
+    def _journal(self, campaign_id: int, kind: int, telegram_id: Optional[int] = None,
+                 subject: Optional[int] = None, value: Optional[str] = None):
+        """Append an event, under the lock held by the write it records"""
+        seq = len(self._events) + 1
+        self._events.append((seq, campaign_id, kind, telegram_id, subject, value, int(time.time())))
+
+    # Campaign operations
+    def create_campaign(self, code: str, name: str) -> int:
+        deadline = _minutes(self.default_deadline())
+        with self._lock:
+            return self._add_campaign(code, name, deadline, deadline)
+
+    def get_campaign(self, campaign_id: int) -> Optional[Campaign]:
+        return self._campaigns.get(campaign_id)
+
+    def get_campaign_by_code(self, code: str) -> Optional[Campaign]:
+        campaign_id = self._campaign_codes.get(code)
+        return self.get_campaign(campaign_id) if campaign_id is not None else None
+
+    def get_campaigns(self) -> List[Campaign]:
+        with self._lock:
+            return [campaign for _, campaign in sorted(self._campaigns.items())]
+
+    def get_user_campaign(self, telegram_id: int) -> int:
+        return self._users.get(telegram_id, DEFAULT_CAMPAIGN_ID)
+
+    def join_campaign(self, telegram_id: int, campaign_id: int):
+        self._users[telegram_id] = campaign_id
+
+    # User operations
+    def get_user(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Optional[User]:
+        with self._lock:
+            if telegram_id not in self._users:
+                return None
+            design_id = self._votes[campaign_id].get(telegram_id)
+            return User(
+                telegram_id=telegram_id,
+                vote_choice=str(design_id) if design_id is not None else None,
+                has_voted=design_id is not None,
+                has_ordered=telegram_id in self._ordered[campaign_id],
+                campaign_id=self._users[telegram_id]
+            )
+
+    def create_user(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        self._users.setdefault(telegram_id, campaign_id)
+
+    def save_vote(self, telegram_id: int, design_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        with self._lock:
+            votes = self._votes[campaign_id]
+            counts = self._vote_counts[campaign_id]
+            previous = votes.get(telegram_id)
+            if previous is not None:
+                counts[previous] -= 1
+            votes[telegram_id] = design_id
+            counts[design_id] += 1
+            self._journal(campaign_id, EVENT_VOTE, telegram_id, design_id)
+
+    def has_user_voted(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> bool:
+        return telegram_id in self._votes[campaign_id]
+
+    def has_user_ordered(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> bool:
+        return telegram_id in self._ordered[campaign_id]
+
+    def get_voter_ids(self, campaign_id: int) -> List[int]:
+        with self._lock:
+            return sorted(self._votes.get(campaign_id, ()))
+
+    def get_orderer_ids(self, campaign_id: int) -> List[int]:
+        with self._lock:
+            return sorted(self._ordered.get(campaign_id, ()))
+
+    # Order operations
+    def save_order(self, order: Order):
+        with self._lock:
+            self._orders[order.campaign_id].append(_OrderRow(
+                next(self._ids['order']), order.telegram_id, order.full_name, order.shirt_number,
+                order.shirt_name, order.size, order.receipt_file_id,
+                order.payment_time.strftime(DATE_FORMAT), order.receipt_file_unique_id
+            ))
+            self._ordered[order.campaign_id].add(order.telegram_id)
+            order_id = self._orders[order.campaign_id][-1].id
+            self._journal(order.campaign_id, EVENT_ORDER, order.telegram_id, order_id, order.size)
+
+    # Deadline operations
+    def get_deadlines(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Deadlines:
+        campaign = self._campaigns[campaign_id]
+        return Deadlines(vote_deadline=campaign.vote_deadline, payment_deadline=campaign.payment_deadline)
+
+    def set_vote_deadline(self, deadline: datetime, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        with self._lock:
+            if campaign_id in self._campaigns:
+                self._campaigns[campaign_id] = replace(self._campaigns[campaign_id], vote_deadline=_minutes(deadline))
+
+    def set_payment_deadline(self, deadline: datetime, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        with self._lock:
+            if campaign_id in self._campaigns:
+                self._campaigns[campaign_id] = replace(self._campaigns[campaign_id], payment_deadline=_minutes(deadline))
+
+    # Design operations
+    def add_design(self, name: str, description: str, image_file_id: str, display_order: int = 0,
+                   campaign_id: int = DEFAULT_CAMPAIGN_ID) -> int:
+        with self._lock:
+            design_id = next(self._ids['design'])
+            self._designs[design_id] = Design(
+                id=design_id,
+                name=name,
+                description=description or '',
+                image_file_id=image_file_id,
+                created_at=_utc_now(),
+                is_active=True,
+                campaign_id=campaign_id,
+                display_order=display_order
+            )
+            self._campaign_designs[campaign_id].append(design_id)
+            self._journal(campaign_id, EVENT_DESIGN_ADDED, subject=design_id)
+            return design_id
+
+    def add_designs(self, designs: Sequence[Tuple[str, str, str]],
+                    campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[int]:
+        with self._lock:
+            last_order = max((self._designs[d].display_order for d in self._campaign_designs[campaign_id]
+                              if self._designs[d].is_active), default=0)
+            return [
+                self.add_design(name, description, image_file_id, last_order + position, campaign_id)
+                for position, (name, description, image_file_id) in enumerate(designs, 1)
+            ]
+
+    def _active_design_ids(self, campaign_id: int) -> List[int]:
+        """Active designs in display order, like idx_designs_campaign_active_order"""
+        active = [d for d in self._campaign_designs[campaign_id] if self._designs[d].is_active]
+        # display_order, then newest first, then insertion order
+        active.sort(key=lambda d: (self._designs[d].display_order, -self._designs[d].created_at.timestamp(), d))
+        return active
+
+    def get_active_designs(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Design]:
+        with self._lock:
+            return [self._designs[d] for d in self._active_design_ids(campaign_id)]
+
+    def get_design(self, design_id: int) -> Optional[Design]:
+        return self._designs.get(design_id)
+
+    def update_design(self, design_id: int, name: str = None, description: str = None,
+                      image_file_id: str = None, is_active: bool = None):
+        with self._lock:
+            design = self._designs.get(design_id)
+            if design is None:
+                return
+            changes = {'name': name, 'description': description, 'image_file_id': image_file_id,
+                       'is_active': None if is_active is None else bool(is_active)}
+            changes = {field: value for field, value in changes.items() if value is not None}
+            if changes:
+                self._designs[design_id] = replace(design, **changes)
+                self._journal(design.campaign_id, EVENT_DESIGN_CHANGED, subject=design_id,
+                              value=json.dumps(changes))
+
+    # Statistics operations
+    def get_vote_results(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Tuple[str, int]]:
+        with self._lock:
+            counts = self._vote_counts[campaign_id]
+            results = [(self._designs[d].name, counts[d]) for d in self._active_design_ids(campaign_id)]
+        results.sort(key=lambda result: -result[1])
+        return results
+
+    def get_total_orders(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> int:
+        return len(self._orders[campaign_id])
+
+    @staticmethod
+    def _newest_first(rows: List[_OrderRow]) -> List[Tuple[Any, ...]]:
+        # Equal payment times come out newest id first, as in a reverse index scan
+        return [row.csv_row() for row in sorted(rows, key=lambda row: (row.payment_time, row.id), reverse=True)]
+
+    def export_orders_to_csv(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> str:
+        with self._lock:
+            rows = list(self._orders[campaign_id])
+        return orders_to_csv(self._newest_first(rows))
+
+    def get_receipts(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Tuple[int, int, str, str, Optional[str]]]:
+        with self._lock:
+            rows = sorted(self._orders[campaign_id], key=lambda row: (row.payment_time, row.id))
+        return [(row.id, row.shirt_number, row.shirt_name, row.receipt_file_id, row.receipt_file_unique_id)
+                for row in rows]
+
+    # Receipt review
+    def get_unreviewed_orders(self, campaign_id: int, after: Optional[int] = None,
+                              limit: int = 10) -> List[Tuple[int, str, int, str, str, str]]:
+        with self._lock:
+            # Orders are kept in id order
+            rows = [row for row in self._orders[campaign_id]
+                    if row.id > (after or 0) and row.id not in self._reviews][:limit]
+        return [(row.id, row.full_name, row.shirt_number, row.shirt_name, row.size, row.receipt_file_id)
+                for row in rows]
+
+    def count_unreviewed_orders(self, campaign_id: int) -> int:
+        with self._lock:
+            return sum(row.id not in self._reviews for row in self._orders[campaign_id])
+
+    def review_orders(self, decisions: Sequence[Tuple[int, str]], reviewer: int) -> List[int]:
+        check_review_statuses(decisions)
+        with self._lock:
+            campaigns = {row.id: campaign_id for campaign_id, rows in self._orders.items() for row in rows}
+            reviewed = []
+            for order_id, status in decisions:
+                if order_id in campaigns and order_id not in self._reviews:
+                    self._reviews[order_id] = status
+                    self._journal(campaigns[order_id], EVENT_ORDER_REVIEWED, reviewer, order_id, status)
+                    reviewed.append(order_id)
+            return reviewed
+
+    # Keyset-paginated listings
+    def get_designs_page(self, campaign_id: int, after: Optional[Tuple[int, int]] = None,
+                         before: Optional[Tuple[int, int]] = None, limit: int = 20) -> List[Design]:
+        with self._lock:
+            active = [self._designs[d] for d in self._campaign_designs[campaign_id] if self._designs[d].is_active]
+        keyed = [((design.display_order, design.id), design) for design in active]
+        return _keyset_page(keyed, after, before, limit)
+
+    def get_results_page(self, campaign_id: int, after: Optional[Tuple[int, int]] = None,
+                         before: Optional[Tuple[int, int]] = None,
+                         limit: int = 20) -> List[Tuple[int, str, int]]:
+        with self._lock:
+            counts = self._vote_counts[campaign_id]
+            # Most votes first, then by ID: ascending (-votes, id)
+            rows = [((-counts[d], d), (d, self._designs[d].name, counts[d]))
+                    for d in self._campaign_designs[campaign_id] if self._designs[d].is_active]
+        return _keyset_page(rows, after and (-after[0], after[1]), before and (-before[0], before[1]), limit)
+
+    def get_final_results_page(self, campaign_id: int, deadline: datetime, after: Optional[int] = None,
+                               before: Optional[int] = None, limit: int = 20) -> List[Tuple[int, str, int]]:
+        with self._lock:
+            snapshot = self._final_results.get((campaign_id, deadline.strftime(DATE_FORMAT)), [])
+            rows = [(position, (position, name, votes)) for position, (name, votes) in enumerate(snapshot, 1)]
+        return _keyset_page(rows, after, before, limit)
+
+    def count_results(self, campaign_id: int, deadline: Optional[datetime] = None) -> Tuple[int, int]:
+        with self._lock:
+            if deadline is not None:
+                rows = self._final_results.get((campaign_id, deadline.strftime(DATE_FORMAT)), [])
+            else:
+                rows = self.get_vote_results(campaign_id)
+            return len(rows), sum(votes for _, votes in rows)
+
+    # Final snapshots
+    def freeze_results(self, campaign_id: int, deadline: datetime) -> List[Tuple[str, int]]:
+        key = (campaign_id, deadline.strftime(DATE_FORMAT))
+        with self._lock:
+            if key not in self._final_results:
+                self._final_results[key] = self.get_vote_results(campaign_id)
+            return list(self._final_results[key])
+
+    def freeze_orders(self, campaign_id: int, deadline: datetime) -> int:
+        key = (campaign_id, deadline.strftime(DATE_FORMAT))
+        with self._lock:
+            if key not in self._final_orders:
+                self._final_orders[key] = tuple(self._orders[campaign_id])
+            return len(self._final_orders[key])
+
+    def export_final_orders_to_csv(self, campaign_id: int, deadline: datetime) -> str:
+        rows = self._final_orders.get((campaign_id, deadline.strftime(DATE_FORMAT)), ())
+        return orders_to_csv(self._newest_first(list(rows)))
+
+    # Campaign archiving
+    def archive_campaign(self, label: str, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Dict[str, int]:
+        with self._lock:
+            if label in self._archives:
+                raise ValueError(f"Campaign '{label}' is already archived")
+
+            votes = self._votes.pop(campaign_id, {})
+            self._vote_counts.pop(campaign_id, None)
+            self._archived_votes[label] = [
+                (telegram_id, design_id, self._designs[design_id].name if design_id in self._designs else None)
+                for telegram_id, design_id in votes.items()
+            ]
+
+            self._archived_orders[label] = self._orders.pop(campaign_id, [])
+            self._ordered.pop(campaign_id, None)
+            self._archived_reviews[label] = {
+                row.id: self._reviews.pop(row.id) for row in self._archived_orders[label] if row.id in self._reviews
+            }
+
+            inactive = [d for d in self._campaign_designs[campaign_id] if not self._designs[d].is_active]
+            self._archived_designs[label] = [self._designs.pop(d) for d in inactive]
+            self._campaign_designs[campaign_id] = [
+                d for d in self._campaign_designs[campaign_id] if d in self._designs
+            ]
+
+            # The season's final snapshots go with it
+            for snapshots in (self._final_results, self._final_orders):
+                for key in [key for key in snapshots if key[0] == campaign_id]:
+                    del snapshots[key]
+
+            campaign = self._campaigns[campaign_id]
+            counts = {
+                'votes': len(self._archived_votes[label]),
+                'orders': len(self._archived_orders[label]),
+                'designs': len(inactive),
+            }
+            self._archives[label] = {
+                'label': label,
+                'archived_at': _utc_now().strftime('%Y-%m-%d %H:%M:%S'),
+                'vote_deadline': campaign.vote_deadline.strftime(DATE_FORMAT),
+                'payment_deadline': campaign.payment_deadline.strftime(DATE_FORMAT),
+                **counts,
+            }
+            deadline = _minutes(self.default_deadline())
+            self._campaigns[campaign_id] = replace(campaign, vote_deadline=deadline, payment_deadline=deadline)
+            self._journal(campaign_id, EVENT_ARCHIVED, value=label)
+            return counts
+
+    def get_archived_campaigns(self) -> List[Mapping[str, Any]]:
+        with self._lock:
+            archives = [
+                {key: archive[key] for key in ('label', 'archived_at', 'votes', 'orders', 'designs')}
+                for archive in reversed(self._archives.values())
+            ]
+        # Stable sort: archives from the same second stay newest first
+        return sorted(archives, key=lambda archive: archive['archived_at'], reverse=True)
+
+    def export_archived_orders_to_csv(self, label: str) -> str:
+        with self._lock:
+            rows = list(self._archived_orders.get(label, []))
+            reviews = dict(self._archived_reviews.get(label, {}))
+        rows.sort(key=lambda row: (row.payment_time, row.id), reverse=True)
+        return orders_to_csv([(*row.csv_row(), reviews.get(row.id)) for row in rows], ARCHIVED_ORDER_CSV_HEADER)
+
+    # Event journal
+    def get_events(self, after: int = 0, limit: int = 10000) -> List[Event]:
+        with self._lock:
+            return self._events[max(after, 0):max(after, 0) + limit]
+
+    def get_last_event_seq(self) -> int:
+        return len(self._events)
+
+    def get_checkpoint(self) -> Optional[Tuple[int, bytes]]:
+        return self._checkpoint
+
+    def save_checkpoint(self, seq: int, state: bytes):
+        with self._lock:
+            if self._checkpoint is None or seq >= self._checkpoint[0]:
+                self._checkpoint = (seq, state)
@@ -2,15 +2,19 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
-@dataclass
+# Models are immutable and slotted: no per-instance __dict__, and storage
+# can hand out the objects it keeps without copying them first
+
+@dataclass(frozen=True, slots=True)
 class User:
     """User model representing a Telegram user"""
     telegram_id: int
     vote_choice: Optional[str] = None
     has_voted: bool = False
     has_ordered: bool = False
+    campaign_id: int = 1
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Order:
     """Order model for jersey orders"""
     telegram_id: int
@@ -20,14 +24,17 @@ class Order:
     size: str
     receipt_file_id: str
     payment_time: datetime
+    campaign_id: int = 1
+    # Same for the same file even when file_id changes, None when unknown
+    receipt_file_unique_id: Optional[str] = None
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Deadlines:
     """Deadlines model"""
     vote_deadline: datetime
     payment_deadline: datetime
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Design:
     """Design model for jersey designs"""
     id: int
@@ -35,4 +42,15 @@ class Design:
     description: str
     image_file_id: str  # Telegram file_id
     created_at: datetime
-    is_active: bool = True
\ No newline at end of file
+    is_active: bool = True
+    campaign_id: int = 1
+    display_order: int = 0
+
+@dataclass(frozen=True, slots=True)
+class Campaign:
+    """Campaign model, one jersey drive with its own deadlines and designs"""
+    id: int
+    code: str
+    name: str
+    vote_deadline: datetime
+    payment_deadline: datetime
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Row mapping micro-benchmark
+
+Reads N designs (one campaign, all active) from a temporary database in
+three ways and reports rows/s plus memory per design object:
+
+    legacy   sqlite3.Row, strptime and a plain dataclass with a __dict__,
+             how Database read designs before models were slotted
+    current  Database.get_active_designs(): a row_factory building the
+             slotted, frozen models.Design with cached fromisoformat
+    tuples   the bare query returning tuples, as an upper bound
+
+created_at differs on every row, which is the worst case for the
+timestamp cache.
+
+Usage:
+    python models_benchmark.py
+    python models_benchmark.py --rows 500000 --repeat 5
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from database import Database
+from repository import DEFAULT_CAMPAIGN_ID
+
+QUERY = '''
+    SELECT id, campaign_id, name, description, image_file_id, created_at, is_active
+    FROM designs
+    WHERE campaign_id = ? AND is_active = 1
+    ORDER BY display_order, created_at DESC
+'''
+
+
+@dataclass
+class LegacyDesign:
+    """models.Design as it was: mutable, with a per-instance __dict__"""
+    id: int
+    name: str
+    description: str
+    image_file_id: str
+    created_at: datetime
+    is_active: bool = True
+    campaign_id: int = 1
+
+
+def read_legacy(db: Database) -> List[LegacyDesign]:
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(QUERY, (DEFAULT_CAMPAIGN_ID,))
+        return [
+            LegacyDesign(
+                id=row['id'],
+                name=row['name'],
+                description=row['description'] or '',
+                image_file_id=row['image_file_id'],
+                created_at=datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S'),
+                is_active=bool(row['is_active']),
+                campaign_id=row['campaign_id']
+            )
+            for row in cursor.fetchall()
+        ]
+
+
+def read_current(db: Database) -> list:
+    return db.get_active_designs(DEFAULT_CAMPAIGN_ID)
+
+
+def read_tuples(db: Database) -> list:
+    conn = sqlite3.connect(db.db_name)
+    try:
+        return conn.execute(QUERY, (DEFAULT_CAMPAIGN_ID,)).fetchall()
+    finally:
+        conn.close()
+
+
+READERS = {'legacy': read_legacy, 'current': read_current, 'tuples': read_tuples}
+
+
+def seed(db: Database, rows: int):
+    started = datetime(2024, 1, 1)
+    with db.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO designs (campaign_id, name, description, image_file_id, display_order, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            (DEFAULT_CAMPAIGN_ID, f'Design {i}', f'Synthetic design {i}', f'file-{i:012d}', i,
+             (started + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'))
+            for i in range(rows)
+        ))
+
+
+def measure(read: Callable[[Database], list], db: Database, repeat: int):
+    """Best-of-repeat rows/s, bytes per row of one retained result, and of one object itself"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = read(db)
+        best = min(best, time.perf_counter() - started)
+        del result
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = read(db)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    first = result[0]
+    shallow = sys.getsizeof(first) + (sys.getsizeof(first.__dict__) if hasattr(first, '__dict__') else 0)
+    return len(result), len(result) / best, retained / len(result), shallow
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare row-to-model mapping costs')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per reader, best is kept')
+    parser.add_argument('--readers', nargs='+', choices=list(READERS), default=list(READERS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'models.db'))
+        seed(db, args.rows)
+
+        print(f"{'reader':<10}{'rows':>9}{'rows/s':>12}{'bytes/row':>11}{'object':>9}")
+        rates = {}
+        for name in args.readers:
+            rows, rate, per_row, shallow = measure(READERS[name], db, args.repeat)
+            rates[name] = rate
+            print(f"{name:<10}{rows:>9,}{rate:>12,.0f}{per_row:>11,.0f}{shallow:>9}")
+
+    if 'legacy' in rates and 'current' in rates:
+        print(f"\n🏁 current reads {rates['current'] / rates['legacy']:.1f}x as many rows/s as legacy")
+
+
+if __name__ == '__main__':
+    main()
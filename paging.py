@@ -0,0 +1,107 @@
+"""
+Paged admin listings
+
+Long listings are sent one page at a time, with ◀️/▶️ buttons whose
+callback_data carries a keyset cursor instead of an offset:
+
+    dp:3:>12.345:20
+
+is "the designs page of campaign 3 after the row keyed (12, 345), which
+was row 20". Pages are fetched with `limit + 1` rows to learn whether
+another one follows, and cut short when their rendered text would not fit
+one message, so no page ever fails to send however long its rows are.
+"""
+
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Telegram's limit for message text, in UTF-16 code units
+MESSAGE_LIMIT = 4096
+
+Cursor = Tuple[int, ...]
+
+
+def message_length(text: str) -> int:
+    """Length as Telegram counts it: characters outside the BMP (most emoji) count twice"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def fit_page(header: str, entries: Sequence[str], footer: str, from_end: bool = False,
+             limit: int = MESSAGE_LIMIT) -> Tuple[str, int]:
+    """Header, as many entries as fit and footer; returns the text and how many entries it holds
+
+    Entries are kept from the start, or from the end when `from_end`.
+    """
+    budget = limit - message_length(header) - message_length(footer)
+    used = 0
+    for entry in (reversed(entries) if from_end else entries):
+        budget -= message_length(entry)
+        if budget < 0:
+            break
+        used += 1
+    kept = entries[len(entries) - used:] if from_end else entries[:used]
+    return header + ''.join(kept) + footer, used
+
+
+def page_data(prefix: str, scope: int, forward: bool, cursor: Cursor, index: int) -> str:
+    """callback_data for the page after (or before) the row keyed `cursor`, numbered `index`"""
+    return f"{prefix}:{scope}:{'>' if forward else '<'}{'.'.join(map(str, cursor))}:{index}"
+
+
+def parse_page_data(data: str) -> Tuple[str, int, bool, Cursor, int]:
+    """(prefix, scope, forward, cursor, index) of page_data(), ValueError when malformed"""
+    prefix, scope, cursor, index = data.split(':')
+    if not cursor or cursor[0] not in '<>':
+        raise ValueError(f"Bad page cursor: {data}")
+    return prefix, int(scope), cursor[0] == '>', tuple(map(int, cursor[1:].split('.'))), int(index)
+
+
+def render_page(
+    fetch: Callable[..., List[Any]],
+    key: Callable[[Any], Cursor],
+    render: Callable[[int, Any], str],
+    header: str,
+    footer: str,
+    prefix: str,
+    scope: int,
+    forward: bool = True,
+    cursor: Optional[Cursor] = None,
+    index: int = 0,
+    size: int = 20,
+) -> Tuple[str, Optional[InlineKeyboardMarkup], int]:
+    """Text, keyboard and row count of one page of a keyset-paginated listing
+
+    `fetch(after=, before=, limit=)` returns rows in listing order, `key`
+    gives a row's cursor and `render(number, row)` its entry. Without a
+    cursor this is the first page.
+    """
+    if forward:
+        rows = fetch(after=cursor, before=None, limit=size + 1)
+        more = len(rows) > size
+        rows = rows[:size]
+        first = index + 1
+    else:
+        rows = fetch(after=None, before=cursor, limit=size + 1)
+        more = len(rows) > size
+        rows = rows[-size:]
+        # Renumber from 1 on the first page, rows may have come or gone
+        first = max(index - len(rows), 2) if more else 1
+
+    text, used = fit_page(header, [render(first + i, row) for i, row in enumerate(rows)], footer,
+                          from_end=not forward)
+    trimmed = used < len(rows)
+    if forward:
+        rows = rows[:used]
+    else:
+        first += len(rows) - used
+        rows = rows[len(rows) - used:]
+
+    buttons = []
+    if rows and first > 1:
+        buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=page_data(
+            prefix, scope, False, key(rows[0]), first)))
+    if rows and (more or trimmed or not forward):
+        buttons.append(InlineKeyboardButton("Next ▶️", callback_data=page_data(
+            prefix, scope, True, key(rows[-1]), first + len(rows) - 1)))
+    return text, InlineKeyboardMarkup([buttons]) if buttons else None, len(rows)
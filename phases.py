@@ -0,0 +1,117 @@
+"""
+Voting and ordering phases
+
+CampaignPhases keeps an in-memory open/closed flag per campaign for voting
+and for ordering. A JobQueue job at each deadline flips the flag and
+freezes the final snapshot (Repository.freeze_results / freeze_orders),
+so handlers check a flag instead of comparing deadlines on every update,
+closed-phase requests are turned away without touching the database, and
+admin queries after a deadline read the snapshot instead of recomputing.
+
+Call `schedule()` whenever a campaign's deadlines change through the bot;
+moving a deadline into the future reopens the phase. Processes sharing the
+database call `refresh()` periodically to pick up each other's changes.
+Without a JobQueue the flags are derived from the in-memory deadlines on
+each check.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import ContextTypes, JobQueue
+
+from models import Deadlines
+from repository import Repository
+
+logger = logging.getLogger(__name__)
+
+VOTING = 'vote'
+ORDERING = 'payment'
+
+
+class CampaignPhases:
+    """Open/closed flags per campaign, flipped by deadline jobs"""
+
+    def __init__(self, db: Repository, job_queue: Optional[JobQueue]):
+        self.db = db
+        self.job_queue = job_queue
+        self._deadlines: Dict[int, Deadlines] = {}
+        self._open: Dict[Tuple[int, str], bool] = {}
+        self.closed = 0
+
+    def load(self):
+        """Schedule the deadline jobs of every campaign"""
+        for campaign in self.db.get_campaigns():
+            self.schedule(campaign.id, Deadlines(campaign.vote_deadline, campaign.payment_deadline))
+
+    def schedule(self, campaign_id: int, deadlines: Optional[Deadlines] = None):
+        """Set a campaign's flags from its deadlines and (re)schedule its jobs"""
+        deadlines = deadlines or self.db.get_deadlines(campaign_id)
+        self._deadlines[campaign_id] = deadlines
+        now = datetime.now()
+        for phase, deadline in ((VOTING, deadlines.vote_deadline), (ORDERING, deadlines.payment_deadline)):
+            self._open[(campaign_id, phase)] = now <= deadline
+            if self.job_queue is None:
+                continue
+            name = f'{phase}_deadline_{campaign_id}'
+            for job in self.job_queue.get_jobs_by_name(name):
+                job.schedule_removal()
+            # A deadline that already passed still runs once, to take the
+            # snapshot if the bot was down when it passed
+            self.job_queue.run_once(
+                self._close, when=max(0.0, (deadline - now).total_seconds()),
+                data=(campaign_id, phase, deadline), name=name,
+                # Startup can take longer than APScheduler's default 1s grace
+                job_kwargs={'misfire_grace_time': None}
+            )
+
+    def refresh(self):
+        """Reschedule campaigns whose deadlines another process has changed"""
+        for campaign in self.db.get_campaigns():
+            deadlines = Deadlines(campaign.vote_deadline, campaign.payment_deadline)
+            if self._deadlines.get(campaign.id) != deadlines:
+                self.schedule(campaign.id, deadlines)
+
+    def deadlines(self, campaign_id: int) -> Deadlines:
+        if campaign_id not in self._deadlines:
+            # Created outside this process
+            self.schedule(campaign_id)
+        return self._deadlines[campaign_id]
+
+    def is_open(self, campaign_id: int, phase: str) -> bool:
+        deadlines = self.deadlines(campaign_id)
+        if self.job_queue is None:
+            deadline = deadlines.vote_deadline if phase == VOTING else deadlines.payment_deadline
+            return datetime.now() <= deadline
+        return self._open[(campaign_id, phase)]
+
+    def voting_open(self, campaign_id: int) -> bool:
+        return self.is_open(campaign_id, VOTING)
+
+    def ordering_open(self, campaign_id: int) -> bool:
+        return self.is_open(campaign_id, ORDERING)
+
+    async def _close(self, context: ContextTypes.DEFAULT_TYPE):
+        campaign_id, phase, deadline = context.job.data
+        deadlines = self._deadlines.get(campaign_id)
+        current = deadlines and (deadlines.vote_deadline if phase == VOTING else deadlines.payment_deadline)
+        if current != deadline:
+            return  # rescheduled meanwhile
+        self._open[(campaign_id, phase)] = False
+        self.closed += 1
+        freeze = self.db.freeze_results if phase == VOTING else self.db.freeze_orders
+        try:
+            await asyncio.to_thread(freeze, campaign_id, deadline)
+        except Exception as e:
+            logger.error("Freezing %s snapshot of campaign %s failed: %s", phase, campaign_id, e)
+            return
+        logger.info("Campaign %s %s deadline %s passed, final snapshot taken", campaign_id, phase, deadline)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'campaigns': len(self._deadlines),
+            'open': sum(self._open.values()),
+            'closed': self.closed,
+        }
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Query plan regression check for database.py
+
+Seeds a synthetic database, runs every Database method with SQL tracing
+enabled and checks the EXPLAIN QUERY PLAN of each statement it executed.
+Exits with status 1 when a query does a full SCAN (or a temp-B-tree sort)
+where an index SEARCH is expected. Per-query timings are printed for each
+database size.
+
+Usage:
+    python query_plans.py                      # 10k, 100k and 1M rows
+    python query_plans.py --sizes 10000 --repeat 20
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from config import DATE_FORMAT, SHIRT_SIZES
+from database import Database
+from models import Order
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DESIGN_COUNT = 12  # per campaign
+CAMPAIGN_COUNT = 4
+
+SCAN_RE = re.compile(r'^SCAN (\w+)')
+TEMP_BTREE_RE = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+
+
+class TracingDatabase(Database):
+    """Database that records every statement executed on its connections"""
+
+    def __init__(self, db_name: str):
+        self.statements: List[str] = []
+        super().__init__(db_name)
+
+    @contextmanager
+    def get_connection(self):
+        with super().get_connection() as conn:
+            conn.set_trace_callback(self.statements.append)
+            yield conn
+
+
+@dataclass
+class Check:
+    """One Database call and the plan shape it is allowed to have"""
+    name: str
+    call: Callable[[Database, random.Random, int], object]
+    hot: bool = True
+    allow_scan: Tuple[str, ...] = ()
+    allow_temp_btree: bool = False
+
+
+def _some_user(rng: random.Random, size: int) -> int:
+    return rng.randint(1, size)
+
+
+def _campaign_of(telegram_id: int) -> int:
+    """Campaign a seeded user belongs to"""
+    return telegram_id % CAMPAIGN_COUNT + 1
+
+
+def _some_design(rng: random.Random, campaign_id: int) -> int:
+    """A design seeded for the campaign"""
+    return (campaign_id - 1) * DESIGN_COUNT + rng.randint(1, DESIGN_COUNT)
+
+
+def _some_campaign(rng: random.Random) -> int:
+    return rng.randint(1, CAMPAIGN_COUNT)
+
+
+def _user_call(method: str):
+    """Check call for a per-user method, passing the user's campaign"""
+    def call(db: Database, rng: random.Random, size: int):
+        telegram_id = _some_user(rng, size)
+        return getattr(db, method)(telegram_id, _campaign_of(telegram_id))
+    return call
+
+
+def _vote(db: Database, rng: random.Random, size: int):
+    telegram_id = _some_user(rng, size)
+    campaign_id = _campaign_of(telegram_id)
+    db.save_vote(telegram_id, _some_design(rng, campaign_id), campaign_id)
+
+
+_archive_labels = itertools.count(1)
+
+
+def _new_order(rng: random.Random, size: int) -> Order:
+    telegram_id = _some_user(rng, size)
+    return Order(
+        telegram_id=telegram_id,
+        full_name='Load Test',
+        shirt_number=rng.randint(0, 999),
+        shirt_name='TEST',
+        size=rng.choice(SHIRT_SIZES),
+        receipt_file_id='receipt-file-id',
+        payment_time=datetime.now(),
+        campaign_id=_campaign_of(telegram_id),
+        receipt_file_unique_id='receipt-file-unique-id'
+    )
+
+
+CHECKS = [
+    Check('get_user_campaign', lambda db, rng, n: db.get_user_campaign(_some_user(rng, n))),
+    Check('get_user', _user_call('get_user')),
+    Check('create_user', _user_call('create_user')),
+    Check('save_vote', _vote),
+    Check('has_user_voted', _user_call('has_user_voted')),
+    Check('has_user_ordered', _user_call('has_user_ordered')),
+    # Startup reads of membership.MembershipIndex
+    Check('get_voter_ids', lambda db, rng, n: db.get_voter_ids(_some_campaign(rng)), hot=False),
+    Check('get_orderer_ids', lambda db, rng, n: db.get_orderer_ids(_some_campaign(rng)), hot=False),
+    Check('save_order', lambda db, rng, n: db.save_order(_new_order(rng, n))),
+    Check('get_campaign', lambda db, rng, n: db.get_campaign(_some_campaign(rng))),
+    Check('get_deadlines', lambda db, rng, n: db.get_deadlines(_some_campaign(rng))),
+    Check('get_active_designs', lambda db, rng, n: db.get_active_designs(_some_campaign(rng))),
+    Check('get_design', lambda db, rng, n: db.get_design(_some_design(rng, _some_campaign(rng)))),
+    # Sorting the handful of per-design counts is fine
+    Check('get_vote_results', lambda db, rng, n: db.get_vote_results(_some_campaign(rng)),
+          allow_temp_btree=True),
+    Check('get_designs_page', lambda db, rng, n: db.get_designs_page(_some_campaign(rng), after=(0, 5), limit=26)),
+    Check('get_results_page', lambda db, rng, n: db.get_results_page(_some_campaign(rng), after=(3, 2), limit=26),
+          allow_temp_btree=True),
+    Check('get_final_results_page',
+          lambda db, rng, n: db.get_final_results_page(_some_campaign(rng), datetime(2030, 1, 1), after=5,
+                                                       limit=26)),
+    Check('count_results', lambda db, rng, n: db.count_results(_some_campaign(rng))),
+    Check('count_results (final)', lambda db, rng, n: db.count_results(_some_campaign(rng), datetime(2030, 1, 1))),
+    Check('get_campaign_by_code', lambda db, rng, n: db.get_campaign_by_code(f'team-{_some_campaign(rng)}'),
+          hot=False),
+    Check('get_campaigns', lambda db, rng, n: db.get_campaigns(), hot=False, allow_scan=('campaigns',)),
+    Check('join_campaign', lambda db, rng, n: db.join_campaign(_some_user(rng, n), _some_campaign(rng)),
+          hot=False),
+    Check('create_campaign', lambda db, rng, n: db.create_campaign(f'extra-{rng.random()}', 'Extra'),
+          hot=False),
+    Check('set_vote_deadline',
+          lambda db, rng, n: db.set_vote_deadline(datetime.now() + timedelta(days=30), _some_campaign(rng)),
+          hot=False),
+    Check('set_payment_deadline',
+          lambda db, rng, n: db.set_payment_deadline(datetime.now() + timedelta(days=30), _some_campaign(rng)),
+          hot=False),
+    Check('add_design', lambda db, rng, n: db.add_design('Extra', 'Extra design', 'extra-file-id',
+                                                         campaign_id=_some_campaign(rng)),
+          hot=False),
+    Check('add_designs', lambda db, rng, n: db.add_designs([('Album', '', 'album-file-id')] * 10,
+                                                           campaign_id=_some_campaign(rng)),
+          hot=False),
+    Check('update_design', lambda db, rng, n: db.update_design(DESIGN_COUNT, description='Updated'),
+          hot=False),
+    Check('delete_design', lambda db, rng, n: db.delete_design(DESIGN_COUNT * CAMPAIGN_COUNT + 1),
+          hot=False),
+    # Whole-campaign reads: an ordered index range is fine, a sort in a
+    # temp B-tree or a scan over other campaigns' rows is not.
+    Check('get_total_orders', lambda db, rng, n: db.get_total_orders(_some_campaign(rng)),
+          hot=False),
+    Check('get_receipts', lambda db, rng, n: db.get_receipts(_some_campaign(rng)), hot=False),
+    Check('get_unreviewed_orders',
+          lambda db, rng, n: db.get_unreviewed_orders(_some_campaign(rng), rng.randint(0, n // 3), 10), hot=False),
+    Check('count_unreviewed_orders', lambda db, rng, n: db.count_unreviewed_orders(_some_campaign(rng)), hot=False),
+    Check('review_orders', lambda db, rng, n: db.review_orders(
+        [(rng.randint(1, n // 3), 'approved') for _ in range(10)], reviewer=1), hot=False),
+    Check('get_last_event_seq', lambda db, rng, n: db.get_last_event_seq()),
+    Check('get_events', lambda db, rng, n: db.get_events(rng.randint(0, n), 10000), hot=False),
+    # Holds one row, older checkpoints are deleted when a new one is saved
+    Check('get_checkpoint', lambda db, rng, n: db.get_checkpoint(), hot=False, allow_scan=('event_checkpoints',)),
+    Check('save_checkpoint', lambda db, rng, n: db.save_checkpoint(rng.randint(1, n), b'state'), hot=False),
+    Check('export_orders_to_csv', lambda db, rng, n: db.export_orders_to_csv(_some_campaign(rng)),
+          hot=False),
+    Check('freeze_results', lambda db, rng, n: db.freeze_results(_some_campaign(rng), datetime(2030, 1, 1)),
+          hot=False, allow_temp_btree=True),
+    Check('freeze_orders', lambda db, rng, n: db.freeze_orders(_some_campaign(rng), datetime(2030, 1, 1)),
+          hot=False),
+    Check('export_final_orders_to_csv',
+          lambda db, rng, n: db.export_final_orders_to_csv(_some_campaign(rng), datetime(2030, 1, 1)),
+          hot=False),
+    Check('get_archived_campaigns', lambda db, rng, n: db.get_archived_campaigns(),
+          hot=False, allow_scan=('archived_campaigns',), allow_temp_btree=True),
+    Check('export_archived_orders_to_csv', lambda db, rng, n: db.export_archived_orders_to_csv('season-1'),
+          hot=False),
+    # Moves a campaign's votes and orders, so it must run last. The
+    # repeats archive campaigns under fresh labels.
+    Check('archive_campaign',
+          lambda db, rng, n: db.archive_campaign(f'season-{next(_archive_labels)}', _some_campaign(rng)),
+          hot=False),
+]
+
+
+def seed_database(db: Database, size: int, seed: int = 0):
+    """Fill the database with `size` users spread over the campaigns, plus votes and orders"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+
+    # Seed through the base class connection so the bulk inserts aren't traced
+    with Database.get_connection(db) as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT OR IGNORE INTO campaigns (id, code, name, vote_deadline, payment_deadline)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (c, f'team-{c}', f'Team {c}', '2030-01-01 00:00', '2030-01-01 00:00')
+            for c in range(1, CAMPAIGN_COUNT + 1)
+        ])
+        cursor.executemany('''
+            INSERT INTO designs (campaign_id, name, description, image_file_id, display_order, is_active)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (c, f'Design {i}', f'Synthetic design {i}', f'design-file-{c}-{i}', i, 1)
+            for c in range(1, CAMPAIGN_COUNT + 1)
+            for i in range(1, DESIGN_COUNT + 1)
+        ])
+
+        cursor.executemany('''
+            INSERT INTO users (telegram_id, campaign_id) VALUES (?, ?)
+        ''', ((telegram_id, _campaign_of(telegram_id)) for telegram_id in range(1, size + 1)))
+
+        def votes():
+            for telegram_id in range(1, size + 1):
+                if rng.random() < 0.7:
+                    campaign_id = _campaign_of(telegram_id)
+                    yield campaign_id, telegram_id, _some_design(rng, campaign_id)
+
+        cursor.executemany('''
+            INSERT INTO votes (campaign_id, telegram_id, design_id) VALUES (?, ?, ?)
+        ''', votes())
+
+        def orders():
+            for telegram_id in range(1, size + 1):
+                if rng.random() >= 0.4:
+                    continue
+                paid = start + timedelta(minutes=rng.randint(0, 60 * 24 * 60))
+                yield (
+                    _campaign_of(telegram_id), telegram_id, f'User {telegram_id}', rng.randint(0, 999),
+                    f'U{telegram_id}'[:15], rng.choice(SHIRT_SIZES),
+                    f'receipt-{telegram_id}', paid.strftime(DATE_FORMAT)
+                )
+
+        cursor.executemany('''
+            INSERT INTO orders
+            (campaign_id, telegram_id, full_name, shirt_number, shirt_name, size, receipt_file_id, payment_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', orders())
+        cursor.execute('ANALYZE')
+
+
+def explain(db_name: str, statement: str) -> List[str]:
+    """Return the plan detail lines for a single statement"""
+    conn = sqlite3.connect(db_name)
+    try:
+        return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {statement}')]
+    finally:
+        conn.close()
+
+
+def plan_violations(check: Check, plan: List[str]) -> List[str]:
+    """List the plan lines that break the check's expectations"""
+    violations = []
+    for detail in plan:
+        match = SCAN_RE.match(detail)
+        if match and match.group(1) not in check.allow_scan:
+            violations.append(detail)
+        elif TEMP_BTREE_RE.search(detail) and not check.allow_temp_btree:
+            violations.append(detail)
+    return violations
+
+
+def run_size(size: int, repeat: int, verbose: bool) -> int:
+    """Seed a database of `size` users, check and time every query"""
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'query_plans.db')
+        db = TracingDatabase(db_name)
+
+        started = time.perf_counter()
+        seed_database(db, size)
+        print(f"\n📦 {size:,} users seeded in {time.perf_counter() - started:.1f}s")
+        print(f"{'query':<32}{'hot':<5}{'median ms':>11}{'max ms':>10}  plan")
+
+        rng = random.Random(size)
+        for check in CHECKS:
+            db.statements.clear()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                check.call(db, rng, size)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            statements = {
+                s for s in db.statements
+                if s.lstrip().split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+            }
+            violations = []
+            plans = []
+            for statement in sorted(statements):
+                plan = explain(db_name, statement)
+                plans.extend(plan)
+                violations.extend(plan_violations(check, plan))
+
+            status = '❌' if violations else '✅'
+            print(f"{check.name:<32}{'yes' if check.hot else 'no':<5}"
+                  f"{statistics.median(timings):>11.3f}{max(timings):>10.3f}  {status}")
+            if verbose:
+                for detail in sorted(set(plans)):
+                    print(f"    {detail}")
+            for detail in sorted(set(violations)):
+                print(f"    unexpected: {detail}")
+            if violations:
+                failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='number of seeded users per run')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='calls per query when timing')
+    parser.add_argument('--verbose', action='store_true',
+                        help='print the full plan of every query')
+    args = parser.parse_args()
+
+    failures = sum(run_size(size, args.repeat, args.verbose) for size in args.sizes)
+    if failures:
+        print(f"\n❌ {failures} query plan regression(s) found")
+        sys.exit(1)
+    print("\n✅ All query plans use the expected indexes")
+
+
+if __name__ == '__main__':
+    main()
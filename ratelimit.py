@@ -0,0 +1,147 @@
+"""
+Per-user flood protection
+
+RateLimiter keeps a token bucket per user and command in memory and runs
+as an early handler group, before any handler touches the database. An
+update whose bucket is empty is dropped with ApplicationHandlerStop, so a
+user hammering /vote or /start costs a dictionary lookup instead of a
+burst of queries and photo sends.
+"""
+
+import logging
+import time
+from typing import Any, Collection, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows `capacity` events at once, refilling over `period` seconds"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated', 'limited')
+
+    def __init__(self, capacity: int, period: float, now: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = now
+        self.limited = False  # the last take() failed
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.limited = self.tokens < 1
+        if not self.limited:
+            self.tokens -= 1
+        return not self.limited
+
+    def full_at(self) -> float:
+        """Time at which the bucket will be full again"""
+        return self.updated + (self.capacity - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token-bucket rate limiting per user and command"""
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, float]],
+        exempt_ids: Collection[int] = (),
+        sweep_interval: float = 60.0,
+        notice: Optional[str] = None,
+    ):
+        # limits: bucket name -> (capacity, period in seconds); 'default'
+        # covers every update without a bucket of its own
+        self.limits = limits
+        self.exempt_ids = set(exempt_ids)
+        self.sweep_interval = sweep_interval
+        self.notice = notice
+
+        self._buckets: Dict[int, Dict[str, TokenBucket]] = {}
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.allowed = 0
+        self.dropped: Dict[str, int] = {}
+        self.evicted = 0
+
+    @staticmethod
+    def bucket_name(update: Update) -> str:
+        """Name of the bucket an update is charged to"""
+        if update.callback_query and update.callback_query.data:
+            return f"{update.callback_query.data.split('_', 1)[0]}_callback"
+        message = update.effective_message
+        if message and message.text and message.text.startswith('/'):
+            return message.text.split()[0][1:].split('@')[0].lower()
+        return 'default'
+
+    def allow(self, user_id: int, name: str, now: Optional[float] = None) -> bool:
+        """Charge one event to a user's bucket, returning False when empty"""
+        return self._charge(user_id, name, now)[0]
+
+    def _charge(self, user_id: int, name: str, now: Optional[float] = None) -> Tuple[bool, bool]:
+        """Return (allowed, first drop since the bucket was last allowed)"""
+        now = time.monotonic() if now is None else now
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        if name not in self.limits:
+            name = 'default'
+        limit = self.limits.get(name)
+        if limit is None:
+            return True, False
+
+        buckets = self._buckets.setdefault(user_id, {})
+        bucket = buckets.get(name)
+        if bucket is None:
+            bucket = buckets[name] = TokenBucket(limit[0], limit[1], now)
+        was_limited = bucket.limited
+        if bucket.take(now):
+            self.allowed += 1
+            return True, False
+        self.dropped[name] = self.dropped.get(name, 0) + 1
+        return False, not was_limited
+
+    def sweep(self, now: Optional[float] = None):
+        """Forget users whose buckets have all refilled"""
+        now = time.monotonic() if now is None else now
+        idle = [
+            user_id for user_id, buckets in self._buckets.items()
+            if all(bucket.full_at() <= now for bucket in buckets.values())
+        ]
+        for user_id in idle:
+            del self._buckets[user_id]
+        self.evicted += len(idle)
+        self._next_sweep = now + self.sweep_interval
+
+    async def check(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler callback, register it in a group before all other handlers"""
+        user = update.effective_user
+        if not user or user.id in self.exempt_ids:
+            return
+        allowed, first_drop = self._charge(user.id, self.bucket_name(update))
+        if allowed:
+            return
+
+        # Only the first drop of a burst gets the notice, so the reply doesn't
+        # turn the user's flood into ours. Every dropped callback query is
+        # still answered, without text, or its button keeps spinning.
+        notice = self.notice if first_drop else None
+        try:
+            if update.callback_query:
+                await update.callback_query.answer(notice)
+            elif notice and update.effective_message:
+                await update.effective_message.reply_text(notice)
+        except Exception as e:
+            logger.warning("Failed to answer rate limited update: %s", e)
+        raise ApplicationHandlerStop
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'tracked_users': len(self._buckets),
+            'allowed': self.allowed,
+            'dropped': dict(self.dropped),
+            'dropped_total': sum(self.dropped.values()),
+            'evicted': self.evicted,
+        }
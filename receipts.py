@@ -0,0 +1,194 @@
+"""
+Receipt archive
+
+/export_receipts sends the treasurer every payment receipt of a campaign
+as ZIP files. ReceiptArchiver resolves each receipt with getFile and
+downloads it with at most `concurrency` downloads in flight, while a
+single writer adds files to the ZIP as they arrive, so only a few files
+are in memory at any time. ZIPs are written to SpooledTemporaryFiles,
+in memory while small and on disk beyond `spool_size`, and a new part is
+started before one grows past `part_size` (bots may send up to 50 MB).
+
+Downloaded files are kept in ReceiptCache, a directory addressed by
+Telegram's file_unique_id, which stays the same for the same file even
+when its file_id changes. Orders keep the unique ID of their receipt, so
+later exports read cached receipts without calling getFile and only
+resolve and download new ones.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (order id, shirt number, shirt name, receipt file id, unique id), see Repository.get_receipts
+Receipt = Tuple[int, int, str, str, Optional[str]]
+
+# Local header plus central directory record of one ZIP entry, with room for its name
+ENTRY_OVERHEAD = 256
+
+
+class ReceiptCache:
+    """Downloaded files by file_unique_id, two directory levels deep"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, unique_id: str) -> str:
+        return os.path.join(self.root, unique_id[:2], unique_id)
+
+    def get(self, unique_id: str) -> Optional[bytes]:
+        try:
+            with open(self.path(unique_id), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, unique_id: str, data: bytes):
+        path = self.path(unique_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so a crash never leaves half a file
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+
+
+def entry_name(receipt: Receipt, extension: str) -> str:
+    """ZIP entry of a receipt: order id, shirt number and name"""
+    order_id, shirt_number, shirt_name = receipt[:3]
+    name = re.sub(r'[^\w-]+', '_', shirt_name).strip('_')[:40] or 'receipt'
+    return f'{order_id:05d}_{shirt_number}_{name}{extension or ".jpg"}'
+
+
+class ReceiptExport:
+    """ZIP parts of one export, rewound and ready to send, plus what went into them"""
+
+    def __init__(self):
+        self.parts: List[tempfile.SpooledTemporaryFile] = []
+        self.files = 0
+        self.downloaded = 0
+        self.cached = 0
+        self.bytes = 0
+        # Order ids whose receipt could not be fetched
+        self.failed: List[int] = []
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+
+
+class ReceiptArchiver:
+    """Builds ReceiptExports with bounded-concurrency downloads"""
+
+    def __init__(self, cache: Optional[ReceiptCache] = None, concurrency: int = 8,
+                 spool_size: int = 8 * 1024 * 1024, part_size: int = 45 * 1024 * 1024):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.spool_size = spool_size
+        self.part_size = part_size
+        self.exports = 0
+        self.downloaded = 0
+        self.cached = 0
+        self.failed = 0
+
+    async def _fetch(self, bot, receipt: Receipt) -> Tuple[Optional[bytes], str, bool]:
+        """Receipt contents (None when it failed), file extension and whether it came from the cache"""
+        try:
+            # Photos the bot receives are JPEGs, the default extension
+            if self.cache is not None and receipt[4] is not None:
+                data = await asyncio.to_thread(self.cache.get, receipt[4])
+                if data is not None:
+                    return data, '', True
+            file = await bot.get_file(receipt[3])
+            extension = os.path.splitext(file.file_path or '')[1]
+            if self.cache is not None:
+                data = await asyncio.to_thread(self.cache.get, file.file_unique_id)
+                if data is not None:
+                    return data, extension, True
+            data = bytes(await file.download_as_bytearray())
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, file.file_unique_id, data)
+            return data, extension, False
+        except Exception as e:
+            logger.warning("Fetching receipt of order %s failed: %s", receipt[0], e)
+            return None, '', False
+
+    def _write(self, export: ReceiptExport, archive: Optional[zipfile.ZipFile], name: str,
+               data: bytes) -> zipfile.ZipFile:
+        """Add one file, starting a new part first if it would outgrow the current one"""
+        if archive is not None and archive.filelist:
+            projected = export.parts[-1].tell() + len(data) + ENTRY_OVERHEAD * (len(archive.filelist) + 1)
+            if projected > self.part_size:
+                archive.close()
+                archive = None
+        if archive is None:
+            part = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+            export.parts.append(part)
+            # Receipts are JPEGs already, deflating them only costs time
+            archive = zipfile.ZipFile(part, 'w', compression=zipfile.ZIP_STORED)
+        archive.writestr(name, data)
+        return archive
+
+    async def build(self, bot, receipts: Sequence[Receipt]) -> ReceiptExport:
+        """Fetch every receipt and ZIP them up; the caller closes the export"""
+        export = ReceiptExport()
+        pending: asyncio.Queue = asyncio.Queue()
+        for receipt in receipts:
+            pending.put_nowait(receipt)
+        # Bounded, so downloads pause while the writer catches up
+        fetched: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+
+        async def worker():
+            while not pending.empty():
+                receipt = pending.get_nowait()
+                await fetched.put((receipt, *await self._fetch(bot, receipt)))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(receipts)))]
+        archive = None
+        try:
+            for _ in range(len(receipts)):
+                receipt, data, extension, cached = await fetched.get()
+                if data is None:
+                    export.failed.append(receipt[0])
+                    continue
+                # Spooled parts may have rolled over to disk
+                name = entry_name(receipt, extension)
+                archive = await asyncio.to_thread(self._write, export, archive, name, data)
+                export.files += 1
+                export.bytes += len(data)
+                if cached:
+                    export.cached += 1
+                else:
+                    export.downloaded += 1
+            if archive is not None:
+                archive.close()
+        except BaseException:
+            export.close()
+            raise
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        export.failed.sort()
+        for part in export.parts:
+            part.seek(0)
+        self.exports += 1
+        self.downloaded += export.downloaded
+        self.cached += export.cached
+        self.failed += len(export.failed)
+        return export
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'exports': self.exports,
+            'downloaded': self.downloaded,
+            'cached': self.cached,
+            'failed': self.failed,
+        }
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+/export_receipts benchmark
+
+Builds receipt ZIPs (see receipts.py) for N orders whose receipts live in
+a FakeBotApi, once per download concurrency, and reports throughput and
+peak Python memory. Each concurrency starts with an empty cache; a second
+run against the warm cache shows what a repeated export costs, and must
+call getFile only for the receipts that could not be fetched. Every ZIP
+is checked: one entry per order, named by order id, shirt number and
+name, holding exactly the file the fake API served.
+
+With --http the files are fetched over HTTP from FakeTelegramServer's
+/file/bot<token>/ endpoint through BotApiRequest, as in production.
+
+Usage:
+    python receipts_benchmark.py
+    python receipts_benchmark.py --orders 500 --size 300000 --latency 0.05 --http
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from typing import Dict, List
+
+from telegram import Bot
+
+from api_client import BotApiRequest
+from config import BOT_TOKEN
+from database import Database
+from fake_telegram import FakeBotApi, FakeBotRequest, FakeTelegramServer
+from models import Order
+from receipts import ReceiptArchiver, ReceiptCache, ReceiptExport, entry_name
+from repository import DEFAULT_CAMPAIGN_ID
+
+
+def seed(db: Database, api: FakeBotApi, orders: int, size: int, missing: int) -> Dict[str, bytes]:
+    """Orders with receipts in the fake API, the last `missing` of them unknown to it"""
+    contents = {}
+    for i in range(orders):
+        file_id = f'receipt-{i}'
+        unique_id = f'unique-{i}'
+        if i < orders - missing:
+            contents[file_id] = os.urandom(size)
+            api.add_file(file_id, contents[file_id], unique_id)
+        db.save_order(Order(
+            telegram_id=i + 1, full_name=f'Player {i}', shirt_number=i % 100, shirt_name=f'Player {i}',
+            size='M', receipt_file_id=file_id, payment_time=db.default_deadline(), campaign_id=DEFAULT_CAMPAIGN_ID,
+            receipt_file_unique_id=unique_id
+        ))
+    return contents
+
+
+def verify(export: ReceiptExport, receipts: List[tuple], contents: Dict[str, bytes]) -> List[str]:
+    """Problems with the export, none when every served receipt is in it intact"""
+    entries = {}
+    for part in export.parts:
+        with zipfile.ZipFile(part) as archive:
+            entries.update((name, archive.read(name)) for name in archive.namelist())
+        part.seek(0)
+    problems = []
+    for receipt in receipts:
+        name = entry_name(receipt, '.jpg')
+        if receipt[3] not in contents:
+            if receipt[0] not in export.failed:
+                problems.append(f"order {receipt[0]} has no file but was not reported failed")
+        elif entries.get(name) != contents[receipt[3]]:
+            problems.append(f"{name} missing or different")
+    if len(entries) != len(contents):
+        problems.append(f"{len(entries)} entries for {len(contents)} files")
+    return problems
+
+
+async def timed_build(archiver: ReceiptArchiver, bot: Bot, receipts: List[tuple]):
+    tracemalloc.start()
+    started = time.perf_counter()
+    export = await archiver.build(bot, receipts)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return export, elapsed, peak
+
+
+async def run(args) -> bool:
+    api = FakeBotApi(latency=args.latency)
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'receipts.db'))
+        contents = seed(db, api, args.orders, args.size, args.missing)
+        receipts = db.get_receipts(DEFAULT_CAMPAIGN_ID)
+        if args.http:
+            server = FakeTelegramServer(api)
+            server.start_background()
+            bot = Bot(BOT_TOKEN, base_url=server.base_url, base_file_url=server.base_file_url,
+                      request=BotApiRequest(max(args.concurrency)))
+        else:
+            bot = Bot(BOT_TOKEN, request=FakeBotRequest(api))
+
+        total_mb = sum(map(len, contents.values())) / 1e6
+        print(f"📦 {len(receipts)} receipts, {total_mb:.1f} MB, {args.latency * 1000:.0f}ms per call"
+              f"{' over HTTP' if args.http else ''}\n")
+        print(f"{'concurrency':<12}{'cache':<7}{'seconds':>9}{'files/s':>10}{'MB/s':>8}{'peak MB':>9}{'parts':>7}")
+        ok = True
+        try:
+            async with bot:
+                for concurrency in args.concurrency:
+                    cache = ReceiptCache(os.path.join(tmp, f'cache-{concurrency}'))
+                    archiver = ReceiptArchiver(cache, concurrency=concurrency, spool_size=args.spool_size,
+                                               part_size=args.part_size)
+                    for warm in (False, True):
+                        resolved = api.calls['getfile']
+                        export, elapsed, peak = await timed_build(archiver, bot, receipts)
+                        resolved = api.calls['getfile'] - resolved
+                        problems = verify(export, receipts, contents)
+                        export.close()
+                        print(f"{concurrency:<12}{'warm' if warm else 'cold':<7}{elapsed:>9.2f}"
+                              f"{len(receipts) / elapsed:>10,.0f}{total_mb / elapsed:>8.1f}"
+                              f"{peak / 1e6:>9.1f}{len(export.parts):>7}")
+                        if warm and export.downloaded:
+                            problems.append(f"{export.downloaded} downloads with a warm cache")
+                        # Only the receipts that never made it into the cache are resolved again
+                        if warm and resolved > args.missing:
+                            problems.append(f"{resolved} getFile calls with a warm cache")
+                        for problem in problems:
+                            print(f"   ❌ {problem}")
+                        ok = ok and not problems
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark receipt ZIP exports against a fake Bot API')
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--size', type=int, default=150_000, help='bytes per receipt')
+    parser.add_argument('--missing', type=int, default=2, help='orders whose receipt cannot be fetched')
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated latency per call, seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--spool-size', type=int, default=8 * 1024 * 1024)
+    parser.add_argument('--part-size', type=int, default=45 * 1024 * 1024)
+    parser.add_argument('--http', action='store_true', help='download over HTTP instead of in-process')
+    args = parser.parse_args()
+
+    # The --missing receipts are expected to fail
+    logging.getLogger('receipts').setLevel(logging.ERROR)
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+    print("\n✅ Every export held each receipt once, intact, and reported the missing ones")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Opt-in recorder for incoming updates
+
+When UPDATE_RECORD_FILE is set, every update is appended to that file as
+one JSON line:
+
+    {"received_at": 1718000000.123, "update": {...}}
+
+User and chat ids are replaced by a salted hash so recordings can be
+shared; the same user always maps to the same anonymous id, so
+conversations stay intact. Admin ids are kept so admin commands still
+work when the recording is fed back with replay.py. Message text is kept
+as-is.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+from typing import Any, Collection, Dict
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# Keys whose dict value describes a Telegram user or chat
+IDENTITY_KEYS = {'from', 'chat', 'user', 'sender_chat', 'forward_from', 'forward_from_chat'}
+# Personal fields dropped from those dicts
+PERSONAL_FIELDS = {'username', 'last_name', 'bio', 'title', 'invite_link'}
+
+
+def anonymize_id(value: int, salt: str) -> int:
+    """Map a user/chat id to a stable 48-bit id, keeping its sign"""
+    digest = hmac.new(salt.encode('utf-8'), str(abs(value)).encode('utf-8'), hashlib.sha256).digest()
+    anonymous = int.from_bytes(digest[:6], 'big') or 1
+    return -anonymous if value < 0 else anonymous
+
+
+def anonymize(data: Any, salt: str, keep_ids: Collection[int] = ()) -> Any:
+    """Return a copy of an update dict with identities anonymized"""
+    if isinstance(data, list):
+        return [anonymize(item, salt, keep_ids) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    result = {}
+    for key, value in data.items():
+        if key in IDENTITY_KEYS and isinstance(value, dict):
+            identity = {k: v for k, v in value.items() if k not in PERSONAL_FIELDS}
+            if 'id' in identity and identity['id'] not in keep_ids:
+                identity['id'] = anonymize_id(identity['id'], salt)
+            if 'first_name' in identity:
+                identity['first_name'] = 'User'
+            result[key] = identity
+        else:
+            result[key] = anonymize(value, salt, keep_ids)
+    return result
+
+
+class UpdateRecorder:
+    """Appends every update it sees to a JSONL file"""
+
+    def __init__(self, path: str, salt: str = '', keep_ids: Collection[int] = ()):
+        self.path = path
+        self.salt = salt
+        self.keep_ids = set(keep_ids)
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def to_record(self, update: Update) -> Dict[str, Any]:
+        return {
+            'received_at': time.time(),
+            'update': anonymize(update.to_dict(), self.salt, self.keep_ids),
+        }
+
+    async def record(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler callback, register it in an early group"""
+        try:
+            self._file.write(json.dumps(self.to_record(update), ensure_ascii=False) + '\n')
+        except Exception as e:
+            logger.error("Failed to record update %s: %s", update.update_id, e)
+
+    def close(self):
+        self._file.close()
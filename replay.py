@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded update stream through the bot
+
+Feeds a JSONL recording made by recorder.py back through the real
+Application against a copy of the database, with Bot API calls answered
+by fake_telegram.FakeBotApi. Updates are sent at their recorded arrival
+times scaled by --speed (1 = real time, 10 = ten times faster, 0 = as
+fast as possible), and the same latency report as loadtest.py is printed.
+
+Usage:
+    UPDATE_RECORD_FILE=updates.jsonl python bot.py      # record
+    python replay.py updates.jsonl --speed 10           # replay
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Tuple
+
+import bot
+from config import DATABASE_NAME, MAX_CONCURRENT_UPDATES
+from fake_telegram import FakeBotApi
+from loadtest import LoadTest, TimedDatabase, fake_api_builder, report
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Yield (received_at, update payload) from a recording"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record['received_at'], record['update']
+
+
+def describe(payload: Dict[str, Any]) -> str:
+    """Label an update by the command or kind of input it carries"""
+    if 'callback_query' in payload:
+        data = payload['callback_query'].get('data') or ''
+        return f"{data.split('_', 1)[0]}_callback"
+    message = payload.get('message') or payload.get('edited_message') or {}
+    text = message.get('text') or ''
+    if text.startswith('/'):
+        return text.split()[0].split('@')[0]
+    if message.get('photo'):
+        return 'photo'
+    if text:
+        return 'text'
+    return next((key for key in payload if key != 'update_id'), 'unknown')
+
+
+def copy_database(source: str, target: str):
+    """Copy a live database consistently using the online backup API"""
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Database {source} not found")
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+async def replay(args):
+    records = list(read_recording(args.recording))
+    if not records:
+        print("📭 Recording is empty")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = os.path.join(tmp, 'replay.db')
+        copy_database(args.database, db_copy)
+        bot.db = TimedDatabase(db_copy)
+
+        api = FakeBotApi(
+            latency=args.latency, chat_limit=args.chat_limit, global_limit=args.global_limit
+        )
+        builder, server = fake_api_builder(api, args.http, args.pool_size)
+        application = bot.build_application(builder, args.concurrency)
+        load = LoadTest(application, think_time=0, seed=0)
+
+        first_received = records[0][0]
+        async with application:
+            await application.start()
+            started = time.perf_counter()
+            for update_id, (received_at, payload) in enumerate(records, 1):
+                if args.speed:
+                    delay = (received_at - first_received) / args.speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                # Renumber so recordings can be concatenated
+                payload['update_id'] = update_id
+                await load.dispatch(describe(payload), payload)
+            await asyncio.gather(*(sample.done.wait() for sample in load.samples))
+            elapsed = time.perf_counter() - started
+            await application.stop()
+
+        if server:
+            server.shutdown()
+            server.server_close()
+
+        recorded = records[-1][0] - first_received
+        print(f"\n🎞️ Replayed {len(records)} updates recorded over {recorded:.1f}s "
+              f"at {'max' if not args.speed else f'{args.speed:g}x'} speed")
+        report(load.samples, elapsed, api)
+        if args.keep_database:
+            shutil.copyfile(db_copy, args.keep_database)
+            print(f"💾 Database after replay saved to {args.keep_database}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded update stream through the bot')
+    parser.add_argument('recording', help='JSONL file written by the update recorder')
+    parser.add_argument('--database', default=DATABASE_NAME,
+                        help='database to copy before replaying (never modified)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed multiplier, 0 for as fast as possible')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='simulated Bot API latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_UPDATES,
+                        help='updates processed concurrently (1 = sequential)')
+    parser.add_argument('--http', action='store_true',
+                        help='call a local fake Bot API server over HTTP instead of in-process')
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--chat-limit', type=int, default=0)
+    parser.add_argument('--global-limit', type=int, default=0)
+    parser.add_argument('--keep-database', metavar='PATH',
+                        help='save the database as it is after the replay')
+    parser.add_argument('--verbose', action='store_true', help='keep the bot\'s INFO logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(replay(args))
+
+
+if __name__ == '__main__':
+    main()
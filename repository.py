@@ -0,0 +1,298 @@
+"""
+Storage interface for the bot
+
+Repository lists every operation the bot needs from storage. Two
+implementations exist:
+
+    database.Database              SQLite, used by the bot
+    memory_database.MemoryDatabase pure Python dicts, for tests and benchmarks
+
+storage_conformance.py checks that both behave the same and
+storage_benchmark.py compares them under one synthetic workload.
+"""
+
+import csv
+import io
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from models import User, Order, Deadlines, Design, Campaign
+
+# Campaign that pre-campaign data is migrated into and new users start in
+DEFAULT_CAMPAIGN_ID = 1
+
+# Event journal (see journal.py). Events are (seq, campaign_id, kind,
+# telegram_id, subject, value, at): seq counts up from 1 in append order,
+# `at` is Unix time, and per kind
+#     EVENT_VOTE            telegram_id voted for design `subject`
+#     EVENT_ORDER           telegram_id placed order `subject` in size `value`
+#     EVENT_DESIGN_ADDED    design `subject` was added
+#     EVENT_DESIGN_CHANGED  design `subject` changed, `value` holds the new fields as JSON
+#     EVENT_ARCHIVED        the campaign was archived as `value` and reset
+#     EVENT_ORDER_REVIEWED  admin telegram_id reviewed order `subject`, `value` is the REVIEW_* status
+EVENT_VOTE = 1
+EVENT_ORDER = 2
+EVENT_DESIGN_ADDED = 3
+EVENT_DESIGN_CHANGED = 4
+EVENT_ARCHIVED = 5
+EVENT_ORDER_REVIEWED = 6
+Event = Tuple[int, int, int, Optional[int], Optional[int], Optional[str], int]
+
+# Receipt review decisions (see /review_receipts); unreviewed orders have none
+REVIEW_APPROVED = 'approved'
+REVIEW_REJECTED = 'rejected'
+
+ORDER_CSV_HEADER = ['Telegram ID', 'Full Name', 'Shirt Number', 'Shirt Name', 'Size', 'Payment Time']
+# Archived orders also carry their receipt review, empty when unreviewed
+ARCHIVED_ORDER_CSV_HEADER = ORDER_CSV_HEADER + ['Receipt Review']
+
+
+def orders_to_csv(rows: Iterable[Sequence[Any]], header: Sequence[str] = ORDER_CSV_HEADER) -> str:
+    """Render order rows in `header` column order as CSV"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def check_review_statuses(decisions: Iterable[Tuple[int, str]]):
+    """Raise ValueError for a decision that is neither approved nor rejected"""
+    for order_id, status in decisions:
+        if status not in (REVIEW_APPROVED, REVIEW_REJECTED):
+            raise ValueError(f"Unknown review status {status!r} for order {order_id}")
+
+
+class Repository(ABC):
+    """Everything the bot reads and writes, independent of the storage engine"""
+
+    # File backing the repository, None when it does not live on disk
+    db_name: Optional[str] = None
+
+    @staticmethod
+    def default_deadline() -> datetime:
+        """Deadline used for a fresh campaign: one year from now"""
+        now = datetime.now()
+        return now.replace(year=now.year + 1)
+
+    # Campaign operations
+    @abstractmethod
+    def create_campaign(self, code: str, name: str) -> int:
+        """Create a new campaign with default deadlines
+
+        Raises ValueError when `code` is already taken.
+        """
+
+    @abstractmethod
+    def get_campaign(self, campaign_id: int) -> Optional[Campaign]:
+        """Get campaign by ID"""
+
+    @abstractmethod
+    def get_campaign_by_code(self, code: str) -> Optional[Campaign]:
+        """Get campaign by its join code"""
+
+    @abstractmethod
+    def get_campaigns(self) -> List[Campaign]:
+        """Get all campaigns"""
+
+    @abstractmethod
+    def get_user_campaign(self, telegram_id: int) -> int:
+        """Campaign a user is in, the default one for unknown users"""
+
+    @abstractmethod
+    def join_campaign(self, telegram_id: int, campaign_id: int):
+        """Move a user into a campaign, creating the user if needed"""
+
+    # User operations
+    @abstractmethod
+    def get_user(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Optional[User]:
+        """Get user by telegram ID with their vote/order in a campaign"""
+
+    @abstractmethod
+    def create_user(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        """Create new user"""
+
+    @abstractmethod
+    def save_vote(self, telegram_id: int, design_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        """Save user's vote in a campaign"""
+
+    @abstractmethod
+    def has_user_voted(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> bool:
+        """Check if user has voted in a campaign"""
+
+    @abstractmethod
+    def has_user_ordered(self, telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> bool:
+        """Check if user has ordered in a campaign"""
+
+    @abstractmethod
+    def get_voter_ids(self, campaign_id: int) -> List[int]:
+        """Telegram IDs that voted in a campaign, ascending"""
+
+    @abstractmethod
+    def get_orderer_ids(self, campaign_id: int) -> List[int]:
+        """Telegram IDs with an order in a campaign, ascending and each once"""
+
+    # Order operations
+    @abstractmethod
+    def save_order(self, order: Order):
+        """Save order"""
+
+    # Deadline operations
+    @abstractmethod
+    def get_deadlines(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Deadlines:
+        """Get a campaign's deadlines"""
+
+    @abstractmethod
+    def set_vote_deadline(self, deadline: datetime, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        """Set new vote deadline"""
+
+    @abstractmethod
+    def set_payment_deadline(self, deadline: datetime, campaign_id: int = DEFAULT_CAMPAIGN_ID):
+        """Set new payment deadline"""
+
+    # Design operations
+    @abstractmethod
+    def add_design(self, name: str, description: str, image_file_id: str, display_order: int = 0,
+                   campaign_id: int = DEFAULT_CAMPAIGN_ID) -> int:
+        """Add a new design"""
+
+    @abstractmethod
+    def add_designs(self, designs: Sequence[Tuple[str, str, str]],
+                    campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[int]:
+        """Add (name, description, image_file_id) designs in one transaction
+
+        They are shown after the campaign's active designs, in the given
+        order. Returns the new design IDs in that order.
+        """
+
+    @abstractmethod
+    def get_active_designs(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Design]:
+        """Get a campaign's active designs"""
+
+    @abstractmethod
+    def get_design(self, design_id: int) -> Optional[Design]:
+        """Get design by ID"""
+
+    @abstractmethod
+    def update_design(self, design_id: int, name: str = None, description: str = None,
+                      image_file_id: str = None, is_active: bool = None):
+        """Update design details"""
+
+    def delete_design(self, design_id: int):
+        """Soft delete a design"""
+        self.update_design(design_id, is_active=False)
+
+    # Statistics operations
+    @abstractmethod
+    def get_vote_results(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Tuple[str, int]]:
+        """Get (design name, vote count) per active design, most votes first"""
+
+    @abstractmethod
+    def get_total_orders(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> int:
+        """Get total number of orders in a campaign"""
+
+    @abstractmethod
+    def export_orders_to_csv(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> str:
+        """Export a campaign's orders to CSV format, newest payment first"""
+
+    @abstractmethod
+    def get_receipts(self, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> List[Tuple[int, int, str, str, Optional[str]]]:
+        """(order id, shirt number, shirt name, receipt file id, receipt file_unique_id) per order,
+        oldest payment first; the unique ID is None for orders saved without one
+        """
+
+    # Receipt review
+    @abstractmethod
+    def get_unreviewed_orders(self, campaign_id: int, after: Optional[int] = None,
+                              limit: int = 10) -> List[Tuple[int, str, int, str, str, str]]:
+        """(order id, full name, shirt number, shirt name, size, receipt file id) of orders
+        nobody reviewed yet, by order ID, which is also the cursor
+        """
+
+    @abstractmethod
+    def count_unreviewed_orders(self, campaign_id: int) -> int:
+        """Orders of a campaign nobody reviewed yet"""
+
+    @abstractmethod
+    def review_orders(self, decisions: Sequence[Tuple[int, str]], reviewer: int) -> List[int]:
+        """Record (order id, REVIEW_APPROVED or REVIEW_REJECTED) decisions
+
+        Orders already reviewed, or unknown, are left alone. Returns the IDs
+        of the orders this call reviewed. Raises ValueError for any other status.
+        """
+
+    # Keyset-paginated listings: up to `limit` rows strictly after the
+    # `after` cursor, or strictly before the `before` one, in listing order
+    @abstractmethod
+    def get_designs_page(self, campaign_id: int, after: Optional[Tuple[int, int]] = None,
+                         before: Optional[Tuple[int, int]] = None, limit: int = 20) -> List[Design]:
+        """Active designs ordered by (display_order, id), which is also the cursor"""
+
+    @abstractmethod
+    def get_results_page(self, campaign_id: int, after: Optional[Tuple[int, int]] = None,
+                         before: Optional[Tuple[int, int]] = None,
+                         limit: int = 20) -> List[Tuple[int, str, int]]:
+        """(design id, name, votes) per active design, most votes first, then by ID
+
+        Cursors are (votes, design id).
+        """
+
+    @abstractmethod
+    def get_final_results_page(self, campaign_id: int, deadline: datetime, after: Optional[int] = None,
+                               before: Optional[int] = None, limit: int = 20) -> List[Tuple[int, str, int]]:
+        """(position, design name, votes) from the freeze_results snapshot at `deadline`
+
+        Cursors are positions.
+        """
+
+    @abstractmethod
+    def count_results(self, campaign_id: int, deadline: Optional[datetime] = None) -> Tuple[int, int]:
+        """(designs, total votes) of the live results, or of the snapshot taken at `deadline`"""
+
+    # Final snapshots, taken once per deadline and never changed afterwards
+    @abstractmethod
+    def freeze_results(self, campaign_id: int, deadline: datetime) -> List[Tuple[str, int]]:
+        """Final vote results at `deadline`, snapshotted by the first call"""
+
+    @abstractmethod
+    def freeze_orders(self, campaign_id: int, deadline: datetime) -> int:
+        """Snapshot a campaign's orders at `deadline` once, returning how many there are"""
+
+    @abstractmethod
+    def export_final_orders_to_csv(self, campaign_id: int, deadline: datetime) -> str:
+        """Export the orders snapshot taken at `deadline` to CSV format"""
+
+    # Campaign archiving
+    @abstractmethod
+    def archive_campaign(self, label: str, campaign_id: int = DEFAULT_CAMPAIGN_ID) -> Dict[str, int]:
+        """Move a finished campaign's data into the archive and reset it
+
+        Raises ValueError when `label` is already taken.
+        """
+
+    @abstractmethod
+    def get_archived_campaigns(self) -> List[Mapping[str, Any]]:
+        """List archived campaigns (label, archived_at, votes, orders, designs), newest first"""
+
+    @abstractmethod
+    def export_archived_orders_to_csv(self, label: str) -> str:
+        """Export an archived campaign's orders and their reviews to CSV format"""
+
+    # Event journal, appended to by every vote, order, design change and
+    # archive in the same transaction, and never changed afterwards
+    @abstractmethod
+    def get_events(self, after: int = 0, limit: int = 10000) -> List[Event]:
+        """Up to `limit` events with seq greater than `after`, in seq order"""
+
+    @abstractmethod
+    def get_last_event_seq(self) -> int:
+        """seq of the newest event, 0 when the journal is empty"""
+
+    @abstractmethod
+    def get_checkpoint(self) -> Optional[Tuple[int, bytes]]:
+        """(seq, state) of the latest replay checkpoint, None if there is none"""
+
+    @abstractmethod
+    def save_checkpoint(self, seq: int, state: bytes):
+        """Store replay state covering the events up to `seq`, replacing older checkpoints"""
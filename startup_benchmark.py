@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark
+
+Starts `python bot.py` in a fresh process against a FakeTelegramServer
+(see fake_telegram.py) with a /vote already waiting, as after a redeploy
+or crash-restart, and times from process start until:
+
+    port          the health check port accepts connections
+    ready         GET / answers 200, the bot is serving updates
+    first reply   the waiting /vote was answered
+
+plus the bot's own breakdown from /metrics: imports, storage (opening the
+database and its schema work), build (Application and handlers) and
+connect (getMe, deleteWebhook and starting the application).
+
+Every run gets a fresh working directory; --users pre-fills its database
+so storage time reflects a campaign in progress.
+
+Usage:
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 10 --latency 0.1 --users 20000
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Optional
+
+from config import DATABASE_NAME
+from database import Database
+from fake_telegram import FakeBotApi, FakeTelegramServer
+from loadtest import UpdateFactory, seed_designs
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+USER_ID = 424242
+STEPS = ['port', 'ready', 'first reply', 'imports', 'storage', 'build', 'connect']
+
+
+class WatchedBotApi(FakeBotApi):
+    """FakeBotApi noting when the first message reaches USER_ID"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.first_reply = threading.Event()
+        self.first_reply_at: Optional[float] = None
+
+    def handle(self, method: str, params: Dict[str, Any]):
+        result = super().handle(method, params)
+        if method.lower().startswith('send') and str(params.get('chat_id')) == str(USER_ID):
+            if not self.first_reply.is_set():
+                self.first_reply_at = time.perf_counter()
+                self.first_reply.set()
+        return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def http_get(url: str) -> Optional[int]:
+    """Status code of GET url, None when nothing is listening"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def seed(path: str, designs: int, users: int):
+    db = Database(path)
+    design_ids = seed_designs(db, designs)
+    for user_id in range(1, users + 1):
+        db.save_vote(user_id, design_ids[user_id % len(design_ids)])
+
+
+def run_once(args, workdir: str) -> Dict[str, float]:
+    api = WatchedBotApi(latency=args.latency)
+    server = FakeTelegramServer(api)
+    server.start_background()
+    api.push_update(UpdateFactory().command(USER_ID, 'vote'))
+
+    port = free_port()
+    env = dict(
+        os.environ, PORT=str(port), BOT_API_URL=server.base_url,
+        BACKUP_INTERVAL_SECONDS='0', LOG_LEVEL='WARNING'
+    )
+    health_url = f'http://127.0.0.1:{port}'
+    times: Dict[str, float] = {}
+    with open(os.path.join(workdir, 'bot.log'), 'wb') as log:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, BOT_PATH], cwd=workdir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        try:
+            deadline = started + args.timeout
+            while time.perf_counter() < deadline and process.poll() is None:
+                status = http_get(health_url)
+                now = time.perf_counter() - started
+                if status is not None:
+                    times.setdefault('port', now)
+                if status == 200:
+                    times.setdefault('ready', now)
+                if api.first_reply.is_set():
+                    times.setdefault('first reply', api.first_reply_at - started)
+                if 'ready' in times and 'first reply' in times:
+                    break
+                time.sleep(0.002)
+            if 'ready' in times:
+                with urllib.request.urlopen(f'{health_url}/metrics', timeout=1) as response:
+                    startup = json.load(response).get('startup', {})
+                times.update({step: startup[step] for step in STEPS[3:] if step in startup})
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+            server.shutdown()
+            server.server_close()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time bot cold starts against a fake Bot API')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='simulated Bot API latency in seconds')
+    parser.add_argument('--designs', type=int, default=4, help='active designs in the database')
+    parser.add_argument('--users', type=int, default=0, help='users who already voted')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds to wait for each start')
+    args = parser.parse_args()
+
+    results = []
+    for number in range(1, args.runs + 1):
+        with tempfile.TemporaryDirectory() as workdir:
+            seed(os.path.join(workdir, DATABASE_NAME), args.designs, args.users)
+            times = run_once(args, workdir)
+            if 'first reply' not in times:
+                print(f"❌ Run {number}: no reply within {args.timeout:.0f}s, bot log:")
+                with open(os.path.join(workdir, 'bot.log'), errors='replace') as log:
+                    print(log.read()[-2000:])
+                sys.exit(1)
+        results.append(times)
+        print(f"Run {number}: " + ", ".join(f"{step} {times[step] * 1000:.0f}ms"
+                                             for step in STEPS if step in times))
+
+    print(f"\n{'Step':<14} {'median ms':>10} {'max ms':>10}")
+    for step in STEPS:
+        values = [times[step] for times in results if step in times]
+        if values:
+            print(f"{step:<14} {statistics.median(values) * 1000:>10.1f} {max(values) * 1000:>10.1f}")
+    print(f"\n✅ {args.runs} cold starts answered the waiting update "
+          f"(median {statistics.median(times['first reply'] for times in results) * 1000:.0f}ms)")
+
+
+if __name__ == '__main__':
+    main()
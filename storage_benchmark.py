@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Storage backend benchmark
+
+Replays one synthetic workload (the operation mix from
+storage_conformance.random_operations: lookups, votes, orders, results,
+exports and the occasional archive) against each Repository
+implementation and reports throughput plus per-operation latency
+percentiles. Every backend gets exactly the same operations in the same
+order.
+
+Usage:
+    python storage_benchmark.py
+    python storage_benchmark.py --ops 200000 --users 50000 --backends memory
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from storage_conformance import BACKENDS, random_operations
+
+
+def run(db, operations) -> Dict[str, List[float]]:
+    """Execute operations, returning latencies in seconds per method"""
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    for method, args in operations:
+        call = getattr(db, method)
+        started = time.perf_counter()
+        call(*args)
+        latencies[method].append(time.perf_counter() - started)
+    return latencies
+
+
+def percentiles(values: List[float]) -> List[float]:
+    """p50, p95 and p99 in microseconds"""
+    if len(values) == 1:
+        return [values[0] * 1e6] * 3
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return [cuts[49] * 1e6, cuts[94] * 1e6, cuts[98] * 1e6]
+
+
+def report(backend: str, latencies: Dict[str, List[float]], elapsed: float):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n📊 {backend}: {total} operations in {elapsed:.2f}s ({total / elapsed:,.0f} ops/s)")
+    print(f"{'operation':<24}{'count':>8}{'p50 µs':>10}{'p95 µs':>10}{'p99 µs':>10}{'total s':>9}")
+    for method in sorted(latencies, key=lambda m: -sum(latencies[m])):
+        values = latencies[method]
+        p50, p95, p99 = percentiles(values)
+        print(f"{method:<24}{len(values):>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{sum(values):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare storage backends under one workload')
+    parser.add_argument('--ops', type=int, default=50_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--campaigns', type=int, default=3)
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    operations = list(random_operations(args.seed, args.ops, args.users, args.campaigns))
+    throughput = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            db = BACKENDS[backend](tmp)
+            started = time.perf_counter()
+            latencies = run(db, operations)
+            elapsed = time.perf_counter() - started
+            throughput[backend] = len(operations) / elapsed
+            report(backend, latencies, elapsed)
+            if db.db_name:
+                print(f"💾 Database file: {os.path.getsize(db.db_name) / 1024:,.0f} KB")
+
+    if len(throughput) > 1:
+        slowest = min(throughput.values())
+        print("\n🏁 " + ", ".join(f"{backend} {ops / slowest:.1f}x"
+                                  for backend, ops in sorted(throughput.items(), key=lambda item: -item[1])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,654 @@
+#!/usr/bin/env python3
+"""
+Conformance checks for the storage backends
+
+Runs the same scenarios against every Repository implementation
+(database.Database on a temporary file and memory_database.MemoryDatabase)
+and checks the results against what the bot relies on. A randomized
+sequence of operations is then replayed on all backends and every
+observable result is compared between them. Exits with status 1 on any
+mismatch.
+
+Usage:
+    python storage_conformance.py
+    python storage_conformance.py --ops 20000 --seed 7
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+from dataclasses import FrozenInstanceError, asdict, replace
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+import journal
+from config import DEFAULT_CAMPAIGN_CODE, SHIRT_SIZES
+from database import Database
+from membership import IdSet, MembershipIndex
+from memory_database import MemoryDatabase
+from models import Order
+from repository import (
+    DEFAULT_CAMPAIGN_ID, EVENT_ARCHIVED, EVENT_DESIGN_ADDED, EVENT_DESIGN_CHANGED, EVENT_ORDER,
+    EVENT_ORDER_REVIEWED, EVENT_VOTE, REVIEW_APPROVED, REVIEW_REJECTED, Repository
+)
+
+BACKENDS: Dict[str, Callable[[str], Repository]] = {
+    'sqlite': lambda tmp: Database(os.path.join(tmp, f'conformance-{random.random()}.db')),
+    'memory': lambda tmp: MemoryDatabase(),
+}
+
+
+class Checker:
+    """Collects failed expectations instead of stopping at the first one"""
+
+    def __init__(self, backend: str, scenario: str):
+        self.prefix = f"{backend}/{scenario}"
+        self.failures: List[str] = []
+
+    def equal(self, actual: Any, expected: Any, what: str):
+        if actual != expected:
+            self.failures.append(f"{self.prefix}: {what}: got {actual!r}, expected {expected!r}")
+
+    def raises(self, exception: type, call: Callable[[], Any], what: str):
+        try:
+            call()
+        except exception:
+            return
+        except Exception as e:
+            self.failures.append(f"{self.prefix}: {what}: raised {e!r}, expected {exception.__name__}")
+            return
+        self.failures.append(f"{self.prefix}: {what}: did not raise {exception.__name__}")
+
+
+def _order(telegram_id: int, campaign_id: int = DEFAULT_CAMPAIGN_ID, minute: int = 0) -> Order:
+    return Order(
+        telegram_id=telegram_id,
+        full_name=f'User {telegram_id}',
+        shirt_number=telegram_id % 100,
+        shirt_name=f'U{telegram_id}',
+        size='M',
+        receipt_file_id=f'receipt-{telegram_id}',
+        payment_time=datetime(2024, 5, 1, 12, 0) + timedelta(minutes=minute),
+        campaign_id=campaign_id,
+        receipt_file_unique_id=f'unique-{telegram_id}'
+    )
+
+
+def _csv(text: str) -> List[List[str]]:
+    return list(csv.reader(io.StringIO(text)))
+
+
+# ==================== SCENARIOS ====================
+
+def scenario_campaigns(db: Repository, check: Checker):
+    default = db.get_campaign(DEFAULT_CAMPAIGN_ID)
+    check.equal(default.code, DEFAULT_CAMPAIGN_CODE, "default campaign code")
+    check.equal(db.get_user_campaign(1), DEFAULT_CAMPAIGN_ID, "unknown user's campaign")
+
+    team = db.create_campaign('team', 'Team')
+    check.equal(team, DEFAULT_CAMPAIGN_ID + 1, "second campaign id")
+    check.equal(db.get_campaign_by_code('team').name, 'Team', "campaign by code")
+    check.equal(db.get_campaign_by_code('nope'), None, "unknown code")
+    check.equal([c.code for c in db.get_campaigns()], [DEFAULT_CAMPAIGN_CODE, 'team'], "campaign list")
+    check.raises(ValueError, lambda: db.create_campaign('team', 'Again'), "duplicate code")
+
+    db.join_campaign(1, team)
+    check.equal(db.get_user_campaign(1), team, "joined campaign")
+    check.equal(db.get_user(1, team).campaign_id, team, "user row created by join")
+    db.create_user(1)
+    check.equal(db.get_user_campaign(1), team, "create_user keeps the campaign")
+
+
+def scenario_deadlines(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    deadline = datetime(2030, 6, 1, 18, 30, 45)
+    db.set_vote_deadline(deadline, team)
+    db.set_payment_deadline(deadline + timedelta(days=7), team)
+    deadlines = db.get_deadlines(team)
+    check.equal(deadlines.vote_deadline, datetime(2030, 6, 1, 18, 30), "vote deadline, minute precision")
+    check.equal(deadlines.payment_deadline, datetime(2030, 6, 8, 18, 30), "payment deadline")
+    check.equal(db.get_deadlines().vote_deadline > datetime.now(), True, "default campaign untouched")
+
+
+def scenario_votes(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    check.equal(db.get_user(5), None, "unknown user")
+    db.create_user(5)
+    user = db.get_user(5)
+    check.equal((user.has_voted, user.vote_choice, user.has_ordered), (False, None, False), "fresh user")
+
+    db.save_vote(5, 42)
+    check.equal(db.has_user_voted(5), True, "voted in default campaign")
+    check.equal(db.has_user_voted(5, team), False, "not voted in other campaign")
+    check.equal(db.get_user(5).vote_choice, '42', "vote choice is a string")
+    db.save_vote(5, 43)
+    check.equal(db.get_user(5).vote_choice, '43', "revote replaces")
+
+
+def scenario_orders(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    db.create_user(7)
+    db.save_order(_order(7, minute=1))
+    db.save_order(_order(8, minute=5))
+    # Saved before orders kept their receipt's unique ID
+    db.save_order(replace(_order(9, minute=5), receipt_file_unique_id=None))
+    db.save_order(_order(7, team, minute=3))
+    check.equal(db.has_user_ordered(7), True, "ordered in default campaign")
+    check.equal(db.get_user(7).has_ordered, True, "user shows the order")
+    check.equal(db.has_user_ordered(8, team), False, "not ordered in other campaign")
+    check.equal(db.get_total_orders(), 3, "orders in default campaign")
+    check.equal(db.get_total_orders(team), 1, "orders in team campaign")
+
+    rows = _csv(db.export_orders_to_csv())
+    check.equal(rows[0], ['Telegram ID', 'Full Name', 'Shirt Number', 'Shirt Name', 'Size', 'Payment Time'],
+                "CSV header")
+    check.equal([row[0] for row in rows[1:]], ['9', '8', '7'], "newest payment first, ties newest first")
+    check.equal(rows[3][5], '2024-05-01 12:01', "payment time format")
+
+    receipts = db.get_receipts()
+    check.equal([row[1:] for row in receipts], [(7, 'U7', 'receipt-7', 'unique-7'), (8, 'U8', 'receipt-8', 'unique-8'),
+                                                (9, 'U9', 'receipt-9', None)],
+                "receipts, oldest payment first, ties oldest first")
+    check.equal(sorted(row[0] for row in receipts) == [row[0] for row in receipts], True, "receipt order ids")
+    check.equal([row[3] for row in db.get_receipts(team)], ['receipt-7'], "receipts per campaign")
+
+
+def scenario_designs(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    first = db.add_design('First', 'One', 'file-1', display_order=2)
+    second = db.add_design('Second', '', 'file-2', display_order=1)
+    third = db.add_design('Third', None, 'file-3', display_order=1, campaign_id=team)
+    check.equal([d.name for d in db.get_active_designs()], ['Second', 'First'], "display order")
+    check.equal([d.name for d in db.get_active_designs(team)], ['Third'], "designs per campaign")
+    check.equal(db.get_design(third).description, '', "missing description")
+    check.equal(db.get_design(third).campaign_id, team, "design campaign")
+    check.equal(db.get_design(9999), None, "unknown design")
+
+    db.update_design(first, name='Renamed', description='New')
+    design = db.get_design(first)
+    check.equal((design.name, design.description, design.image_file_id), ('Renamed', 'New', 'file-1'),
+                "partial update")
+    db.delete_design(second)
+    check.equal([d.id for d in db.get_active_designs()], [first], "soft delete hides design")
+    check.equal(db.get_design(second).is_active, False, "deleted design still readable")
+
+    design = db.get_active_designs()[0]
+    try:
+        design.name = 'Mutated'
+    except FrozenInstanceError:
+        pass
+    check.equal(db.get_design(first).name, 'Renamed', "returned designs cannot change storage")
+
+    imported = db.add_designs([('Album 1', 'From album', 'album-1'), ('Album 2', '', 'album-2')])
+    check.equal(len(imported), 2, "bulk add returns every id")
+    check.equal([d.name for d in db.get_active_designs()], ['Renamed', 'Album 1', 'Album 2'],
+                "bulk added designs come last, in album order")
+    check.equal(db.get_design(imported[0]).description, 'From album', "bulk added design")
+    check.equal(db.add_designs([], team), [], "empty bulk add")
+
+
+def scenario_results(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    a = db.add_design('A', '', 'a')
+    b = db.add_design('B', '', 'b')
+    c = db.add_design('C', '', 'c')
+    other = db.add_design('Other', '', 'o', campaign_id=team)
+    for user, design in ((1, b), (2, b), (3, a), (4, c)):
+        db.save_vote(user, design)
+    db.save_vote(4, b)  # changed their mind
+    db.save_vote(5, other, team)
+    db.delete_design(c)
+    check.equal([tuple(row) for row in db.get_vote_results()], [('B', 3), ('A', 1)], "results")
+    check.equal([tuple(row) for row in db.get_vote_results(team)], [('Other', 1)], "results per campaign")
+
+
+def scenario_archive(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    keep = db.add_design('Keep', '', 'k')
+    gone = db.add_design('Gone', '', 'g')
+    team_design = db.add_design('Team', '', 't', campaign_id=team)
+    for user in (1, 2, 3):
+        db.create_user(user)
+        db.save_vote(user, gone if user == 1 else keep)
+        db.save_order(_order(user, minute=user))
+    db.save_vote(9, team_design, team)
+    db.save_order(_order(9, team))
+    db.delete_design(gone)
+    db.set_vote_deadline(datetime(2020, 1, 1))
+    orders = {row[1]: row[0] for row in db.get_unreviewed_orders(DEFAULT_CAMPAIGN_ID)}
+    db.review_orders([(orders['User 1'], REVIEW_APPROVED), (orders['User 3'], REVIEW_REJECTED)], reviewer=42)
+
+    counts = db.archive_campaign('season-1')
+    check.equal(counts, {'votes': 3, 'orders': 3, 'designs': 1}, "archived counts")
+    check.equal((db.has_user_voted(1), db.has_user_ordered(1)), (False, False), "user reset")
+    check.equal(db.get_total_orders(), 0, "orders moved out")
+    check.equal(db.get_design(gone), None, "inactive design moved out")
+    check.equal([d.id for d in db.get_active_designs()], [keep], "active designs stay")
+    check.equal(db.get_deadlines().vote_deadline > datetime.now(), True, "deadlines reset")
+    check.equal((db.has_user_voted(9, team), db.get_total_orders(team)), (True, 1), "other campaign untouched")
+
+    archives = db.get_archived_campaigns()
+    check.equal([(a['label'], a['votes'], a['orders'], a['designs']) for a in archives],
+                [('season-1', 3, 3, 1)], "archive list")
+    archived = _csv(db.export_archived_orders_to_csv('season-1'))
+    check.equal(archived[0][-1], 'Receipt Review', "archived orders header")
+    check.equal([(row[0], row[-1]) for row in archived[1:]],
+                [('3', REVIEW_REJECTED), ('2', ''), ('1', REVIEW_APPROVED)], "archived orders keep their reviews")
+    check.equal(len(_csv(db.export_archived_orders_to_csv('nope'))), 1, "unknown archive exports a header")
+    check.raises(ValueError, lambda: db.archive_campaign('season-1'), "duplicate label")
+
+
+def scenario_final_snapshots(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    a = db.add_design('A', '', 'a')
+    b = db.add_design('B', '', 'b')
+    for user, design in ((1, b), (2, b), (3, a)):
+        db.save_vote(user, design)
+    db.save_order(_order(1, minute=1))
+    db.save_order(_order(2, minute=2))
+    deadline = datetime(2030, 1, 1, 12, 0)
+
+    check.equal([tuple(row) for row in db.freeze_results(DEFAULT_CAMPAIGN_ID, deadline)], [('B', 2), ('A', 1)],
+                "frozen results")
+    check.equal(db.freeze_orders(DEFAULT_CAMPAIGN_ID, deadline), 2, "frozen order count")
+    db.save_vote(4, a)
+    db.save_vote(5, a)
+    db.save_order(_order(3, minute=3))
+    check.equal([tuple(row) for row in db.freeze_results(DEFAULT_CAMPAIGN_ID, deadline)], [('B', 2), ('A', 1)],
+                "later votes do not change the snapshot")
+    check.equal(db.freeze_orders(DEFAULT_CAMPAIGN_ID, deadline), 2, "later orders do not change the snapshot")
+    check.equal([row[0] for row in _csv(db.export_final_orders_to_csv(DEFAULT_CAMPAIGN_ID, deadline))[1:]],
+                ['2', '1'], "frozen orders export")
+    check.equal([tuple(row) for row in db.freeze_results(DEFAULT_CAMPAIGN_ID, deadline + timedelta(days=1))],
+                [('A', 3), ('B', 2)], "a moved deadline takes a new snapshot")
+    check.equal(db.freeze_results(team, deadline), [], "campaign without designs")
+    check.equal(len(_csv(db.export_final_orders_to_csv(team, deadline))), 1, "no snapshot exports a header")
+
+    db.archive_campaign('season-1')
+    check.equal(db.freeze_orders(DEFAULT_CAMPAIGN_ID, deadline), 0, "archiving drops the snapshots")
+
+
+def _walk_pages(fetch, key, limit: int):
+    """Rows of every page forwards from the start, and backwards from past the last row"""
+    forward, cursor = [], None
+    while True:
+        page = fetch(after=cursor, limit=limit)
+        forward += page
+        if len(page) < limit:
+            break
+        cursor = key(page[-1])
+    backward = forward[-1:]
+    while backward:
+        page = fetch(before=key(backward[0]), limit=limit)
+        backward = page + backward
+        if len(page) < limit:
+            break
+    return forward, backward
+
+
+def scenario_paging(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    designs = [db.add_design(f'D{i}', '', f'd{i}') for i in range(7)]
+    imported = db.add_designs([(f'I{i}', '', f'i{i}') for i in range(3)])
+    db.add_design('Other', '', 'o', campaign_id=team)
+    db.delete_design(designs[2])
+    for user, design in enumerate([designs[5]] * 3 + [designs[1]] * 2 + [imported[0], designs[3]], 1):
+        db.save_vote(user, design)
+    listed = [d for d in designs if d != designs[2]] + imported
+
+    forward, backward = _walk_pages(partial(db.get_designs_page, DEFAULT_CAMPAIGN_ID),
+                                    lambda d: (d.display_order, d.id), 3)
+    check.equal([d.id for d in forward], listed, "designs pages, forwards")
+    check.equal([d.id for d in backward], listed, "designs pages, backwards")
+    check.equal([d.id for d in db.get_designs_page(DEFAULT_CAMPAIGN_ID, limit=2)], listed[:2], "first designs page")
+
+    results = sorted(((d, votes) for d, votes in zip(listed, [0, 2, 1, 0, 3, 0, 1, 0, 0])),
+                     key=lambda row: (-row[1], row[0]))
+    forward, backward = _walk_pages(partial(db.get_results_page, DEFAULT_CAMPAIGN_ID),
+                                    lambda row: (row[2], row[0]), 4)
+    check.equal([(row[0], row[2]) for row in forward], results, "results pages, forwards")
+    check.equal([(row[0], row[2]) for row in backward], results, "results pages, backwards")
+    check.equal(db.count_results(DEFAULT_CAMPAIGN_ID), (9, 7), "live result counts")
+    check.equal(db.count_results(team), (1, 0), "live result counts per campaign")
+
+    deadline = datetime(2030, 1, 1, 12, 0)
+    frozen = [tuple(row) for row in db.freeze_results(DEFAULT_CAMPAIGN_ID, deadline)]
+    forward, backward = _walk_pages(partial(db.get_final_results_page, DEFAULT_CAMPAIGN_ID, deadline),
+                                    lambda row: row[0], 2)
+    check.equal([row[1:] for row in forward], frozen, "final results pages, forwards")
+    check.equal([row[1:] for row in backward], frozen, "final results pages, backwards")
+    check.equal([row[0] for row in forward], list(range(1, 10)), "final results positions")
+    check.equal(db.count_results(DEFAULT_CAMPAIGN_ID, deadline), (9, 7), "final result counts")
+    check.equal(db.count_results(team, deadline), (0, 0), "no snapshot counts nothing")
+    check.equal(db.get_final_results_page(team, deadline), [], "no snapshot pages nothing")
+
+
+def scenario_reviews(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    for user in range(1, 8):
+        db.save_order(_order(user, minute=user))
+    db.save_order(_order(20, team))
+    check.equal([row[0] for row in db.get_unreviewed_orders(DEFAULT_CAMPAIGN_ID, limit=3)], [1, 2, 3],
+                "first unreviewed page")
+    check.equal(db.get_unreviewed_orders(DEFAULT_CAMPAIGN_ID, after=6)[0],
+                (7, 'User 7', 7, 'U7', 'M', 'receipt-7'), "unreviewed row")
+    check.equal(db.count_unreviewed_orders(DEFAULT_CAMPAIGN_ID), 7, "all unreviewed")
+
+    reviewed = db.review_orders([(1, REVIEW_APPROVED), (2, REVIEW_REJECTED), (8, REVIEW_APPROVED),
+                                 (3, REVIEW_APPROVED), (3, REVIEW_REJECTED), (99, REVIEW_APPROVED)], reviewer=42)
+    check.equal(reviewed, [1, 2, 8, 3], "reviewed orders, first decision per order, unknown ignored")
+    check.equal(db.review_orders([(1, REVIEW_REJECTED)], reviewer=43), [], "reviewed orders stay reviewed")
+    check.equal(db.review_orders([], reviewer=42), [], "no decisions")
+    check.raises(ValueError, lambda: db.review_orders([(4, 'maybe')], reviewer=42), "unknown status")
+    check.equal([row[0] for row in db.get_unreviewed_orders(DEFAULT_CAMPAIGN_ID, limit=3)], [4, 5, 6],
+                "reviewed orders leave the queue")
+    check.equal(db.get_unreviewed_orders(DEFAULT_CAMPAIGN_ID, after=4, limit=10)[-1][0], 7, "page after a cursor")
+    check.equal((db.count_unreviewed_orders(DEFAULT_CAMPAIGN_ID), db.count_unreviewed_orders(team)), (4, 0),
+                "unreviewed counts per campaign")
+    reviews = [event[1:6] for event in db.get_events() if event[2] == EVENT_ORDER_REVIEWED]
+    check.equal(reviews[-2:], [(team, EVENT_ORDER_REVIEWED, 42, 8, REVIEW_APPROVED),
+                               (DEFAULT_CAMPAIGN_ID, EVENT_ORDER_REVIEWED, 42, 3, REVIEW_APPROVED)],
+                "reviews are journaled")
+
+
+def scenario_membership(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    check.equal(db.get_last_event_seq(), 0, "empty journal")
+    for user in (30, 10, 20):
+        db.save_vote(user, 1)
+    db.save_vote(10, 2)
+    db.save_vote(40, 1, team)
+    for user in (20, 5, 20):
+        db.save_order(_order(user))
+    check.equal(db.get_voter_ids(DEFAULT_CAMPAIGN_ID), [10, 20, 30], "voters ascending")
+    check.equal(db.get_orderer_ids(DEFAULT_CAMPAIGN_ID), [5, 20], "orderers ascending, each once")
+    check.equal((db.get_voter_ids(team), db.get_orderer_ids(team)), ([40], []), "per campaign")
+    check.equal(db.get_last_event_seq(), 8, "newest event")
+
+    index = MembershipIndex(db, batch=2)
+    index.load()
+    check.equal((index.has_voted(10, DEFAULT_CAMPAIGN_ID), index.has_voted(40, DEFAULT_CAMPAIGN_ID),
+                 index.has_voted(40, team), index.has_ordered(5, DEFAULT_CAMPAIGN_ID),
+                 index.has_ordered(5, team), index.has_voted(1, 99)),
+                (True, False, True, True, False, False), "loaded index")
+    db.save_vote(50, 1)
+    db.archive_campaign('membership', team)
+    db.save_vote(41, 1, team)
+    check.equal(index.has_voted(50, DEFAULT_CAMPAIGN_ID), False, "writes elsewhere wait for sync")
+    check.equal(index.sync(), 3, "synced events")
+    check.equal((index.has_voted(50, DEFAULT_CAMPAIGN_ID), index.has_voted(40, team), index.has_voted(41, team)),
+                (True, False, True), "synced votes and archive")
+    index.add_order(60, DEFAULT_CAMPAIGN_ID)
+    check.equal(index.has_ordered(60, DEFAULT_CAMPAIGN_ID), True, "own writes show at once")
+    check.equal(index.stats()['voters'], 5, "voters held")
+
+    ids = IdSet([3, 1, 3])
+    for telegram_id in range(2, 3000, 2):
+        ids.add(telegram_id)
+    check.equal((len(ids), 1 in ids, 2998 in ids, 2999 in ids, 0 in ids), (1501, True, True, False, False),
+                "IdSet across merges")
+
+
+def _replayed(aggregates: journal.Aggregates, campaign_ids) -> List[Any]:
+    """What replay derived, comparable between replays"""
+    return [(aggregates.votes.get(c), aggregates.results(c), aggregates.ordered.get(c), aggregates.order_sizes(c))
+            for c in campaign_ids]
+
+
+def scenario_journal(db: Repository, check: Checker):
+    team = db.create_campaign('team', 'Team')
+    designs = [db.add_design(f'D{i}', '', f'd{i}') for i in range(3)]
+    imported = db.add_designs([('I', '', 'i')], campaign_id=team)
+    db.save_vote(1, designs[0])
+    db.save_vote(2, designs[0])
+    db.save_vote(1, designs[1])
+    db.save_vote(3, imported[0], team)
+    db.save_order(_order(1))
+    db.save_order(_order(4, team))
+    db.delete_design(designs[2])
+
+    events = db.get_events()
+    check.equal([event[2] for event in events],
+                [EVENT_DESIGN_ADDED] * 4 + [EVENT_VOTE] * 4 + [EVENT_ORDER] * 2 + [EVENT_DESIGN_CHANGED],
+                "event kinds in order")
+    check.equal([event[0] for event in events], list(range(1, 12)), "seq numbers")
+    check.equal(events[6][1:5], (DEFAULT_CAMPAIGN_ID, EVENT_VOTE, 1, designs[1]), "revote event")
+    check.equal(events[9][1:4] + events[9][5:6], (team, EVENT_ORDER, 4, 'M'), "order event")
+    check.equal(events[10][5], '{"is_active": false}', "design change event")
+    check.equal([event[0] for event in db.get_events(after=8, limit=2)], [9, 10], "events page")
+    check.equal(db.get_events(after=11), [], "no events after the last")
+
+    aggregates = journal.replay(db, checkpoint_every=5)
+    check.equal(aggregates.results(DEFAULT_CAMPAIGN_ID), {designs[0]: 1, designs[1]: 1}, "replayed tallies")
+    check.equal((aggregates.has_voted(1, DEFAULT_CAMPAIGN_ID), aggregates.has_voted(1, team)), (True, False),
+                "replayed has_voted")
+    check.equal(aggregates.has_ordered(4, team), True, "replayed has_ordered")
+    check.equal(aggregates.order_sizes(DEFAULT_CAMPAIGN_ID), {'M': 1}, "replayed sizes")
+    for campaign_id in (DEFAULT_CAMPAIGN_ID, team):
+        check.equal(journal.verify(aggregates, db, campaign_id), [], f"replay matches campaign {campaign_id}")
+    check.equal(db.get_checkpoint()[0], 11, "checkpoint at the last event")
+
+    db.save_vote(2, designs[1])
+    db.archive_campaign('season', team)
+    archived = db.get_events(after=12)[0]
+    check.equal((archived[1], archived[2], archived[5]), (team, EVENT_ARCHIVED, 'season'), "archive event")
+    resumed = journal.replay(db, checkpoint_every=0)
+    full = journal.replay(db, use_checkpoint=False, checkpoint_every=0)
+    check.equal((resumed.seq, resumed.events), (13, 13), "replay resumed from the checkpoint")
+    check.equal(_replayed(resumed, (DEFAULT_CAMPAIGN_ID, team)), _replayed(full, (DEFAULT_CAMPAIGN_ID, team)),
+                "checkpoint plus the rest equals a full replay")
+    check.equal(journal.Aggregates.loads(full.dumps()).results(DEFAULT_CAMPAIGN_ID),
+                full.results(DEFAULT_CAMPAIGN_ID), "checkpoint round trip")
+    check.equal(resumed.has_voted(3, team), False, "archive resets the campaign")
+    for campaign_id in (DEFAULT_CAMPAIGN_ID, team):
+        check.equal(journal.verify(resumed, db, campaign_id), [], f"resumed replay matches campaign {campaign_id}")
+
+
+class _FailingReads:
+    """Repository whose get_events fails on read number `fail_at`, recording where each read started"""
+
+    def __init__(self, db: Repository, fail_at: int):
+        self.db = db
+        self.fail_at = fail_at
+        self.reads: List[int] = []
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.db, name)
+
+    def get_events(self, after: int = 0, limit: int = 10000):
+        self.reads.append(after)
+        if len(self.reads) == self.fail_at:
+            raise RuntimeError("replay interrupted")
+        return self.db.get_events(after, limit)
+
+
+def scenario_journal_interrupted(db: Repository, check: Checker):
+    for user in range(1, 11):
+        db.save_vote(user, 100 + user % 3)
+    interrupted = _FailingReads(db, fail_at=4)
+    check.raises(RuntimeError, lambda: journal.replay(interrupted, batch=3, checkpoint_every=5),
+                 "replay interrupted")
+    check.equal(db.get_checkpoint()[0], 6, "checkpoint stored before the interruption")
+
+    resumed = _FailingReads(db, fail_at=0)
+    aggregates = journal.replay(resumed, batch=3, checkpoint_every=0)
+    check.equal(resumed.reads, [6, 9, 10], "next replay resumed from the intermediate checkpoint")
+    check.equal(_replayed(aggregates, (DEFAULT_CAMPAIGN_ID,)),
+                _replayed(journal.replay(db, use_checkpoint=False, checkpoint_every=0), (DEFAULT_CAMPAIGN_ID,)),
+                "resumed replay equals a full replay")
+
+
+SCENARIOS = [
+    scenario_campaigns,
+    scenario_deadlines,
+    scenario_votes,
+    scenario_orders,
+    scenario_designs,
+    scenario_results,
+    scenario_archive,
+    scenario_final_snapshots,
+    scenario_paging,
+    scenario_journal,
+    scenario_journal_interrupted,
+    scenario_reviews,
+    scenario_membership,
+]
+
+
+# ==================== DIFFERENTIAL RUN ====================
+
+def _observe(value: Any) -> Any:
+    """Make a result comparable between backends"""
+    if isinstance(value, list):
+        return [_observe(item) for item in value]
+    if hasattr(value, '__dataclass_fields__'):
+        # created_at comes from each engine's own clock
+        return {k: v for k, v in asdict(value).items() if k != 'created_at'}
+    if hasattr(value, 'keys'):
+        return {k: value[k] for k in value.keys() if k != 'archived_at'}
+    return value
+
+
+def random_operations(seed: int, count: int, users: int = 200, campaigns: int = 3):
+    """Yield (method name, args) with a mix similar to the bot's traffic"""
+    rng = random.Random(seed)
+    for campaign_id in range(DEFAULT_CAMPAIGN_ID + 1, campaigns + 1):
+        yield 'create_campaign', (f'team-{campaign_id}', f'Team {campaign_id}')
+    for campaign_id in range(1, campaigns + 1):
+        for i in range(4):
+            yield 'add_design', (f'Design {campaign_id}-{i}', '', f'file-{campaign_id}-{i}', rng.randint(0, 3),
+                                 campaign_id)
+    designs = campaigns * 4
+    for number in range(count):
+        user = rng.randint(1, users)
+        campaign_id = rng.randint(1, campaigns)
+        kind = rng.random()
+        if kind < 0.25:
+            yield 'get_user', (user, campaign_id)
+        elif kind < 0.35:
+            yield 'save_vote', (user, rng.randint(1, designs), campaign_id)
+        elif kind < 0.45:
+            yield 'has_user_voted', (user, campaign_id)
+        elif kind < 0.55:
+            yield 'has_user_ordered', (user, campaign_id)
+        elif kind < 0.62:
+            yield 'save_order', (Order(
+                telegram_id=user, full_name=f'User {user}', shirt_number=rng.randint(0, 999),
+                shirt_name=f'U{user}', size=rng.choice(SHIRT_SIZES), receipt_file_id=f'r-{number}',
+                payment_time=datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 500)),
+                campaign_id=campaign_id
+            ),)
+        elif kind < 0.68:
+            yield 'create_user', (user, campaign_id)
+        elif kind < 0.72:
+            yield 'join_campaign', (user, campaign_id)
+        elif kind < 0.76:
+            yield 'get_user_campaign', (user,)
+        elif kind < 0.82:
+            yield 'get_active_designs', (campaign_id,)
+        elif kind < 0.86:
+            yield 'get_vote_results', (campaign_id,)
+        elif kind < 0.88:
+            yield 'update_design', (rng.randint(1, designs), None, None, None, rng.random() < 0.7)
+        elif kind < 0.90:
+            yield 'get_total_orders', (campaign_id,)
+        elif kind < 0.92:
+            yield 'export_orders_to_csv', (campaign_id,)
+        elif kind < 0.94:
+            yield 'get_deadlines', (campaign_id,)
+        elif kind < 0.96:
+            yield 'set_vote_deadline', (datetime(2030, 1, 1) + timedelta(minutes=number), campaign_id)
+        elif kind < 0.97:
+            yield 'review_orders', ([(rng.randint(1, number // 10 + 1), rng.choice([REVIEW_APPROVED, REVIEW_REJECTED]))
+                                     for _ in range(rng.randint(1, 10))], user)
+        elif kind < 0.98:
+            yield 'get_unreviewed_orders', (campaign_id, rng.randint(0, number // 10), rng.randint(1, 10))
+        elif kind < 0.998:
+            yield 'get_design', (rng.randint(1, designs),)
+        else:
+            yield 'archive_campaign', (f'archive-{number}', campaign_id)
+    yield 'get_archived_campaigns', ()
+
+
+def differential(backends: Dict[str, Repository], seed: int, count: int) -> List[str]:
+    failures = []
+    indexes = {name: MembershipIndex(db) for name, db in backends.items()}
+    for index in indexes.values():
+        index.load()
+    for step, (method, args) in enumerate(random_operations(seed, count)):
+        results = {}
+        for name, db in backends.items():
+            try:
+                result = getattr(db, method)(*args)
+                if method == 'get_vote_results':
+                    # Equal counts may come out in any order
+                    result = sorted((tuple(row) for row in result), key=lambda row: (-row[1], row[0]))
+                result = _observe(result)
+            except Exception as e:
+                result = f'raised {type(e).__name__}'
+            results[name] = result
+        if len({repr(result) for result in results.values()}) > 1:
+            failures.append(f"step {step} {method}{args!r}: " +
+                            ', '.join(f"{name}={result!r}" for name, result in results.items()))
+            if len(failures) >= 10:
+                break
+    # Same writes, same journal; `at` comes from each engine's clock
+    journals = {name: [event[:6] for event in db.get_events(limit=count * 2)] for name, db in backends.items()}
+    if len({repr(events) for events in journals.values()}) > 1:
+        failures.append("journals differ: " + ', '.join(f"{name}={len(events)} events"
+                                                        for name, events in journals.items()))
+    # An index synced from the journal and a freshly loaded one agree with the tables
+    for name, db in backends.items():
+        loaded = MembershipIndex(db)
+        loaded.load()
+        indexes[name].sync()
+        for index, how in ((indexes[name], 'synced'), (loaded, 'loaded')):
+            wrong = [
+                (user, campaign_id) for user in range(1, 201) for campaign_id in range(1, 4)
+                if (index.has_voted(user, campaign_id), index.has_ordered(user, campaign_id))
+                != (db.has_user_voted(user, campaign_id), db.has_user_ordered(user, campaign_id))
+            ]
+            if wrong:
+                failures.append(f"{name} {how} membership differs for (user, campaign) {wrong[:5]}")
+    for name, db in backends.items():
+        aggregates = journal.replay(db)
+        for campaign_id in range(1, 4):
+            failures.extend(f"{name} replay: {problem}" for problem in journal.verify(aggregates, db, campaign_id))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ops', type=int, default=5000, help='operations in the differential run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, factory in BACKENDS.items():
+            for scenario in SCENARIOS:
+                check = Checker(backend, scenario.__name__.replace('scenario_', ''))
+                scenario(factory(tmp), check)
+                failures.extend(check.failures)
+                print(f"{'❌' if check.failures else '✅'} {check.prefix}")
+
+        differences = differential({name: factory(tmp) for name, factory in BACKENDS.items()},
+                                   args.seed, args.ops)
+        print(f"{'❌' if differences else '✅'} differential run, {args.ops} operations")
+        failures.extend(differences)
+
+    for failure in failures:
+        print(f"   {failure}")
+    if failures:
+        print(f"\n❌ {len(failures)} conformance failure(s)")
+        sys.exit(1)
+    print(f"\n✅ All backends conform ({', '.join(BACKENDS)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Stress check for concurrent update processing
+
+Many users burst their whole session into the update queue at once
+(/start, /vote, vote button, /order and every conversation step, without
+waiting for replies), interleaved with each other, while Bot API calls
+take a random amount of time. With concurrent processing enabled this is
+exactly where one user's messages could overtake each other.
+
+Users are spread over several campaigns, joining theirs with a
+`/start CODE` deep link. Afterwards every user must have been processed
+in send order, have exactly one vote and one order in their own campaign
+matching what they typed, and have no leftover conversation data. Exits
+with status 1 otherwise.
+
+Usage:
+    python stress_conversations.py --users 500 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import csv
+import io
+import random
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+import bot
+from config import MAX_CONCURRENT_UPDATES, SHIRT_SIZES
+from database import Database
+from memory_database import MemoryDatabase
+from repository import Repository
+from fake_telegram import FakeBotApi
+from loadtest import LoadTest, UpdateFactory, fake_api_builder, seed_designs
+
+
+def session(factory: UpdateFactory, user_id: int, campaign: Tuple[int, str], design_id: int,
+            rng: random.Random):
+    """Return one user's updates and the vote/order they should produce"""
+    expected = {
+        'campaign_id': campaign[0],
+        'vote_choice': str(design_id),
+        'full_name': f'Stress User {user_id}',
+        'shirt_number': rng.randint(0, 999),
+        'shirt_name': f'S{user_id}'[:15],
+        'size': rng.choice(SHIRT_SIZES),
+    }
+    updates = [
+        factory.command(user_id, 'start', campaign[1]),
+        factory.command(user_id, 'vote'),
+        factory.callback(user_id, f'vote_{design_id}'),
+        factory.command(user_id, 'order'),
+        factory.text(user_id, expected['full_name']),
+        factory.text(user_id, str(expected['shirt_number'])),
+        factory.text(user_id, expected['shirt_name']),
+        factory.callback(user_id, f"size_{expected['size']}"),
+        factory.photo(user_id),
+    ]
+    return updates, expected
+
+
+def orders_by_user(db: Repository, campaign_ids) -> Dict[int, List[dict]]:
+    """Every campaign's orders, read back through the CSV export"""
+    orders = defaultdict(list)
+    for campaign_id in campaign_ids:
+        for row in csv.DictReader(io.StringIO(db.export_orders_to_csv(campaign_id))):
+            orders[int(row['Telegram ID'])].append({
+                'campaign_id': campaign_id,
+                'full_name': row['Full Name'],
+                'shirt_number': int(row['Shirt Number']),
+                'shirt_name': row['Shirt Name'],
+                'size': row['Size'],
+            })
+    return orders
+
+
+def verify(db: Repository, expected: Dict[int, dict], processed: Dict[int, List[int]],
+           sent: Dict[int, List[int]]) -> List[str]:
+    problems = []
+    orders = orders_by_user(db, {want['campaign_id'] for want in expected.values()})
+    for user_id, want in expected.items():
+        if processed[user_id] != sent[user_id]:
+            problems.append(f"user {user_id}: processed {processed[user_id]}, sent {sent[user_id]}")
+
+        user = db.get_user(user_id, want['campaign_id'])
+        if not user or user.campaign_id != want['campaign_id']:
+            problems.append(f"user {user_id}: in campaign {user and user.campaign_id}, "
+                            f"expected {want['campaign_id']}")
+        if not user or not user.has_voted or user.vote_choice != want['vote_choice']:
+            problems.append(f"user {user_id}: vote {user and user.vote_choice!r}, "
+                            f"expected {want['vote_choice']!r}")
+
+        got = orders[user_id]
+        want_order = {key: want[key] for key in ('campaign_id', 'full_name', 'shirt_number', 'shirt_name', 'size')}
+        if got != [want_order]:
+            problems.append(f"user {user_id}: orders {got}, expected [{want_order}]")
+
+        if user_id in bot.user_data_cache:
+            problems.append(f"user {user_id}: conversation data left behind")
+    return problems
+
+
+async def run(args) -> List[str]:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.storage == 'memory':
+            bot.db = MemoryDatabase()
+        else:
+            bot.db = Database(os.path.join(tmp, 'stress.db'))
+        campaigns = {}
+        for number in range(1, args.campaigns + 1):
+            code = f'team-{number}'
+            campaign_id = bot.db.create_campaign(code, f'Team {number}')
+            campaigns[(campaign_id, code)] = seed_designs(bot.db, 4, campaign_id)
+
+        api = FakeBotApi(latency=args.latency, jitter=args.jitter, seed=args.seed)
+        builder, _ = fake_api_builder(api)
+        application = bot.build_application(builder, args.concurrency)
+        # Every update must be processed here, so disable load shedding
+        application.update_processor.queue_limits = {}
+        load = LoadTest(application, think_time=0, seed=args.seed)
+
+        processed: Dict[int, List[int]] = defaultdict(list)
+
+        async def track(update: Update, context):
+            processed[update.effective_user.id].append(update.update_id)
+
+        application.add_handler(TypeHandler(Update, track), group=-999)
+
+        factory = UpdateFactory()
+        sessions = {}
+        expected = {}
+        for user_id in range(1_000_001, 1_000_001 + args.users):
+            campaign = rng.choice(list(campaigns))
+            updates, expected[user_id] = session(factory, user_id, campaign, rng.choice(campaigns[campaign]), rng)
+            sessions[user_id] = updates
+        sent = {user_id: [u['update_id'] for u in updates] for user_id, updates in sessions.items()}
+
+        # Interleave users randomly while keeping each user's own order
+        cursors = {user_id: 0 for user_id in sessions}
+        async with application:
+            await application.start()
+            while cursors:
+                user_id = rng.choice(list(cursors))
+                await load.dispatch('stress', sessions[user_id][cursors[user_id]])
+                cursors[user_id] += 1
+                if cursors[user_id] == len(sessions[user_id]):
+                    del cursors[user_id]
+            await asyncio.gather(*(sample.done.wait() for sample in load.samples))
+            await application.stop()
+
+        return verify(bot.db, expected, processed, sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check per-user ordering under concurrent processing')
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=max(MAX_CONCURRENT_UPDATES, 2))
+    parser.add_argument('--campaigns', type=int, default=3)
+    parser.add_argument('--storage', choices=('sqlite', 'memory'), default='sqlite')
+    parser.add_argument('--latency', type=float, default=0.001)
+    parser.add_argument('--jitter', type=float, default=0.02,
+                        help='random extra Bot API latency that shuffles completion order')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    problems = asyncio.run(run(args))
+    for problem in problems[:20]:
+        print(f"❌ {problem}")
+    if problems:
+        print(f"\n❌ {len(problems)} problem(s) with {args.users} users "
+              f"at concurrency {args.concurrency}")
+        sys.exit(1)
+    print(f"✅ {args.users} concurrent sessions processed in order with consistent state "
+          f"(concurrency {args.concurrency})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Concurrent update processing for the bot
+
+PerUserUpdateProcessor lets the Application handle updates from different
+users in parallel while the updates of any single user run strictly one
+after another, in the order they arrived. That keeps ConversationHandler
+state and user_data_cache consistent: a user's NAME, SHIRT_NUMBER, ...
+replies can never overtake each other.
+
+PriorityUpdateProcessor adds priority classes on top: when every
+processing slot is busy, waiting admin updates are started first, then
+updates of in-progress conversations, then new requests. The lower
+classes have bounded queues; an update arriving at a full queue is shed
+through `shed_callback` (the bot replies "busy, retry shortly") instead
+of growing an unbounded backlog.
+
+BaseUpdateProcessor.process_update is final and takes its own semaphore
+before do_process_update runs, i.e. before the per-user lock. It is given
+a limit nothing reaches, and the configured cap is applied in
+do_process_update, after the lock.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Priority classes, most urgent first
+PRIORITY_ADMIN = 0
+PRIORITY_CONVERSATION = 1
+PRIORITY_NEW = 2
+PRIORITY_NAMES = {
+    PRIORITY_ADMIN: 'admin',
+    PRIORITY_CONVERSATION: 'conversation',
+    PRIORITY_NEW: 'new',
+}
+
+# Limit handed to BaseUpdateProcessor, see above
+_UNCAPPED = 2 ** 30
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently, serialized per user"""
+
+    def __init__(self, max_concurrent_updates: int):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(_UNCAPPED)
+        self.concurrency_limit = max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._holders: Dict[int, int] = {}
+
+    @staticmethod
+    def serialization_key(update: object) -> Optional[int]:
+        """Updates sharing a key are processed in arrival order"""
+        if isinstance(update, Update):
+            # Covers the (chat, user) key ConversationHandler uses by default
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+
+    def _slot(self, update: object):
+        """Async context manager holding one processing slot"""
+        return self._slots
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # The per-user lock is taken *before* a concurrency slot, so one user
+        # flooding the bot queues behind their own lock instead of holding
+        # every slot. asyncio.Lock wakes waiters in FIFO order, which keeps a
+        # user's updates in the order the Application started them.
+        key = self.serialization_key(update)
+        if key is None:
+            async with self._slot(update):
+                await coroutine
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._slot(update):
+                    await coroutine
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                del self._holders[key]
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def active_users(self) -> int:
+        """Number of users with updates in flight or waiting"""
+        return len(self._locks)
+
+
+class PriorityUpdateProcessor(PerUserUpdateProcessor):
+    """Per-user ordered processing with priority classes and load shedding"""
+
+    def __init__(
+        self,
+        max_concurrent_updates: int,
+        classify: Callable[[object], int],
+        queue_limits: Dict[int, int],
+        shed_callback: Optional[Callable[[object], Awaitable[Any]]] = None,
+    ):
+        super().__init__(max_concurrent_updates)
+        self.classify = classify
+        self.queue_limits = queue_limits  # classes missing here are unbounded
+        self.shed_callback = shed_callback
+
+        self._running = 0
+        self._waiters: Dict[int, Deque[asyncio.Future]] = {p: deque() for p in PRIORITY_NAMES}
+        self._priorities: Dict[int, int] = {}
+        self.queued = {p: 0 for p in PRIORITY_NAMES}
+        self.processed = {p: 0 for p in PRIORITY_NAMES}
+        self.shed = {p: 0 for p in PRIORITY_NAMES}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        priority = self.classify(update)
+        limit = self.queue_limits.get(priority)
+        if limit is not None and self.queued[priority] >= limit:
+            self.shed[priority] += 1
+            coroutine.close()
+            if self.shed_callback:
+                await self.shed_callback(update)
+            return
+
+        self.queued[priority] += 1
+        self._priorities[id(update)] = priority
+        try:
+            await super().do_process_update(update, coroutine)
+        finally:
+            if self._priorities.pop(id(update), None) is not None:
+                # Never got a slot (e.g. cancelled while waiting)
+                self.queued[priority] -= 1
+
+    @asynccontextmanager
+    async def _slot(self, update: object):
+        priority = self._priorities[id(update)]
+        await self._acquire(priority)
+        del self._priorities[id(update)]
+        self.queued[priority] -= 1
+        try:
+            yield
+        finally:
+            self.processed[priority] += 1
+            self._release()
+
+    async def _acquire(self, priority: int):
+        if self._running < self.concurrency_limit and not any(self._waiters.values()):
+            self._running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done():
+                # The slot was handed to us just before the cancellation
+                self._release()
+            else:
+                self._waiters[priority].remove(waiter)
+            raise
+
+    def _release(self):
+        # Hand the slot straight to the most urgent waiter, if any
+        for priority in sorted(self._waiters):
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self._running -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and counters per priority class"""
+        return {
+            'running': self._running,
+            'max_concurrent': self.concurrency_limit,
+            'classes': {
+                name: {
+                    'queued': self.queued[priority],
+                    'queue_limit': self.queue_limits.get(priority),
+                    'processed': self.processed[priority],
+                    'shed': self.shed[priority],
+                }
+                for priority, name in PRIORITY_NAMES.items()
+            },
+        }
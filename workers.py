@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Multi-process webhook mode
+
+One process runs every handler on one core. With WEBHOOK_WORKERS = N,
+bot.py instead starts a front process that
+
+* serves Telegram's webhook on the health check port (health.post_routes)
+  and registers it with setWebhook,
+* forwards each update, as received, to one of N worker processes over
+  the worker's stdin, framed by a 4-byte big-endian length,
+* picks the worker from the update's user id (user id % N), so a user's
+  conversation state, rate limit and in-flight updates all live in one
+  worker and keep their order.
+
+Workers run the usual application without an Updater and share the WAL
+mode SQLite file. What each keeps in memory is per process: deadlines and
+/live_results subscriptions are re-read every WORKER_SYNC_SECONDS, who
+voted and ordered follows the event journal every MEMBERSHIP_SYNC_SECONDS,
+and only worker 0 takes scheduled backups. The in-memory storage backend
+cannot be shared and is refused.
+
+The front answers Telegram once the update is written to the worker's
+pipe; a full pipe blocks the request, so a slow worker pushes back on
+Telegram instead of piling up updates. A worker that dies is restarted on
+the next update routed to it.
+
+    python workers.py --index 0     # a worker, normally started by the front
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import select
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+WORKER_PATH = os.path.abspath(__file__)
+FRAME_HEADER = struct.Struct('>I')
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def route_key(update: Mapping[str, Any]) -> int:
+    """User id of an update, like Update.effective_user, else its update_id"""
+    for value in update.values():
+        if isinstance(value, dict):
+            user = value.get('from') or value.get('user')
+            if user:
+                return user['id']
+    return update.get('update_id', 0)
+
+
+class Worker:
+    """One worker process and the pipe to its stdin"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+        self.forwarded = 0
+        self.restarts = 0
+
+    def start(self, env: Dict[str, str]):
+        ready_read, ready_write = os.pipe()
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_PATH, '--index', str(self.index), '--ready-fd', str(ready_write)],
+            stdin=subprocess.PIPE, env=env, pass_fds=(ready_write,)
+        )
+        os.close(ready_write)
+        self._ready = ready_read
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Whether the worker reported it is serving within `timeout` seconds"""
+        try:
+            readable, _, _ = select.select([self._ready], [], [], timeout)
+            return bool(readable) and os.read(self._ready, 1) == b'1'
+        finally:
+            os.close(self._ready)
+
+    def send(self, body: bytes):
+        self.process.stdin.write(FRAME_HEADER.pack(len(body)) + body)
+        self.process.stdin.flush()
+        self.forwarded += 1
+
+    def stop(self, timeout: float):
+        """Close the pipe, which tells the worker to finish up and exit"""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning("Worker %s did not exit in %ss, killing it", self.index, timeout)
+            self.process.kill()
+            self.process.wait()
+
+
+class WorkerPool:
+    """Routes webhook updates to worker processes by user"""
+
+    def __init__(self, count: int, secret: str = '', start_timeout: float = 60.0):
+        self.workers = [Worker(index) for index in range(count)]
+        self.secret = secret
+        self.start_timeout = start_timeout
+        self.rejected = 0
+        self.failed = 0
+
+    def _env(self, index: int) -> Dict[str, str]:
+        env = dict(os.environ)
+        if index > 0:
+            # One process taking scheduled backups is enough
+            env['BACKUP_INTERVAL_SECONDS'] = '0'
+        return env
+
+    def start(self) -> bool:
+        """Start every worker, True once all of them are serving"""
+        for worker in self.workers:
+            worker.start(self._env(worker.index))
+        deadline = time.monotonic() + self.start_timeout
+        return all(worker.wait_ready(max(0.0, deadline - time.monotonic())) for worker in self.workers)
+
+    def handle_webhook(self, headers: Mapping[str, str], body: bytes) -> int:
+        """health.post_routes handler: forward one update, answer with a status code"""
+        if self.secret and headers.get(SECRET_HEADER) != self.secret:
+            self.rejected += 1
+            return 403
+        try:
+            worker = self.workers[route_key(json.loads(body)) % len(self.workers)]
+        except (ValueError, TypeError, AttributeError):
+            self.rejected += 1
+            return 400
+        with worker.lock:
+            try:
+                worker.send(body)
+            except (BrokenPipeError, ValueError):
+                # Died (ValueError: its pipe was closed), start a new one
+                logger.error("Worker %s is gone (exit code %s), restarting it",
+                             worker.index, worker.process.poll())
+                worker.restarts += 1
+                worker.start(self._env(worker.index))
+                # Also closes the ready pipe, the front lives long and restarts add up
+                if not worker.wait_ready(self.start_timeout):
+                    self.failed += 1
+                    logger.error("Worker %s did not come back within %ss", worker.index, self.start_timeout)
+                    return 503
+                try:
+                    worker.send(body)
+                except OSError as e:
+                    self.failed += 1
+                    logger.error("Forwarding to worker %s failed: %s", worker.index, e)
+                    # Telegram retries the update later
+                    return 503
+        return 200
+
+    def stop(self, timeout: float = 10.0):
+        for worker in self.workers:
+            worker.stop(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': len(self.workers),
+            'alive': sum(worker.process is not None and worker.process.poll() is None for worker in self.workers),
+            'pids': [worker.process.pid if worker.process else None for worker in self.workers],
+            'forwarded': [worker.forwarded for worker in self.workers],
+            'restarts': sum(worker.restarts for worker in self.workers),
+            'rejected': self.rejected,
+            'failed': self.failed,
+        }
+
+
+# ==================== FRONT PROCESS ====================
+
+async def set_webhook(url: str, secret: str):
+    from telegram import Bot, Update
+    from config import BOT_API_URL, BOT_TOKEN
+
+    async with Bot(BOT_TOKEN, **({'base_url': BOT_API_URL} if BOT_API_URL else {})) as bot:
+        await bot.set_webhook(url, secret_token=secret or None, allowed_updates=Update.ALL_TYPES)
+
+
+def run_front(count: int, url: str, secret: str = ''):
+    """Serve the webhook and feed `count` workers until SIGTERM or SIGINT
+
+    The health check server must be running already.
+    """
+    import health
+
+    if not url:
+        raise SystemExit("WEBHOOK_WORKERS needs WEBHOOK_URL, the public URL Telegram posts updates to")
+    pool = WorkerPool(count, secret)
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+
+    health.metrics_providers['workers'] = pool.stats
+    health.post_routes[urlsplit(url).path or '/'] = pool.handle_webhook
+    try:
+        started = time.perf_counter()
+        if not pool.start():
+            raise SystemExit("Webhook workers did not start")
+        asyncio.run(set_webhook(url, secret))
+        health.set_ready()
+        logger.info("Serving webhook with %s workers, started in %.2fs", count, time.perf_counter() - started)
+        stop.wait()
+    finally:
+        health.set_ready(False)
+        # Updates arriving from now on fail and stay queued at Telegram
+        health.post_routes.clear()
+        pool.stop()
+
+
+# ==================== WORKER PROCESS ====================
+
+async def serve_updates(application, stream, ready_fd: Optional[int] = None):
+    """Feed framed updates from `stream` to the application until it closes"""
+    from telegram import Update
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=2 ** 20)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), stream)
+    async with application:
+        await application.start()
+        if ready_fd is not None:
+            os.write(ready_fd, b'1')
+            os.close(ready_fd)
+        try:
+            while True:
+                size, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                data = json.loads(await reader.readexactly(size))
+                await application.update_queue.put(Update.de_json(data, application.bot))
+        except asyncio.IncompleteReadError:
+            pass  # the front closed the pipe
+        # Let what was already received finish
+        while not application.update_queue.empty():
+            await asyncio.sleep(0.05)
+        await application.stop()
+
+
+def run_worker(index: int, ready_fd: Optional[int] = None):
+    # Shutdown comes from the front closing stdin, not from the terminal's Ctrl-C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import bot
+    from config import WORKER_SYNC_SECONDS
+
+    bot.db = bot.open_storage()
+    application = bot.build_application(bot.default_builder(polling=False))
+
+    async def sync(context):
+        bot.phases.refresh()
+        bot.live_results.mark_all_dirty()
+
+    if application.job_queue:
+        application.job_queue.run_repeating(sync, interval=WORKER_SYNC_SECONDS, name='worker_sync')
+    logger.info("Worker %s (pid %s) starting", index, os.getpid())
+    asyncio.run(serve_updates(application, sys.stdin.buffer, ready_fd))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Webhook worker process, started by bot.py')
+    parser.add_argument('--index', type=int, required=True)
+    parser.add_argument('--ready-fd', type=int, help='pipe to write one byte to once serving')
+    args = parser.parse_args()
+    run_worker(args.index, args.ready_fd)
+
+
+if __name__ == '__main__':
+    main()
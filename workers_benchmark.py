@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Multi-process webhook benchmark
+
+Runs `python bot.py` in webhook mode (see workers.py) with each requested
+number of workers, against a FakeTelegramServer in this process, and
+posts every simulated user's full vote-and-order session to its webhook
+like Telegram would. Each client connection owns a share of the users and
+posts their updates in order. Throughput is updates per second from the
+first post until every user's order is in the shared database.
+
+Worker processes only run in parallel on separate cores, so the scaling
+seen is bounded by the CPU count printed first.
+
+Afterwards a worker is killed a few times: each time the next user routed
+to it must still get their order in, and the front must not hold more
+file descriptors than before.
+
+Usage:
+    python workers_benchmark.py
+    python workers_benchmark.py --workers 1 2 4 8 --users 2000 --latency 0.01
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import List, Optional
+
+from database import Database
+from fake_telegram import FakeBotApi, FakeTelegramServer
+from loadtest import UpdateFactory, seed_designs, user_journey
+from workers import SECRET_HEADER
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+SECRET = 'benchmark-secret'
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, process: subprocess.Popen, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def post_sessions(port: int, sessions: List[List[dict]], errors: List[str]):
+    """Post each session's updates in order over one keep-alive connection"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/json', SECRET_HEADER: SECRET}
+    try:
+        for session in sessions:
+            for update in session:
+                connection.request('POST', '/telegram', json.dumps(update), headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors.append(f"update {update['update_id']} answered {response.status}")
+    except OSError as e:
+        errors.append(f"posting failed: {e}")
+    finally:
+        connection.close()
+
+
+def start_bot(tmp: str, workers: int, port: int, api_url: str) -> subprocess.Popen:
+    """bot.py in webhook mode with `workers` workers, on the database in `tmp`"""
+    env = dict(os.environ, WEBHOOK_WORKERS=str(workers), WEBHOOK_URL=f'http://127.0.0.1:{port}/telegram',
+               WEBHOOK_SECRET=SECRET, PORT=str(port), BOT_API_URL=api_url, BACKUP_INTERVAL_SECONDS='0',
+               LOG_LEVEL='WARNING', NEW_REQUEST_QUEUE_LIMIT='100000', CONVERSATION_QUEUE_LIMIT='100000')
+    env.pop('UPDATE_RECORD_FILE', None)
+    return subprocess.Popen([sys.executable, BOT_PATH], cwd=tmp, env=env)
+
+
+def stop_bot(bot: subprocess.Popen):
+    bot.terminate()
+    try:
+        bot.wait(30)
+    except subprocess.TimeoutExpired:
+        bot.kill()
+
+
+def worker_stats(port: int) -> dict:
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        return json.load(response)['workers']
+
+
+def run_once(workers: int, args, api_url: str) -> Optional[float]:
+    """Updates per second with `workers` workers, None if it did not finish"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'deadlines.db'))
+        rng = random.Random(args.seed)
+        design_ids = seed_designs(db, 5)
+        factory = UpdateFactory()
+        # Far from ADMIN_IDS, admins skip the checks simulated users should go through
+        sessions = [
+            [update for _, update in user_journey(factory, 10_000_000 + i, design_ids, rng)]
+            for i in range(args.users)
+        ]
+        total = sum(map(len, sessions))
+
+        port = free_port()
+        bot = start_bot(tmp, workers, port, api_url)
+        try:
+            if not wait_ready(port, bot, args.timeout):
+                print(f"   ❌ {workers} workers: bot did not become ready")
+                return None
+            errors: List[str] = []
+            clients = [
+                threading.Thread(target=post_sessions, args=(port, sessions[i::args.clients], errors))
+                for i in range(args.clients)
+            ]
+            started = time.perf_counter()
+            for client in clients:
+                client.start()
+            deadline = time.monotonic() + args.timeout
+            orders = 0
+            while time.monotonic() < deadline:
+                orders = db.get_total_orders()
+                if orders >= args.users:
+                    break
+                time.sleep(0.05)
+            elapsed = time.perf_counter() - started
+            for client in clients:
+                client.join()
+            for error in errors[:5]:
+                print(f"   ❌ {error}")
+            if orders < args.users or errors:
+                print(f"   ❌ {workers} workers: {orders}/{args.users} orders after {elapsed:.1f}s")
+                return None
+            return total / elapsed
+        finally:
+            stop_bot(bot)
+
+
+def check_restarts(args, api_url: str, kills: int = 3) -> List[str]:
+    """Kill worker 0 `kills` times, problems found when the front restarts it"""
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'deadlines.db'))
+        rng = random.Random(args.seed)
+        design_ids = seed_designs(db, 5)
+        factory = UpdateFactory()
+        port = free_port()
+        bot = start_bot(tmp, 2, port, api_url)
+        try:
+            if not wait_ready(port, bot, args.timeout):
+                return ["bot did not become ready"]
+            fd_dir = f'/proc/{bot.pid}/fd'
+            fds = len(os.listdir(fd_dir)) if os.path.isdir(fd_dir) else None
+            for kill in range(1, kills + 1):
+                pid = worker_stats(port)['pids'][0]
+                os.kill(pid, signal.SIGKILL)
+                time.sleep(0.5)
+                # Even user ids are routed to worker 0
+                user_id = 10_000_000 + 2 * kill
+                errors: List[str] = []
+                post_sessions(port, [[update for _, update in user_journey(factory, user_id, design_ids, rng)]],
+                              errors)
+                problems += errors
+                deadline = time.monotonic() + args.timeout
+                while not db.has_user_ordered(user_id) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                if not db.has_user_ordered(user_id):
+                    problems.append(f"kill {kill}: the order of user {user_id} never arrived")
+                stats = worker_stats(port)
+                if stats['restarts'] != kill or stats['pids'][0] == pid:
+                    problems.append(f"kill {kill}: worker 0 was not restarted ({stats})")
+            if fds is not None and len(os.listdir(fd_dir)) != fds:
+                problems.append(f"front holds {len(os.listdir(fd_dir))} file descriptors, {fds} before the kills")
+        finally:
+            stop_bot(bot)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark webhook mode with several worker processes')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent webhook connections')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated Bot API latency, seconds')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    api = FakeBotApi(latency=args.latency)
+    server = FakeTelegramServer(api)
+    server.start_background()
+    print(f"🖥  {os.cpu_count()} CPUs, {args.users} users voting and ordering, "
+          f"{args.latency * 1000:.0f}ms Bot API latency\n")
+    print(f"{'workers':<9}{'updates/s':>11}{'speedup':>9}")
+    ok = True
+    baseline = None
+    try:
+        for workers in args.workers:
+            rate = run_once(workers, args, server.base_url)
+            if rate is None:
+                ok = False
+                continue
+            baseline = baseline or rate
+            print(f"{workers:<9}{rate:>11,.0f}{rate / baseline:>8.2f}x")
+        problems = check_restarts(args, server.base_url)
+        for problem in problems:
+            print(f"   ❌ {problem}")
+        ok = ok and not problems
+        print(f"\n{'❌' if problems else '✅'} Killed worker restarted by the front, 3 times")
+    finally:
+        server.shutdown()
+        server.server_close()
+    if not ok:
+        sys.exit(1)
+    print("\n✅ Every user's order arrived through the workers")
+
+
+if __name__ == '__main__':
+    main()